@@ -32,6 +32,9 @@ CREATE TABLE leads (
     -- Status Tracking (HUMAN-SET ONLY)
     status VARCHAR(50) DEFAULT 'new', -- new, contacted, nurturing, qualified, converted, lost
     
+    -- Automation Progress (post-capture pipeline: AI, assignment, email, follow-up)
+    pipeline_status VARCHAR(50) DEFAULT 'completed', -- pending, processing, completed, failed
+    
     -- Metadata
     first_response_at TIMESTAMP,
     last_contact_at TIMESTAMP,
@@ -45,9 +48,11 @@ CREATE TABLE leads (
 CREATE INDEX idx_leads_status ON leads(status);
 CREATE INDEX idx_leads_created_at ON leads(created_at DESC);
 CREATE INDEX idx_leads_email ON leads(email);
+CREATE INDEX idx_leads_pipeline_status ON leads(pipeline_status) WHERE pipeline_status <> 'completed';
 
 COMMENT ON TABLE leads IS 'Stores ONLY source data from form submissions. No AI-generated fields.';
 COMMENT ON COLUMN leads.status IS 'Human-set status, not AI-generated';
+COMMENT ON COLUMN leads.pipeline_status IS 'Progress of background lead automation, not a sales status';
 
 -- ================================================
 -- 2. LEAD PRODUCTS TABLE (Product Interests)
@@ -90,6 +95,7 @@ CREATE TABLE lead_activity (
     status VARCHAR(50) DEFAULT 'completed',
     -- For follow_ups: pending, completed, cancelled
     -- For approvals: pending, approved, rejected
+    -- For emails: queued or scheduled (outbox), completed, failed, cancelled
     -- For others: completed
     
     message TEXT NOT NULL,
@@ -112,9 +118,10 @@ CREATE INDEX idx_lead_activity_type ON lead_activity(type);
 CREATE INDEX idx_lead_activity_status ON lead_activity(status);
 CREATE INDEX idx_lead_activity_created_at ON lead_activity(created_at DESC);
 CREATE INDEX idx_lead_activity_metadata ON lead_activity USING GIN (metadata);
+CREATE INDEX idx_lead_activity_latest_ai_result ON lead_activity(lead_id, created_at DESC) WHERE type = 'ai_result';
 
 COMMENT ON TABLE lead_activity IS 'Event log storing ALL activities: AI results, assignments, emails, follow-ups, approvals';
-COMMENT ON COLUMN lead_activity.type IS 'ai_result, assignment, email, call, follow_up, approval, status_change, note';
+COMMENT ON COLUMN lead_activity.type IS 'ai_result, assignment, email, call, follow_up, approval, status_change, note, automation, ai_shadow';
 COMMENT ON COLUMN lead_activity.metadata IS 'Flexible JSON field for activity-specific data';
 
 -- ================================================
@@ -166,6 +173,83 @@ BEFORE UPDATE ON assignments
 FOR EACH ROW
 EXECUTE FUNCTION check_sla_met();
 
+-- ================================================
+-- 5. AUTOMATION JOBS TABLE (Durable Work Queue)
+-- ================================================
+CREATE TABLE automation_jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW(),
+    
+    -- Job Definition
+    job_type VARCHAR(50) NOT NULL, -- lead_automation, ai_recategorization, send_email, delayed_action
+    lead_id UUID,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    
+    -- Delivery State
+    status VARCHAR(50) DEFAULT 'queued', -- queued, running, completed, dead, cancelled
+    attempts INTEGER DEFAULT 0,
+    max_attempts INTEGER DEFAULT 5,
+    run_at TIMESTAMP DEFAULT NOW(), -- next eligible run (backoff pushes this out; due time of delayed actions)
+    
+    -- Lease (a crashed worker's job is redelivered once the lease expires)
+    locked_by VARCHAR(255),
+    locked_until TIMESTAMP,
+    
+    last_error TEXT,
+    completed_at TIMESTAMP,
+    
+    -- Foreign Key
+    CONSTRAINT fk_automation_jobs_lead FOREIGN KEY (lead_id) 
+        REFERENCES leads(id) ON DELETE CASCADE
+);
+
+-- Indexes for automation_jobs table
+CREATE INDEX idx_automation_jobs_ready ON automation_jobs(run_at) WHERE status = 'queued';
+CREATE INDEX idx_automation_jobs_lease ON automation_jobs(locked_until) WHERE status = 'running';
+CREATE INDEX idx_automation_jobs_status ON automation_jobs(status);
+CREATE INDEX idx_automation_jobs_lead_id ON automation_jobs(lead_id);
+
+COMMENT ON TABLE automation_jobs IS 'At-least-once queue for lead automation steps, drained with FOR UPDATE SKIP LOCKED';
+
+-- ================================================
+-- 6. AI CACHE TABLE (Shared Categorization Cache)
+-- ================================================
+CREATE TABLE ai_cache (
+    cache_key VARCHAR(64) PRIMARY KEY, -- sha256 of normalized input + model + prompt version
+    created_at TIMESTAMP DEFAULT NOW(),
+    expires_at TIMESTAMP NOT NULL,
+    
+    output JSONB NOT NULL,
+    model VARCHAR(100) NOT NULL,
+    prompt_version VARCHAR(50) NOT NULL
+);
+
+CREATE INDEX idx_ai_cache_expires_at ON ai_cache(expires_at);
+
+COMMENT ON TABLE ai_cache IS 'Persistent tier of the AI categorization cache (AI_CACHE_PERSISTENT)';
+
+-- ================================================
+-- 7. JOB CHECKPOINTS TABLE (Resumable Batch Jobs)
+-- ================================================
+CREATE TABLE job_checkpoints (
+    run_id VARCHAR(64) PRIMARY KEY, -- one long-running batch run (spans several automation_jobs)
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW(),
+    
+    job_type VARCHAR(50) NOT NULL, -- ai_recategorization, email_campaign
+    status VARCHAR(50) DEFAULT 'running', -- running, completed, failed
+    checkpoint JSONB NOT NULL DEFAULT '{}'::jsonb, -- cursor, progress and stats
+    
+    -- Lock: one job execution processes a run at a time
+    locked_by VARCHAR(64),
+    locked_until TIMESTAMP
+);
+
+CREATE INDEX idx_job_checkpoints_job_type ON job_checkpoints(job_type, created_at DESC);
+
+COMMENT ON TABLE job_checkpoints IS 'Progress of batch jobs so a redelivered or continued job resumes where it stopped';
+
 -- ================================================
 -- UTILITY FUNCTIONS
 -- ================================================
@@ -227,6 +311,617 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- Function to capture a lead with all related rows in one transaction
+-- (lead, products, assignment, activity log, automation jobs). Either
+-- everything is written or nothing is, and the backend pays a single
+-- round trip.
+CREATE OR REPLACE FUNCTION create_lead_full(
+  lead_payload JSONB,
+  products_payload JSONB DEFAULT '[]'::jsonb,
+  assignment_payload JSONB DEFAULT NULL,
+  activities_payload JSONB DEFAULT '[]'::jsonb,
+  jobs_payload JSONB DEFAULT '[]'::jsonb
+)
+RETURNS JSON AS $$
+DECLARE
+  new_lead leads%ROWTYPE;
+  new_assignment assignments%ROWTYPE;
+  new_products JSON;
+BEGIN
+  INSERT INTO leads (
+    name, email, phone, company, role, location,
+    message, source, status, pipeline_status, first_response_at
+  )
+  VALUES (
+    lead_payload->>'name',
+    lead_payload->>'email',
+    lead_payload->>'phone',
+    lead_payload->>'company',
+    lead_payload->>'role',
+    lead_payload->>'location',
+    lead_payload->>'message',
+    COALESCE(lead_payload->>'source', 'website_form'),
+    COALESCE(lead_payload->>'status', 'new'),
+    COALESCE(lead_payload->>'pipeline_status', 'completed'),
+    (lead_payload->>'first_response_at')::timestamp
+  )
+  RETURNING * INTO new_lead;
+
+  WITH inserted AS (
+    INSERT INTO lead_products (lead_id, category, product, quantity, notes)
+    SELECT new_lead.id, p->>'category', p->>'product', p->>'quantity', p->>'notes'
+    FROM jsonb_array_elements(COALESCE(products_payload, '[]'::jsonb)) AS p
+    RETURNING *
+  )
+  SELECT COALESCE(json_agg(inserted.*), '[]'::json) INTO new_products FROM inserted;
+
+  IF assignment_payload IS NOT NULL THEN
+    INSERT INTO assignments (lead_id, owner_id, owner_name, sla_deadline)
+    VALUES (
+      new_lead.id,
+      assignment_payload->>'owner_id',
+      assignment_payload->>'owner_name',
+      (assignment_payload->>'sla_deadline')::timestamp
+    )
+    RETURNING * INTO new_assignment;
+  END IF;
+
+  INSERT INTO lead_activity (id, lead_id, type, status, message, actor_type, actor_id, metadata)
+  SELECT
+    COALESCE((a->>'id')::uuid, uuid_generate_v4()),
+    new_lead.id,
+    a->>'type',
+    COALESCE(a->>'status', 'completed'),
+    a->>'message',
+    COALESCE(a->>'actor_type', 'system'),
+    a->>'actor_id',
+    a->'metadata'
+  FROM jsonb_array_elements(COALESCE(activities_payload, '[]'::jsonb))
+    WITH ORDINALITY AS t(a, ord)
+  ORDER BY ord;
+
+  -- Jobs are enqueued in the same transaction, so a captured lead can
+  -- never be left without its automation job
+  INSERT INTO automation_jobs (lead_id, job_type, payload, max_attempts, run_at)
+  SELECT
+    new_lead.id,
+    j->>'job_type',
+    COALESCE(j->'payload', '{}'::jsonb),
+    COALESCE((j->>'max_attempts')::int, 5),
+    COALESCE((j->>'run_at')::timestamp, NOW())
+  FROM jsonb_array_elements(COALESCE(jobs_payload, '[]'::jsonb)) AS j;
+
+  RETURN json_build_object(
+    'lead', row_to_json(new_lead),
+    'products', new_products,
+    'assignment', CASE
+      WHEN assignment_payload IS NULL THEN NULL
+      ELSE row_to_json(new_assignment)
+    END
+  );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to record background automation results for a captured lead.
+-- Idempotent: returns NULL without writing if the lead is already
+-- completed, so a redelivered job cannot duplicate rows.
+CREATE OR REPLACE FUNCTION record_lead_automation(
+  lead_uuid UUID,
+  assignment_payload JSONB DEFAULT NULL,
+  activities_payload JSONB DEFAULT '[]'::jsonb,
+  response_at TIMESTAMP DEFAULT NULL,
+  jobs_payload JSONB DEFAULT '[]'::jsonb
+)
+RETURNS JSON AS $$
+DECLARE
+  current_status VARCHAR;
+  new_assignment assignments%ROWTYPE;
+BEGIN
+  SELECT pipeline_status INTO current_status
+  FROM leads
+  WHERE id = lead_uuid
+  FOR UPDATE;
+
+  IF NOT FOUND OR current_status = 'completed' THEN
+    RETURN NULL;
+  END IF;
+
+  IF assignment_payload IS NOT NULL THEN
+    INSERT INTO assignments (lead_id, owner_id, owner_name, sla_deadline)
+    VALUES (
+      lead_uuid,
+      assignment_payload->>'owner_id',
+      assignment_payload->>'owner_name',
+      (assignment_payload->>'sla_deadline')::timestamp
+    )
+    RETURNING * INTO new_assignment;
+  END IF;
+
+  INSERT INTO lead_activity (id, lead_id, type, status, message, actor_type, actor_id, metadata)
+  SELECT
+    COALESCE((a->>'id')::uuid, uuid_generate_v4()),
+    lead_uuid,
+    a->>'type',
+    COALESCE(a->>'status', 'completed'),
+    a->>'message',
+    COALESCE(a->>'actor_type', 'system'),
+    a->>'actor_id',
+    a->'metadata'
+  FROM jsonb_array_elements(COALESCE(activities_payload, '[]'::jsonb))
+    WITH ORDINALITY AS t(a, ord)
+  ORDER BY ord;
+
+  -- Outbox emails and delayed-action timers are enqueued with the
+  -- activities that track them
+  INSERT INTO automation_jobs (lead_id, job_type, payload, max_attempts, run_at)
+  SELECT
+    lead_uuid,
+    j->>'job_type',
+    COALESCE(j->'payload', '{}'::jsonb),
+    COALESCE((j->>'max_attempts')::int, 5),
+    COALESCE((j->>'run_at')::timestamp, NOW())
+  FROM jsonb_array_elements(COALESCE(jobs_payload, '[]'::jsonb)) AS j;
+
+  UPDATE leads
+  SET pipeline_status = 'completed',
+      first_response_at = COALESCE(response_at, first_response_at),
+      updated_at = NOW()
+  WHERE id = lead_uuid;
+
+  RETURN json_build_object(
+    'assignment', CASE
+      WHEN assignment_payload IS NULL THEN NULL
+      ELSE row_to_json(new_assignment)
+    END
+  );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to apply a late AI categorization: in one transaction, the
+-- superseded rule's pending follow-ups, queued delayed_action timers and
+-- scheduled outbox emails are cancelled (follow-ups created by hand are
+-- kept), the active assignment moves to the new owner and SLA, and the
+-- new rule's activities and timer jobs are written.
+CREATE OR REPLACE FUNCTION reevaluate_lead_automation(
+  lead_uuid UUID,
+  superseded_rule TEXT,
+  assignment_payload JSONB DEFAULT NULL,
+  activities_payload JSONB DEFAULT '[]'::jsonb,
+  jobs_payload JSONB DEFAULT '[]'::jsonb
+)
+RETURNS JSON AS $$
+DECLARE
+  cancelled_count INTEGER;
+  cancelled_timers INTEGER;
+  cancelled_emails INTEGER;
+  reassigned_count INTEGER := 0;
+BEGIN
+  PERFORM 1 FROM leads WHERE id = lead_uuid FOR UPDATE;
+
+  IF NOT FOUND THEN
+    RETURN NULL;
+  END IF;
+
+  -- Automation follow-ups record their rule as the reason
+  UPDATE lead_activity
+  SET status = 'cancelled',
+      updated_at = NOW()
+  WHERE lead_id = lead_uuid
+    AND type = 'follow_up'
+    AND status = 'pending'
+    AND metadata->>'reason' = superseded_rule;
+  GET DIAGNOSTICS cancelled_count = ROW_COUNT;
+
+  UPDATE automation_jobs
+  SET status = 'cancelled',
+      updated_at = NOW()
+  WHERE lead_id = lead_uuid
+    AND job_type = 'delayed_action'
+    AND status = 'queued'
+    AND payload->>'rule_name' = superseded_rule;
+  GET DIAGNOSTICS cancelled_timers = ROW_COUNT;
+
+  WITH cancelled AS (
+    UPDATE lead_activity
+    SET status = 'cancelled',
+        message = (metadata->>'template') || ' email cancelled (rule re-evaluated)',
+        updated_at = NOW()
+    WHERE lead_id = lead_uuid
+      AND type = 'email'
+      AND status = 'scheduled'
+      AND metadata->>'rule_name' = superseded_rule
+    RETURNING id
+  )
+  UPDATE automation_jobs
+  SET status = 'cancelled',
+      updated_at = NOW()
+  WHERE lead_id = lead_uuid
+    AND job_type = 'send_email'
+    AND status = 'queued'
+    AND payload->>'activity_id' IN (SELECT id::text FROM cancelled);
+  GET DIAGNOSTICS cancelled_emails = ROW_COUNT;
+
+  IF assignment_payload IS NOT NULL THEN
+    UPDATE assignments
+    SET owner_id = assignment_payload->>'owner_id',
+        owner_name = assignment_payload->>'owner_name',
+        sla_deadline = (assignment_payload->>'sla_deadline')::timestamp
+    WHERE lead_id = lead_uuid
+      AND status = 'active';
+    GET DIAGNOSTICS reassigned_count = ROW_COUNT;
+  END IF;
+
+  INSERT INTO lead_activity (id, lead_id, type, status, message, actor_type, actor_id, metadata)
+  SELECT
+    COALESCE((a->>'id')::uuid, uuid_generate_v4()),
+    lead_uuid,
+    a->>'type',
+    COALESCE(a->>'status', 'completed'),
+    a->>'message',
+    COALESCE(a->>'actor_type', 'system'),
+    a->>'actor_id',
+    a->'metadata'
+  FROM jsonb_array_elements(COALESCE(activities_payload, '[]'::jsonb))
+    WITH ORDINALITY AS t(a, ord)
+  ORDER BY ord;
+
+  INSERT INTO automation_jobs (lead_id, job_type, payload, max_attempts, run_at)
+  SELECT
+    lead_uuid,
+    j->>'job_type',
+    COALESCE(j->'payload', '{}'::jsonb),
+    COALESCE((j->>'max_attempts')::int, 5),
+    COALESCE((j->>'run_at')::timestamp, NOW())
+  FROM jsonb_array_elements(COALESCE(jobs_payload, '[]'::jsonb)) AS j;
+
+  RETURN json_build_object(
+    'cancelled_follow_ups', cancelled_count,
+    'cancelled_timers', cancelled_timers,
+    'cancelled_emails', cancelled_emails,
+    'reassigned', reassigned_count
+  );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to record the outcome of an outbox email: updates its
+-- activity and, for the first response, sets leads.first_response_at
+-- unless an earlier response already set it.
+CREATE OR REPLACE FUNCTION record_email_delivery(
+  activity_uuid UUID,
+  new_status VARCHAR,
+  new_message TEXT,
+  metadata_patch JSONB DEFAULT '{}'::jsonb,
+  response_at TIMESTAMP DEFAULT NULL
+)
+RETURNS VOID AS $$
+DECLARE
+  activity_lead UUID;
+BEGIN
+  UPDATE lead_activity
+  SET status = new_status,
+      message = new_message,
+      metadata = COALESCE(metadata, '{}'::jsonb) || COALESCE(metadata_patch, '{}'::jsonb),
+      updated_at = NOW()
+  WHERE id = activity_uuid
+  RETURNING lead_id INTO activity_lead;
+
+  IF response_at IS NOT NULL AND activity_lead IS NOT NULL THEN
+    UPDATE leads
+    SET first_response_at = COALESCE(first_response_at, response_at),
+        updated_at = NOW()
+    WHERE id = activity_lead;
+  END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to claim a batch of ready jobs for one worker.
+-- SKIP LOCKED lets many workers poll concurrently without blocking on or
+-- double-claiming the same rows. Jobs whose lease expired (worker died)
+-- are redelivered; those already at max_attempts are dead-lettered.
+CREATE OR REPLACE FUNCTION claim_automation_jobs(
+  worker_id VARCHAR,
+  batch_size INTEGER DEFAULT 10,
+  lease_seconds INTEGER DEFAULT 300
+)
+RETURNS SETOF automation_jobs AS $$
+BEGIN
+  UPDATE automation_jobs
+  SET status = 'dead',
+      last_error = COALESCE(last_error, 'Lease expired after final attempt'),
+      locked_by = NULL,
+      locked_until = NULL,
+      updated_at = NOW()
+  WHERE status = 'running'
+    AND locked_until < NOW()
+    AND attempts >= max_attempts;
+
+  RETURN QUERY
+  UPDATE automation_jobs j
+  SET status = 'running',
+      attempts = j.attempts + 1,
+      locked_by = worker_id,
+      locked_until = NOW() + make_interval(secs => lease_seconds),
+      updated_at = NOW()
+  WHERE j.id IN (
+    SELECT id
+    FROM automation_jobs
+    WHERE (status = 'queued' AND run_at <= NOW())
+       OR (status = 'running' AND locked_until < NOW())
+    ORDER BY run_at
+    LIMIT batch_size
+    FOR UPDATE SKIP LOCKED
+  )
+  RETURNING j.*;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to mark a claimed job as done
+CREATE OR REPLACE FUNCTION complete_automation_job(job_uuid UUID)
+RETURNS VOID AS $$
+BEGIN
+  UPDATE automation_jobs
+  SET status = 'completed',
+      completed_at = NOW(),
+      locked_by = NULL,
+      locked_until = NULL,
+      updated_at = NOW()
+  WHERE id = job_uuid;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to record a failed attempt: requeue with backoff, or move to
+-- the dead-letter state once max_attempts is reached. Returns new status.
+CREATE OR REPLACE FUNCTION fail_automation_job(
+  job_uuid UUID,
+  error_message TEXT,
+  retry_delay_seconds INTEGER DEFAULT 60
+)
+RETURNS VARCHAR AS $$
+DECLARE
+  new_status VARCHAR;
+BEGIN
+  UPDATE automation_jobs
+  SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'queued' END,
+      run_at = NOW() + make_interval(secs => retry_delay_seconds),
+      last_error = error_message,
+      locked_by = NULL,
+      locked_until = NULL,
+      updated_at = NOW()
+  WHERE id = job_uuid
+  RETURNING status INTO new_status;
+
+  RETURN new_status;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to list due times of queued jobs up to horizon_seconds ahead
+-- (overdue ones first), for the in-process timer heap. Reads only the
+-- partial run_at index.
+CREATE OR REPLACE FUNCTION get_upcoming_job_times(
+  horizon_seconds INTEGER DEFAULT 300,
+  max_rows INTEGER DEFAULT 10000
+)
+RETURNS TABLE(run_at TIMESTAMP) AS $$
+BEGIN
+  RETURN QUERY
+  SELECT j.run_at
+  FROM automation_jobs j
+  WHERE j.status = 'queued'
+    AND j.run_at <= NOW() + make_interval(secs => horizon_seconds)
+  ORDER BY j.run_at
+  LIMIT max_rows;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to get job queue depth by status
+CREATE OR REPLACE FUNCTION get_job_queue_stats()
+RETURNS JSON AS $$
+BEGIN
+  RETURN json_build_object(
+    'queued', (SELECT COUNT(*) FROM automation_jobs WHERE status = 'queued'),
+    'ready', (
+      SELECT COUNT(*)
+      FROM automation_jobs
+      WHERE status = 'queued' AND run_at <= NOW()
+    ),
+    'running', (SELECT COUNT(*) FROM automation_jobs WHERE status = 'running'),
+    'completed', (SELECT COUNT(*) FROM automation_jobs WHERE status = 'completed'),
+    'dead', (SELECT COUNT(*) FROM automation_jobs WHERE status = 'dead'),
+    'oldest_ready_seconds', (
+      SELECT EXTRACT(EPOCH FROM (NOW() - MIN(run_at)))
+      FROM automation_jobs
+      WHERE status = 'queued' AND run_at <= NOW()
+    )
+  );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to take the lock of a batch run (job_checkpoints) for one job
+-- execution. Returns the run with acquired = FALSE while another holder's
+-- lock is live (a holder that stops saving, e.g. a crashed worker, loses
+-- it after lease_seconds), and NULL if the run does not exist.
+CREATE OR REPLACE FUNCTION lock_job_checkpoint(
+  checkpoint_run_id VARCHAR,
+  holder VARCHAR,
+  lease_seconds INTEGER
+)
+RETURNS JSON AS $$
+DECLARE
+  run job_checkpoints%ROWTYPE;
+BEGIN
+  SELECT * INTO run
+  FROM job_checkpoints
+  WHERE run_id = checkpoint_run_id
+  FOR UPDATE;
+
+  IF NOT FOUND THEN
+    RETURN NULL;
+  END IF;
+
+  IF run.status IN ('running', 'failed') AND (run.locked_by IS NULL OR run.locked_until < NOW()) THEN
+    UPDATE job_checkpoints
+    SET locked_by = holder,
+        locked_until = NOW() + make_interval(secs => lease_seconds)
+    WHERE run_id = checkpoint_run_id
+    RETURNING * INTO run;
+    RETURN (to_jsonb(run) || jsonb_build_object('acquired', TRUE))::json;
+  END IF;
+
+  RETURN (to_jsonb(run) || jsonb_build_object('acquired', FALSE))::json;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to save a locked batch run's checkpoint. Renews the lock for
+-- lease_seconds, or releases it when lease_seconds is NULL; returns FALSE
+-- (writing nothing) if holder no longer has the lock.
+CREATE OR REPLACE FUNCTION save_job_checkpoint(
+  checkpoint_run_id VARCHAR,
+  holder VARCHAR,
+  new_checkpoint JSONB,
+  new_status VARCHAR,
+  lease_seconds INTEGER DEFAULT NULL
+)
+RETURNS BOOLEAN AS $$
+BEGIN
+  UPDATE job_checkpoints
+  SET checkpoint = new_checkpoint,
+      status = new_status,
+      locked_by = CASE WHEN lease_seconds IS NULL THEN NULL ELSE holder END,
+      locked_until = CASE WHEN lease_seconds IS NULL THEN NULL ELSE NOW() + make_interval(secs => lease_seconds) END,
+      updated_at = NOW()
+  WHERE run_id = checkpoint_run_id
+    AND locked_by = holder;
+  RETURN FOUND;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to page through leads whose latest ai_result was produced by
+-- a prompt version or model no longer in use (the single-lead and batch
+-- prompts are both current; keyset pagination on lead_id)
+CREATE OR REPLACE FUNCTION get_stale_ai_results(
+  current_prompt_versions TEXT[],
+  current_models TEXT[],
+  after_lead UUID DEFAULT NULL,
+  page_size INTEGER DEFAULT 100
+)
+RETURNS JSON AS $$
+BEGIN
+  RETURN COALESCE((
+    SELECT json_agg(stale ORDER BY stale.lead_id)
+    FROM (
+      SELECT latest.lead_id, latest.id AS activity_id, latest.metadata
+      FROM (
+        SELECT DISTINCT ON (la.lead_id) la.lead_id, la.id, la.metadata
+        FROM lead_activity la
+        WHERE la.type = 'ai_result'
+          AND (after_lead IS NULL OR la.lead_id > after_lead)
+        ORDER BY la.lead_id, la.created_at DESC
+      ) latest
+      WHERE NOT (COALESCE(latest.metadata->>'prompt_version', '') = ANY(current_prompt_versions))
+         OR NOT (COALESCE(latest.metadata->>'model', '') = ANY(current_models))
+      ORDER BY latest.lead_id
+      LIMIT page_size
+    ) stale
+  ), '[]'::json);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to count leads get_stale_ai_results would return (progress total)
+CREATE OR REPLACE FUNCTION count_stale_ai_results(
+  current_prompt_versions TEXT[],
+  current_models TEXT[]
+)
+RETURNS INTEGER AS $$
+BEGIN
+  RETURN (
+    SELECT COUNT(*)
+    FROM (
+      SELECT DISTINCT ON (la.lead_id) la.metadata
+      FROM lead_activity la
+      WHERE la.type = 'ai_result'
+      ORDER BY la.lead_id, la.created_at DESC
+    ) latest
+    WHERE NOT (COALESCE(latest.metadata->>'prompt_version', '') = ANY(current_prompt_versions))
+       OR NOT (COALESCE(latest.metadata->>'model', '') = ANY(current_models))
+  );
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to page through email campaign recipients: leads in one of
+-- statuses whose latest AI priority is in priorities (any priority when
+-- NULL), with their product names (keyset pagination on lead id; the
+-- latest priority is read via idx_lead_activity_latest_ai_result).
+-- Leads already emailed by campaign run exclude_run are skipped, so a
+-- repeated page does not send to them again.
+CREATE OR REPLACE FUNCTION get_campaign_recipients(
+  statuses TEXT[],
+  priorities TEXT[] DEFAULT NULL,
+  after_lead UUID DEFAULT NULL,
+  page_size INTEGER DEFAULT 500,
+  exclude_run TEXT DEFAULT NULL
+)
+RETURNS JSON AS $$
+BEGIN
+  RETURN COALESCE((
+    SELECT json_agg(recipient ORDER BY recipient.lead_id)
+    FROM (
+      SELECT
+        l.id AS lead_id,
+        l.name,
+        l.email,
+        l.status,
+        ai.priority,
+        COALESCE(
+          (SELECT json_agg(lp.product ORDER BY lp.created_at) FROM lead_products lp WHERE lp.lead_id = l.id),
+          '[]'::json
+        ) AS products
+      FROM leads l
+      LEFT JOIN LATERAL (
+        SELECT la.metadata->'output'->>'priority' AS priority
+        FROM lead_activity la
+        WHERE la.lead_id = l.id AND la.type = 'ai_result'
+        ORDER BY la.created_at DESC
+        LIMIT 1
+      ) ai ON TRUE
+      WHERE l.status = ANY(statuses)
+        AND (after_lead IS NULL OR l.id > after_lead)
+        AND (priorities IS NULL OR ai.priority = ANY(priorities))
+        AND (exclude_run IS NULL OR NOT EXISTS (
+          SELECT 1 FROM lead_activity sent
+          WHERE sent.lead_id = l.id
+            AND sent.type = 'email'
+            AND sent.metadata->>'campaign_run_id' = exclude_run
+        ))
+      ORDER BY l.id
+      LIMIT page_size
+    ) recipient
+  ), '[]'::json);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Function to count leads get_campaign_recipients would return (progress total)
+CREATE OR REPLACE FUNCTION count_campaign_recipients(
+  statuses TEXT[],
+  priorities TEXT[] DEFAULT NULL
+)
+RETURNS INTEGER AS $$
+BEGIN
+  RETURN (
+    SELECT COUNT(*)
+    FROM leads l
+    LEFT JOIN LATERAL (
+      SELECT la.metadata->'output'->>'priority' AS priority
+      FROM lead_activity la
+      WHERE la.lead_id = l.id AND la.type = 'ai_result'
+      ORDER BY la.created_at DESC
+      LIMIT 1
+    ) ai ON TRUE
+    WHERE l.status = ANY(statuses)
+      AND (priorities IS NULL OR ai.priority = ANY(priorities))
+  );
+END;
+$$ LANGUAGE plpgsql;
+
 -- Function to get dashboard statistics
 CREATE OR REPLACE FUNCTION get_dashboard_stats()
 RETURNS JSON AS $$
@@ -312,6 +1007,9 @@ ALTER TABLE leads ENABLE ROW LEVEL SECURITY;
 ALTER TABLE lead_products ENABLE ROW LEVEL SECURITY;
 ALTER TABLE lead_activity ENABLE ROW LEVEL SECURITY;
 ALTER TABLE assignments ENABLE ROW LEVEL SECURITY;
+ALTER TABLE automation_jobs ENABLE ROW LEVEL SECURITY; -- service role only, no policies
+ALTER TABLE ai_cache ENABLE ROW LEVEL SECURITY; -- service role only, no policies
+ALTER TABLE job_checkpoints ENABLE ROW LEVEL SECURITY; -- service role only, no policies
 
 -- Leads policies
 CREATE POLICY "Anyone can submit leads"
@@ -461,6 +1159,9 @@ VALUES (
 
 -- Summary:
 -- ✅ 4 core tables: leads, lead_products, lead_activity, assignments
+-- ✅ automation_jobs: durable at-least-once queue for background automation
+-- ✅ ai_cache: shared content-addressed cache of AI categorizations
+-- ✅ job_checkpoints: resumable progress for batch jobs (AI re-categorization)
 -- ✅ AI results stored as activities (no DB pollution)
 -- ✅ Follow-ups stored as activities with status='pending'
 -- ✅ Approvals stored as activities with type='approval'
@@ -0,0 +1,69 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import JSONResponse
+from typing import Dict, Any, Optional
+from app.models.ai import RecategorizeRequest
+from app.services.ai_service import get_ai_service
+from app.services.recategorization import get_recategorization_service
+from app.services.shadow_evaluation import get_shadow_evaluator, shadow_report
+from app.services.lead_pipeline import get_lead_pipeline
+
+router = APIRouter(prefix="/api/ai", tags=["ai"])
+
+
+@router.post("/recategorize")
+async def start_recategorization(options: Optional[RecategorizeRequest] = None):
+    """
+    Re-run every lead whose latest AI result used an older prompt or model
+    
+    Runs in the background on the job queue (drained by pipeline workers
+    in the API process or python -m app.worker); poll
+    GET /api/ai/recategorize/{run_id} for progress and diff statistics.
+    """
+    options = options or RecategorizeRequest()
+    run = await get_recategorization_service().start(**options.model_dump())
+    get_lead_pipeline().wake()
+    return JSONResponse(status_code=202, content=run)
+
+
+@router.get("/recategorize/{run_id}")
+async def get_recategorization_progress(run_id: str) -> Dict[str, Any]:
+    """
+    Progress of a re-categorization run
+    
+    Returns status, percent complete and the checkpoint: processed,
+    written, fallback, changed counts per field and priority transitions
+    """
+    run = await get_recategorization_service().progress(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return run
+
+
+@router.get("/metrics")
+async def get_ai_metrics() -> Dict[str, Any]:
+    """
+    AI service counters
+    
+    Returns the same counters as the "ai" section of /health: budget
+    (requests/tokens available, tokens used today, shed calls), per-model
+    latency and tokens, routing, cache and output repair statistics
+    """
+    return get_ai_service().stats()
+
+
+@router.get("/shadow")
+async def get_shadow_report(
+    model: Optional[str] = None,
+    limit: int = Query(1000, gt=0, le=10000)
+) -> Dict[str, Any]:
+    """
+    Shadow-mode evaluation of a candidate model (AI_SHADOW_MODEL)
+    
+    Returns agreement rates with the live answers (per field and all
+    fields), priority changes, and the candidate's latency distribution
+    over the latest `limit` ai_shadow activities, plus this process's
+    live shadow counters
+    """
+    report = await shadow_report(model, limit)
+    report["live"] = get_shadow_evaluator().stats()
+    return report
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+from typing import Dict, Any
+from app.models.campaign import EmailCampaignRequest
+from app.services.email_campaign import get_email_campaign_service
+from app.services.lead_pipeline import get_lead_pipeline
+
+router = APIRouter(prefix="/api/campaigns", tags=["campaigns"])
+
+
+@router.post("")
+async def start_campaign(request: EmailCampaignRequest):
+    """
+    Send nurture_day_3 or follow_up_reminder to every matching lead
+    
+    Runs in the background on the job queue (drained by pipeline workers
+    in the API process or python -m app.worker) through Resend's batch
+    endpoint; poll GET /api/campaigns/{run_id} for progress.
+    """
+    try:
+        run = await get_email_campaign_service().start(**request.model_dump())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    get_lead_pipeline().wake()
+    return JSONResponse(status_code=202, content=run)
+
+
+@router.get("/{run_id}")
+async def get_campaign_progress(run_id: str) -> Dict[str, Any]:
+    """
+    Progress of an email campaign
+    
+    Returns status, percent complete and the checkpoint: processed,
+    sent, failed and batch counts
+    """
+    run = await get_email_campaign_service().progress(run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return run
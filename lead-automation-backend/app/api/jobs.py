@@ -0,0 +1,44 @@
+from fastapi import APIRouter, HTTPException
+from typing import List, Dict, Any
+from app.utils.db import get_record
+from app.services.job_queue import get_job_queue
+from app.services.action_scheduler import get_action_scheduler
+
+router = APIRouter(prefix="/api/jobs", tags=["jobs"])
+
+
+@router.get("/stats")
+async def get_job_stats() -> Dict[str, Any]:
+    """
+    Get automation job queue depth
+    
+    Returns counts of queued, ready, running, completed and dead jobs,
+    plus the age of the oldest ready job (worker lag), and the delayed
+    action scheduler's timers and firing lag
+    """
+    stats = await get_job_queue().stats()
+    return {**(stats or {}), "scheduler": get_action_scheduler().stats()}
+
+
+@router.get("/dead")
+async def list_dead_jobs(limit: int = 100) -> List[Dict[str, Any]]:
+    """
+    Dead-letter view
+    
+    Returns jobs that failed max_attempts times, with their last error
+    """
+    return await get_job_queue().list_dead(limit=limit)
+
+
+@router.post("/{job_id}/retry")
+async def retry_dead_job(job_id: str) -> Dict[str, Any]:
+    """Requeue a dead job with a fresh attempt budget"""
+    job = await get_record("automation_jobs", job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != "dead":
+        raise HTTPException(status_code=400, detail=f"Job is {job['status']}, only dead jobs can be retried")
+    
+    await get_job_queue().retry(job_id)
+    
+    return {"success": True, "job_id": job_id, "status": "queued"}
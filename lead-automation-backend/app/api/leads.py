@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
 from typing import List, Optional, Dict, Any
 from app.models.lead import (
     LeadSubmission,
@@ -6,7 +7,9 @@ from app.models.lead import (
     LeadUpdate,
     LeadStatusUpdate
 )
+from app.config import settings
 from app.services.lead_service import get_lead_service
+from app.services.lead_pipeline import get_lead_pipeline
 from app.services.ai_service import get_ai_service
 from app.utils.db import (
     query_records,
@@ -28,15 +31,35 @@ async def create_lead(submission: LeadSubmission):
     1. Store lead and products
     2. AI categorization
     3. Auto-assignment
-    4. Send acknowledgement email
+    4. Send acknowledgement email (queued in the email outbox when
+       EMAIL_OUTBOX_ENABLED; pipeline workers send it)
     5. Create follow-up tasks
+    
+    With LEAD_PIPELINE_MODE=background only step 1 runs in the request;
+    the endpoint returns 202 with the lead id and steps 2-5 run on the
+    lead pipeline workers (progress via GET /api/leads/{id}/pipeline).
     """
+    lead_data = submission.dict(exclude={"product_interests"})
+    product_interests = [p.dict() for p in submission.product_interests]
+    
     try:
         lead_service = get_lead_service()
+        
+        if settings.LEAD_PIPELINE_MODE == "background":
+            created = await lead_service.capture_lead(lead_data, product_interests)
+            lead = created["lead"]
+            get_lead_pipeline().wake()
+            return JSONResponse(status_code=202, content={
+                "lead_id": lead["id"],
+                "pipeline_status": "pending"
+            })
+        
         result = await lead_service.create_lead_with_products(
-            lead_data=submission.dict(exclude={"product_interests"}),
-            product_interests=[p.dict() for p in submission.product_interests]
+            lead_data=lead_data,
+            product_interests=product_interests
         )
+        if result.get("email_queued"):
+            get_lead_pipeline().wake()
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -71,6 +94,18 @@ async def get_lead_details(lead_id: str):
     return full_lead
 
 
+@router.get("/{lead_id}/pipeline")
+async def get_lead_pipeline_status(lead_id: str):
+    """Get background automation progress for a lead"""
+    lead = await get_record("leads", lead_id)
+    if not lead:
+        raise HTTPException(status_code=404, detail="Lead not found")
+    return {
+        "lead_id": lead_id,
+        "pipeline_status": lead.get("pipeline_status")
+    }
+
+
 @router.put("/{lead_id}", response_model=Lead)
 async def update_lead(lead_id: str, lead_update: LeadUpdate):
     """Update lead information"""
@@ -10,18 +10,93 @@ class Settings(BaseSettings):
     SUPABASE_ANON_KEY: str
     SUPABASE_SERVICE_KEY: str
     
+    # Database connection pool
+    DB_POOL_SIZE: int = 10  # Max concurrent PostgREST requests (threads + connections)
+    DB_TIMEOUT_SECONDS: float = 30.0
+    
     # Groq AI
     GROQ_API_KEY: str
+    GROQ_MAX_CONCURRENCY: int = 10  # Max in-flight LLM calls (and pooled connections) per process
+    GROQ_TIMEOUT_SECONDS: float = 30.0
+    GROQ_RETRY_BASE_DELAY_SECONDS: float = 0.5  # Backoff doubles per retry (with jitter)
+    GROQ_RETRY_MAX_DELAY_SECONDS: float = 8.0
+    GROQ_BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive failures that open the circuit
+    GROQ_BREAKER_RESET_SECONDS: float = 30.0  # Open time before a half-open probe
+    AI_DEADLINE_MS: int = 0  # Proceed with fallback if Groq takes longer; AI answer applied later (0 = wait)
+    AI_MAX_MESSAGE_TOKENS: int = 300  # Lead messages are cut to about this many tokens in prompts (0 = no cap)
+    
+    # Groq rate and spend budget (per process)
+    AI_RATE_LIMIT_ENABLED: bool = True
+    GROQ_REQUESTS_PER_MINUTE: int = 30
+    GROQ_TOKENS_PER_MINUTE: int = 12000
+    AI_DAILY_TOKEN_BUDGET: int = 0  # Tokens per UTC day before leads go to fallback (0 = unlimited)
+    AI_RATE_MAX_WAIT_SECONDS: float = 10.0  # Longest a call queues for rate budget before it is shed to fallback
+    
+    # AI categorization cache
+    AI_CACHE_ENABLED: bool = True
+    AI_CACHE_MAX_ENTRIES: int = 1000  # In-memory LRU size per process
+    AI_CACHE_TTL_SECONDS: int = 86400
+    AI_CACHE_PERSISTENT: bool = False  # Also share entries through the ai_cache table
+    
+    # Local fast-path classifier (answers confident leads without Groq)
+    AI_LOCAL_CLASSIFIER_ENABLED: bool = True
+    AI_LOCAL_CONFIDENCE_THRESHOLD: float = 0.9  # Every field must be at least this confident
+    AI_LOCAL_MIN_SAMPLES: int = 200  # Stay off until trained on this many LLM answers
+    AI_LOCAL_AUDIT_RATE: float = 0.05  # Share of confident leads still sent to Groq to measure agreement
+    AI_LOCAL_TRAINING_LIMIT: int = 5000  # Most recent ai_result activities used for training
+    
+    # Model routing (small model for simple leads, MODEL_VERSION for the rest)
+    AI_ROUTING_ENABLED: bool = True
+    AI_SMALL_MODEL: str = "llama-3.1-8b-instant"
+    AI_ROUTING_MAX_WORDS: int = 40  # Longer messages go straight to the large model
+    AI_ROUTING_MAX_PRODUCTS: int = 3  # So do leads interested in more products
+    AI_ESCALATION_CONFIDENCE: float = 0.7  # Small-model answers below this are redone by the large model
+    
+    # Shadow evaluation of a candidate model on live leads (never delays them)
+    AI_SHADOW_MODEL: str = ""  # Candidate model; empty = off
+    AI_SHADOW_SAMPLE_RATE: float = 0.05  # Share of LLM-categorized leads also sent to the candidate
+    AI_SHADOW_MAX_CONCURRENCY: int = 2
     
     # Resend Email
     RESEND_API_KEY: str
     RESEND_FROM_EMAIL: str = "leads@yourdomain.com"
+    RESEND_MAX_CONCURRENCY: int = 10  # Max in-flight sends (and pooled connections) per process
+    RESEND_TIMEOUT_SECONDS: float = 15.0
+    EMAIL_OUTBOX_ENABLED: bool = True  # Queue automation emails with the lead; pipeline workers send them with retries
     
     # Application
     APP_ENV: str = "development"
     APP_NAME: str = "Lead Automation System"
     CORS_ORIGINS: str = "http://localhost:5173"
     
+    # Bulk AI re-categorization (replay after prompt/model bumps)
+    RECATEGORIZE_PAGE_SIZE: int = 100  # Leads per checkpoint
+    RECATEGORIZE_BATCH_SIZE: int = 10  # Leads per LLM request
+    RECATEGORIZE_CONCURRENCY: int = 2  # Batch requests in flight per run
+    RECATEGORIZE_RATE_PER_MINUTE: int = 120  # Max leads re-categorized per minute
+    RECATEGORIZE_SLICE_SECONDS: float = 120.0  # Work per job before continuing in a new one (< JOB_LEASE_SECONDS)
+    
+    # Bulk email campaigns (Resend batch API)
+    EMAIL_CAMPAIGN_PAGE_SIZE: int = 500  # Recipients per checkpoint
+    EMAIL_CAMPAIGN_BATCH_SIZE: int = 100  # Emails per batch request (Resend allows 100)
+    EMAIL_CAMPAIGN_CONCURRENCY: int = 2  # Batch requests in flight per campaign
+    EMAIL_CAMPAIGN_RATE_PER_MINUTE: int = 1000  # Max emails sent per minute
+    EMAIL_CAMPAIGN_SLICE_SECONDS: float = 120.0  # Work per job before continuing in a new one (< JOB_LEASE_SECONDS)
+    
+    # Lead pipeline
+    LEAD_PIPELINE_MODE: str = "sync"  # sync: automate inline, background: return 202 and automate on workers
+    LEAD_PIPELINE_WORKERS: int = 4  # Workers in this process (0 = leave it to python -m app.worker)
+    
+    # Durable job queue
+    JOB_BATCH_SIZE: int = 5  # Jobs claimed per worker poll
+    JOB_POLL_INTERVAL_SECONDS: float = 2.0
+    JOB_LEASE_SECONDS: int = 300  # Redeliver if a worker holds a job longer than this
+    JOB_MAX_ATTEMPTS: int = 5  # Then the job is moved to dead letters
+    
+    # Delayed rule actions (timers in the job queue)
+    SCHEDULER_HORIZON_SECONDS: float = 300.0  # Due times this far ahead are held in memory to wake workers on time
+    SCHEDULER_REFRESH_SECONDS: float = 60.0  # How often they are reloaded from the database
+    
     # Server
     HOST: str = "0.0.0.0"
     PORT: int = 8000
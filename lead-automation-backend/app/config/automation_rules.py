@@ -6,7 +6,10 @@ Automation Rules Configuration
 This module defines workflow automation rules that trigger based on AI categorization.
 Each rule specifies criteria for matching and actions to execute.
 
-Actions are processed sequentially by the lead service.
+Actions are executed by AutomationExecutor: independent actions run
+concurrently, dependent ones (see AutomationExecutor.DEPENDENCIES) wait for
+the actions they need. Actions with a delay_* are deferred: they are stored
+as timers and fired by ActionScheduler (emails through the email outbox).
 """
 
 AUTOMATION_RULES = {
@@ -286,6 +289,10 @@ def get_matching_rule(ai_result: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+# Delayed actions of a lead in one of these statuses are dropped when due
+STOP_DELAYED_ACTIONS_STATUSES = ("converted", "lost")
+
+
 def get_all_rules() -> Dict[str, Dict[str, Any]]:
     """Get all automation rules for documentation/admin purposes"""
     return AUTOMATION_RULES
@@ -29,6 +29,7 @@ app = FastAPI(
     - **Analytics**: Dashboard, conversion funnel, SLA performance
     - **Follow-ups**: List pending, complete, snooze
     - **Approvals**: List pending, approve, reject
+    - **Campaigns**: Bulk nurture and reminder emails to selected leads
     """,
     docs_url="/docs",
     redoc_url="/redoc"
@@ -44,11 +45,42 @@ app.add_middleware(
 )
 
 # Register API routers
-from app.api import leads, analytics, approvals, follow_ups
+from app.api import leads, analytics, approvals, follow_ups, jobs, ai, campaigns
 app.include_router(leads.router)
 app.include_router(analytics.router)
 app.include_router(approvals.router)
 app.include_router(follow_ups.router)
+app.include_router(jobs.router)
+app.include_router(ai.router)
+app.include_router(campaigns.router)
+
+
+@app.on_event("startup")
+async def startup():
+    """Train the local AI fast path and start background lead automation workers"""
+    from app.services.ai_service import get_ai_service
+    await get_ai_service().train_local_classifier(settings.AI_LOCAL_TRAINING_LIMIT)
+    
+    # Outbox emails and delayed actions run on the pipeline workers in sync mode too
+    from app.services.lead_pipeline import get_lead_pipeline
+    await get_lead_pipeline().start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Drain background workers and release pooled connections"""
+    from app.services.lead_pipeline import get_lead_pipeline
+    from app.services.lead_service import get_lead_service
+    from app.services.ai_service import get_ai_service
+    from app.services.shadow_evaluation import get_shadow_evaluator
+    from app.services.email_service import get_email_service
+    from app.utils.db import close_db
+    await get_lead_pipeline().stop()
+    await get_lead_service().drain()
+    await get_shadow_evaluator().close()
+    await get_ai_service().close()
+    await get_email_service().close()
+    close_db()
 
 
 @app.get("/")
@@ -76,10 +108,14 @@ async def health_check():
     - status: overall system health
     - services: individual service statuses
     - database_stats: real-time metrics
+    - ai: AI call counters (circuit breaker, in-flight, coalesced, cache and local fast-path hit rates,
+      rate/spend budget usage)
+    - email: Resend sends in flight, sent and failed, template render cache hits
     """
     from app.utils.db import get_dashboard_stats
     from app.services.ai_service import get_ai_service
     from app.services.email_service import get_email_service
+    from app.services.email_templates import EmailTemplates
     
     # Test database connection
     db_status = "operational"
@@ -93,19 +129,27 @@ async def health_check():
     
     # Test AI service
     ai_status = "operational"
+    ai_stats = None
     try:
         ai = get_ai_service()
-        if ai.client is None:
-            ai_status = "not_configured"
+        if not settings.GROQ_API_KEY:
+            ai_status = "not_configured"  # The client exists either way; every call would fail
+        elif ai.breaker.state == "open":
+            ai_status = "circuit_open"  # Leads are categorized by fallback rules
+        elif ai.governor and ai.governor.budget_exhausted:
+            ai_status = "budget_exhausted"  # Fallback rules until the daily budget resets
+        ai_stats = ai.stats()
     except Exception as e:
         ai_status = f"error: {str(e)}"
     
     # Test Email service
     email_status = "operational"
+    email_stats = None
     try:
         email = get_email_service()
         if not email.from_email:
             email_status = "not_configured"
+        email_stats = {**email.transport.stats(), "template_cache": EmailTemplates.cache_info()}
     except Exception as e:
         email_status = f"error: {str(e)}"
     
@@ -125,7 +169,9 @@ async def health_check():
             "groq": ai_status,
             "resend": email_status
         },
-        "database_stats": db_stats if db_connected else None
+        "database_stats": db_stats if db_connected else None,
+        "ai": ai_stats,
+        "email": email_stats
     }
 
 
@@ -1,7 +1,8 @@
-from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, Dict, Any, List, ClassVar
 from datetime import datetime
 from uuid import UUID
+import re
 
 # ============================================
 # LEAD ACTIVITY MODELS
@@ -28,7 +29,7 @@ class LeadActivity(LeadActivityBase):
     lead_id: UUID
     created_at: datetime
     updated_at: datetime
-
+    
     class Config:
         from_attributes = True
 
@@ -67,6 +68,57 @@ class AIResultActivity(BaseModel):
         }
 
 
+class AICategorizationOutput(BaseModel):
+    """LLM categorization (the output stored in ai_result metadata)"""
+    priority: str  # high, medium, low
+    intent: str  # quote_request, information, complaint, partnership
+    lead_type: str  # architect, builder, contractor, homeowner
+    suggested_actions: List[str] = []
+    reasoning: Optional[str] = None
+    
+    ALLOWED_VALUES: ClassVar[Dict[str, set]] = {
+        "priority": {"high", "medium", "low"},
+        "intent": {"quote_request", "information", "complaint", "partnership"},
+        "lead_type": {"architect", "builder", "contractor", "homeowner"}
+    }
+    # Near misses LLMs produce, after lowercasing and joining words with "_"
+    ALIASES: ClassVar[Dict[str, str]] = {
+        "home_owner": "homeowner",
+        "quote": "quote_request",
+        "info": "information",
+        "inquiry": "information",
+        "product_info": "information"  # fallback_categorization's intent
+    }
+    
+    @classmethod
+    def canonical(cls, field: str, value: Any) -> Any:
+        """Normalized form of a choice (the value itself if it is not one)"""
+        if not isinstance(value, str):
+            return value
+        normalized = re.sub(r"[\s\-]+", "_", value.strip().lower())
+        normalized = cls.ALIASES.get(normalized, normalized)
+        return normalized if normalized in cls.ALLOWED_VALUES[field] else value
+    
+    @field_validator("priority", "intent", "lead_type", mode="before")
+    @classmethod
+    def normalize_choice(cls, value: Any, info) -> str:
+        if not isinstance(value, str):
+            raise ValueError(f"{info.field_name} must be a string")
+        normalized = cls.canonical(info.field_name, value)
+        if normalized not in cls.ALLOWED_VALUES[info.field_name]:
+            raise ValueError(f"Unknown {info.field_name} '{value}'")
+        return normalized
+    
+    @field_validator("suggested_actions", mode="before")
+    @classmethod
+    def normalize_actions(cls, value: Any) -> List[str]:
+        if value is None:
+            return []
+        if isinstance(value, str):
+            return [value]
+        return value
+
+
 class FollowUpActivity(BaseModel):
     """Follow-up activity metadata"""
     action: str  # call, email, meeting
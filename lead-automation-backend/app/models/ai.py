@@ -0,0 +1,13 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+# ============================================
+# AI OPERATIONS MODELS
+# ============================================
+
+class RecategorizeRequest(BaseModel):
+    """Options for a bulk re-categorization run (defaults from settings)"""
+    page_size: Optional[int] = Field(None, gt=0, le=1000)
+    batch_size: Optional[int] = Field(None, gt=0, le=50)
+    concurrency: Optional[int] = Field(None, gt=0, le=10)
+    rate_per_minute: Optional[int] = Field(None, gt=0)
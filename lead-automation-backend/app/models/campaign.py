@@ -0,0 +1,17 @@
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List, Literal
+
+# ============================================
+# EMAIL CAMPAIGN MODELS
+# ============================================
+
+class EmailCampaignRequest(BaseModel):
+    """Bulk template email to leads selected by status and AI priority"""
+    template_name: Literal["nurture_day_3", "follow_up_reminder"]
+    statuses: List[str] = Field(default_factory=lambda: ["new", "contacted", "nurturing"], min_length=1)
+    priorities: Optional[List[Literal["high", "medium", "low"]]] = None  # None = any priority
+    template_kwargs: Dict[str, Any] = Field(default_factory=dict)  # e.g. action and scheduled_date for follow_up_reminder
+    page_size: Optional[int] = Field(None, gt=0, le=5000)
+    chunk_size: Optional[int] = Field(None, gt=0, le=100)
+    concurrency: Optional[int] = Field(None, gt=0, le=10)
+    rate_per_minute: Optional[int] = Field(None, gt=0)
@@ -44,6 +44,7 @@ class Lead(LeadBase):
     created_at: datetime
     updated_at: datetime
     status: str
+    pipeline_status: Optional[str] = None  # pending, processing, completed, failed
     first_response_at: Optional[datetime] = None
     last_contact_at: Optional[datetime] = None
     conversion_date: Optional[datetime] = None
@@ -0,0 +1,205 @@
+from typing import Dict, Any, List, Optional, Callable
+from datetime import datetime, timezone
+import asyncio
+import heapq
+import logging
+from app.utils.db import execute_rpc, get_record, insert_records
+from app.services.automation_executor import AutomationExecutor
+from app.services.email_service import get_email_service
+from app.config.automation_rules import STOP_DELAYED_ACTIONS_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+class ActionScheduler:
+    """
+    Timers for delayed rule actions (delay_minutes/hours/days)
+    
+    Timers are automation_jobs rows whose run_at is the due time:
+    delayed emails are outbox send_email jobs, other actions are
+    delayed_action jobs. Both are written with the lead, and the partial
+    index on run_at makes insert and fire-next O(log n), so the table
+    holds any number of pending timers. Workers claim due rows in run_at
+    order, in batches, with SKIP LOCKED; after a restart overdue timers
+    are simply ready and fire oldest first.
+    
+    In process, a heap holds the due times within horizon_seconds
+    (reloaded every refresh_seconds), and a timer task wakes the
+    pipeline when the earliest comes due, so actions fire on time rather
+    than up to a poll interval late. Firing lag (claim time minus due
+    time) is tracked for /api/jobs/stats.
+    """
+    
+    JOB_TYPE = AutomationExecutor.DELAYED_JOB_TYPE
+    
+    def __init__(
+        self,
+        executor: AutomationExecutor,
+        horizon_seconds: float = 300.0,
+        refresh_seconds: float = 60.0,
+        max_tracked: int = 10000
+    ):
+        self.executor = executor
+        self.horizon_seconds = horizon_seconds
+        self.refresh_seconds = refresh_seconds
+        self.max_tracked = max_tracked
+        self._heap: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+        self._stop = asyncio.Event()
+        self.fired = 0
+        self.skipped = 0
+        self.wakeups = 0
+        self.lag = {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "last_seconds": None}
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+    
+    async def start(self, wake: Callable[[], None]) -> None:
+        """Start the timer task; wake() is called whenever timers come due (idempotent)"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._task = asyncio.create_task(self._run(wake), name="action-scheduler")
+    
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+    
+    async def load(self) -> int:
+        """Replace the heap with the timers due within the horizon (overdue ones included)"""
+        due_times = await execute_rpc("get_upcoming_job_times", {
+            "horizon_seconds": int(self.horizon_seconds),
+            "max_rows": self.max_tracked
+        }) or []
+        heap = [self._epoch(row["run_at"]) for row in due_times]
+        heapq.heapify(heap)
+        self._heap = heap
+        return len(heap)
+    
+    async def fire(self, job: Dict[str, Any]) -> None:
+        """
+        Job handler for delayed_action jobs: run the action now
+        
+        A failed action raises (so the job queue retries it) until the
+        last attempt, which records the failure. Emails carry an
+        Idempotency-Key derived from the job id, so a retry after a failed
+        activity write does not send them again.
+        """
+        payload = job["payload"]
+        lead = await get_record("leads", job["lead_id"])
+        if not lead or lead.get("status") in STOP_DELAYED_ACTIONS_STATUSES:
+            self.skipped += 1
+            logger.info(f"Skipping delayed {payload['action']['type']} for lead {job['lead_id']}: lead is closed or gone")
+            return
+        self.observe(job)
+        
+        action = {k: v for k, v in payload["action"].items() if not k.startswith("delay_")}
+        run = await self.executor.execute(
+            {"rule_name": payload.get("rule_name"), "actions": [action]},
+            {
+                "lead_data": lead,
+                "products": payload.get("products", []),
+                "ai_output": payload.get("ai_output", {}),
+                "approval": None,
+                "idempotency_key": f"job-{job['id']}"
+            }
+        )
+        timing = run["timings"][0]
+        if timing["status"] == "failed" and job.get("attempts", 1) < job.get("max_attempts", 1):
+            raise RuntimeError(f"Delayed {action['type']} failed: {timing.get('detail')}")
+        
+        if run["activities"]:
+            await insert_records("lead_activity", [
+                {
+                    **activity,
+                    "lead_id": lead["id"],
+                    "metadata": {**(activity.get("metadata") or {}), "scheduled_for": payload.get("scheduled_for")}
+                }
+                for activity in run["activities"]
+            ])
+        self.fired += 1
+    
+    def observe(self, job: Dict[str, Any]) -> None:
+        """Record how late a timer fired"""
+        scheduled_for = job["payload"].get("scheduled_for") or job.get("run_at")
+        if not scheduled_for:
+            return
+        lag = max(0.0, self._now() - self._epoch(scheduled_for))
+        self.lag["count"] += 1
+        self.lag["total_seconds"] += lag
+        self.lag["max_seconds"] = max(self.lag["max_seconds"], lag)
+        self.lag["last_seconds"] = round(lag, 3)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "tracked_timers": len(self._heap),
+            "next_due_in_seconds": (
+                round(self._heap[0] - self._now(), 1) if self._heap else None
+            ),
+            "fired": self.fired,
+            "skipped": self.skipped,
+            "wakeups": self.wakeups,
+            "lag_seconds": {
+                "last": self.lag["last_seconds"],
+                "mean": round(self.lag["total_seconds"] / self.lag["count"], 3) if self.lag["count"] else None,
+                "max": round(self.lag["max_seconds"], 3)
+            }
+        }
+    
+    async def _run(self, wake: Callable[[], None]) -> None:
+        next_refresh = 0.0
+        while not self._stop.is_set():
+            now = self._now()
+            if now >= next_refresh:
+                try:
+                    await self.load()
+                except Exception as e:
+                    logger.error(f"Could not load upcoming timers: {e}")
+                next_refresh = now + self.refresh_seconds
+            
+            if self._heap and self._heap[0] <= now:
+                while self._heap and self._heap[0] <= now:
+                    heapq.heappop(self._heap)
+                self.wakeups += 1
+                wake()
+                continue
+            
+            until = min(self._heap[0] if self._heap else next_refresh, next_refresh)
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=max(0.0, until - self._now()))
+            except asyncio.TimeoutError:
+                pass
+    
+    @staticmethod
+    def _now() -> float:
+        return (datetime.utcnow() - datetime(1970, 1, 1)).total_seconds()
+    
+    @staticmethod
+    def _epoch(value: Any) -> float:
+        """Seconds since the epoch of a timestamp (naive ones are UTC, as stored)"""
+        moment = value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+        if moment.tzinfo:
+            moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+        return (moment - datetime(1970, 1, 1)).total_seconds()
+
+
+# Initialize action scheduler (singleton)
+action_scheduler = None
+
+def get_action_scheduler() -> ActionScheduler:
+    """Get or create action scheduler instance"""
+    global action_scheduler
+    if action_scheduler is None:
+        from app.config import settings
+        action_scheduler = ActionScheduler(
+            # Fired in a retried job, so emails are sent inline here
+            executor=AutomationExecutor(get_email_service()),
+            horizon_seconds=settings.SCHEDULER_HORIZON_SECONDS,
+            refresh_seconds=settings.SCHEDULER_REFRESH_SECONDS
+        )
+    return action_scheduler
@@ -0,0 +1,140 @@
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from datetime import datetime, timedelta
+import hashlib
+import json
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CategorizationCache:
+    """
+    Content-addressed cache for AI categorizations
+    
+    Keys are a SHA-256 of the normalized categorize_lead input plus model
+    and prompt version, so a prompt or model change never serves stale
+    answers. Two tiers:
+    - in-memory LRU with TTL (per process)
+    - optional persistent tier in the ai_cache table, shared by all
+      API and worker processes and surviving restarts
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: int = 86400,
+        persistent: bool = False
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persistent = persistent
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(lead_input: Dict[str, Any], model: str, prompt_version: str) -> str:
+        """Hash of the input after normalizing case, whitespace and product order"""
+        def normalize(value: Optional[str]) -> str:
+            return re.sub(r"\s+", " ", (value or "").strip().lower())
+        
+        normalized = {
+            "role": normalize(lead_input.get("role")),
+            "location": normalize(lead_input.get("location")),
+            "products": sorted(normalize(p) for p in lead_input.get("products") or []),
+            "message": normalize(lead_input.get("message")),
+            "model": model,
+            "prompt_version": prompt_version
+        }
+        payload = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached categorization
+        
+        Returns:
+            Dict with output, model and cached_at, or None on a miss
+        """
+        entry = self._entries.get(key)
+        if entry:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        
+        if self.persistent:
+            value = await self._get_persistent(key)
+            if value:
+                self._remember(key, value)
+                self.persistent_hits += 1
+                return value
+        
+        self.misses += 1
+        return None
+    
+    async def set(self, key: str, output: Dict[str, Any], model: str, prompt_version: str) -> None:
+        """Store an AI categorization output (model is the one that answered)"""
+        value = {"output": output, "model": model, "cached_at": datetime.utcnow().isoformat()}
+        self._remember(key, value)
+        
+        if self.persistent:
+            await self._set_persistent(key, value, model, prompt_version)
+    
+    def clear(self) -> None:
+        """Drop the in-memory tier (persistent rows expire on their own)"""
+        self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit-rate counters (each hit is one LLM call saved)"""
+        lookups = self.hits + self.persistent_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.persistent_hits) / lookups, 4) if lookups else 0.0,
+            "llm_calls_saved": self.hits + self.persistent_hits
+        }
+    
+    def _remember(self, key: str, value: Dict[str, Any]) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    async def _get_persistent(self, key: str) -> Optional[Dict[str, Any]]:
+        from app.utils.db import query_records
+        
+        rows = await query_records("ai_cache", filters={"cache_key": key}, limit=1)
+        if not rows or rows[0]["expires_at"] <= datetime.utcnow().isoformat():
+            return None
+        return {"output": rows[0]["output"], "model": rows[0].get("model"), "cached_at": rows[0]["created_at"]}
+    
+    async def _set_persistent(
+        self,
+        key: str,
+        value: Dict[str, Any],
+        model: str,
+        prompt_version: str
+    ) -> None:
+        from app.utils.db import upsert_record
+        
+        try:
+            await upsert_record("ai_cache", {
+                "cache_key": key,
+                "output": value["output"],
+                "model": model,
+                "prompt_version": prompt_version,
+                "created_at": value["cached_at"],
+                "expires_at": (datetime.utcnow() + timedelta(seconds=self.ttl_seconds)).isoformat()
+            }, on_conflict="cache_key")
+        except Exception as e:
+            # The memory tier still has it; a lost write only costs a future LLM call
+            logger.warning(f"Could not persist AI cache entry: {e}")
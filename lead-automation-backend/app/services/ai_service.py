@@ -1,87 +1,80 @@
-from groq import Groq
-from typing import Dict, Any, Optional
-import json
+from groq import AsyncGroq, RateLimitError
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
+import httpx
+import random
+import re
+import time
 from datetime import datetime
 import logging
+from pydantic import ValidationError
+from app.models.activity import AICategorizationOutput
+from app.services.ai_cache import CategorizationCache
+from app.services.local_classifier import LocalClassifier, load_training_examples
+from app.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from app.services.json_repair import JSONRepairError, parse_llm_json
+from app.services.rate_governor import BudgetExceededError, RateGovernor
 
 logger = logging.getLogger(__name__)
 
+
+class InvalidOutputError(ValueError):
+    """Raised when an LLM answer does not fit AICategorizationOutput"""
+
+
 class AIService:
     """
     Production-ready AI service with:
     - Versioning for auditability
     - Fallback categorization
-    - Retry logic
+    - Retry logic with exponential backoff and jitter
+    - Circuit breaker that skips straight to fallback during outages
     - Error handling
+    - Async Groq client on a keep-alive connection pool, with a
+      semaphore bounding concurrent LLM calls
+    - Optional content-addressed cache for repeated inputs
+    - Single-flight coalescing of concurrent identical calls
+    - Batch categorization (many leads per LLM request)
+    - Deadline mode: fallback answer on time, AI answer later
+    - Optional local naive Bayes fast path for confident predictions
+    - Optional routing of simple leads to a smaller model, escalating to
+      MODEL_VERSION on invalid or low-confidence answers
+    - Local repair and validation of malformed LLM JSON; only answers
+      that cannot be repaired cost a retry
+    - Optional rate/spend governor: calls queue for requests/minute and
+      tokens/minute, and go to fallback when the daily budget is spent
+    - Static rules and examples sent as a fixed system message (an
+      identical prefix Groq can reuse), leads as a compact user message
+      with long messages cut to a token cap
     """
     
     MODEL_VERSION = "llama-3.3-70b-versatile"  # Updated to current model
-    PROMPT_VERSION = "v1.1"  # Enhanced with detailed rules and examples
+    PROMPT_VERSION = "v1.2"  # v1.1 rules as a static system message, compact lead message
+    BATCH_PROMPT_VERSION = "v1.2-batch"  # Same rules, many leads per request
     
-    def __init__(self, api_key: str):
-        self.client = Groq(api_key=api_key)
+    # Rough token estimate used to reserve rate budget before a call
+    CHARS_PER_TOKEN = 4
+    COMPLETION_TOKENS_PER_LEAD = 150
     
-    async def categorize_lead(
-        self, 
-        lead_data: Dict[str, Any],
-        retry_count: int = 3
-    ) -> Dict[str, Any]:
-        """
-        Categorize lead using AI with fallback
-        
-        Returns dict with:
-        - input: original lead data (for replay)
-        - output: AI categorization
-        - model: model version used
-        - prompt_version: prompt version used
-        - method: 'ai' or 'fallback'
-        - timestamp: when categorization happened
-        """
-        
-        # Store original input for replay capability
-        lead_input = {
-            "role": lead_data.get('role'),
-            "location": lead_data.get('location'),
-            "products": lead_data.get('products', []),
-            "message": lead_data.get('message')
-        }
-        
-        # Try AI categorization with retries
-        for attempt in range(retry_count):
-            try:
-                result = await self._call_groq_api(lead_input)
-                
-                return {
-                    "input": lead_input,
-                    "output": result,
-                    "model": self.MODEL_VERSION,
-                    "prompt_version": self.PROMPT_VERSION,
-                    "method": "ai",
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "attempt": attempt + 1
-                }
-                
-            except Exception as e:
-                logger.warning(f"AI categorization attempt {attempt + 1} failed: {e}")
-                if attempt < retry_count - 1:
-                    continue  # Retry
-                else:
-                    # All retries failed, use fallback
-                    logger.error(f"All AI attempts failed, using fallback for lead")
-                    return self.fallback_categorization(lead_input)
+    # Appended to the single-lead prompt for the small model only
+    ROUTING_CONFIDENCE_INSTRUCTION = (
+        '- Also include "confidence": a number from 0 to 1 for how sure you are of priority and intent\n'
+    )
     
-    async def _call_groq_api(self, lead_input: Dict) -> Dict:
-        """Make actual Groq API call with enhanced prompt"""
-        
-        prompt = f"""Analyze this lead inquiry and categorize it accurately.
-
-LEAD INFORMATION:
-- Role: {lead_input.get('role', 'Unknown')}
-- Location: {lead_input.get('location', 'Unknown')}
-- Products of Interest: {', '.join(lead_input.get('products', []))}
-- Message: {lead_input.get('message', 'No message')}
-
-CATEGORIZATION RULES:
+    # Keyword and role rules of the rule-based fallback
+    FALLBACK_URGENT_KEYWORDS = ("urgent", "asap", "immediately", "need now", "today")
+    FALLBACK_QUOTE_KEYWORDS = ("quote", "price", "cost", "budget", "estimate")
+    # Either keyword set makes a lead high priority: one precompiled match for both
+    FALLBACK_HIGH_PATTERN = re.compile("|".join(map(re.escape, FALLBACK_URGENT_KEYWORDS + FALLBACK_QUOTE_KEYWORDS)))
+    FALLBACK_LEAD_TYPES = {
+        "home owner": "home_owner",
+        "architect": "architect",
+        "builder": "builder",
+        "contractor": "contractor"
+    }
+    
+    # Static part of the prompt, shared by single and batch requests
+    CATEGORIZATION_RULES = """CATEGORIZATION RULES:
 
 1. PRIORITY (high/medium/low):
    - HIGH: 
@@ -120,40 +113,721 @@ EXAMPLES:
 
 Example 1:
 Input: Architect, "Need urgent quote for 5000 sq ft luxury project"
-Output: {{"priority": "high", "intent": "quote_request", "lead_type": "architect", "suggested_actions": ["call", "send_quote"]}}
+Output: {"priority": "high", "intent": "quote_request", "lead_type": "architect", "suggested_actions": ["call", "send_quote"]}
 
 Example 2:
 Input: Home Owner, "Just looking at flooring options"
-Output: {{"priority": "low", "intent": "information", "lead_type": "homeowner", "suggested_actions": ["nurture", "email"]}}
+Output: {"priority": "low", "intent": "information", "lead_type": "homeowner", "suggested_actions": ["nurture", "email"]}
 
 Example 3:
 Input: Builder, "Bulk pricing for 50 unit residential complex"
-Output: {{"priority": "high", "intent": "quote_request", "lead_type": "builder", "suggested_actions": ["call", "send_quote"]}}
+Output: {"priority": "high", "intent": "quote_request", "lead_type": "builder", "suggested_actions": ["call", "send_quote"]}
 
-RESPOND IN THIS EXACT JSON FORMAT (no additional text):
-{{
+"""
+    
+    OUTPUT_RULES = """IMPORTANT: 
+- Use lowercase for all values except in reasoning
+- lead_type must be exactly: architect, builder, contractor, or homeowner
+- Respond ONLY with valid JSON, no markdown formatting
+"""
+    
+    # System messages, built once per PROMPT_VERSION; only the user
+    # message changes between calls
+    SYSTEM_PROMPT = (
+        "Analyze the lead inquiry in the user message (role, location, products of interest, "
+        "message) and categorize it accurately.\n\n"
+        + CATEGORIZATION_RULES
+        + """RESPOND IN THIS EXACT JSON FORMAT (no additional text):
+{
     "priority": "high|medium|low",
     "intent": "quote_request|information|complaint|partnership",
     "lead_type": "architect|builder|contractor|homeowner",
     "suggested_actions": ["action1", "action2"],
     "reasoning": "Brief explanation of categorization"
-}}
+}
+
+"""
+        + OUTPUT_RULES
+    )
+    ROUTED_SYSTEM_PROMPT = SYSTEM_PROMPT + ROUTING_CONFIDENCE_INSTRUCTION
+    BATCH_SYSTEM_PROMPT = (
+        "Analyze each lead inquiry in the user message (one per line, index in brackets) "
+        "and categorize each one accurately.\n\n"
+        + CATEGORIZATION_RULES
+        + """RESPOND IN THIS EXACT JSON FORMAT (no additional text):
+{
+    "results": [
+        {
+            "index": 0,
+            "priority": "high|medium|low",
+            "intent": "quote_request|information|complaint|partnership",
+            "lead_type": "architect|builder|contractor|homeowner",
+            "suggested_actions": ["action1", "action2"],
+            "reasoning": "Brief explanation of categorization"
+        }
+    ]
+}
 
-IMPORTANT: 
-- Use lowercase for all values except in reasoning
-- lead_type must be exactly: architect, builder, contractor, or homeowner
-- Respond ONLY with valid JSON, no markdown formatting
 """
+        + OUTPUT_RULES
+        + "- Return exactly one result per lead, with the lead's index\n"
+    )
+    
+    def __init__(
+        self,
+        api_key: str,
+        max_concurrency: int = 10,
+        timeout: float = 30.0,
+        cache: Optional[CategorizationCache] = None,
+        local_classifier: Optional[LocalClassifier] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        retry_base_delay: float = 0.25,
+        retry_max_delay: float = 4.0,
+        small_model: Optional[str] = None,
+        routing_max_words: int = 40,
+        routing_max_products: int = 3,
+        escalation_confidence: float = 0.7,
+        governor: Optional[RateGovernor] = None,
+        max_message_tokens: int = 300
+    ):
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency
+            ),
+            timeout=timeout
+        )
+        # Retries are done (and seen by the breaker) in categorize_lead
+        self.client = AsyncGroq(api_key=api_key, http_client=self.http_client, max_retries=0)
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.cache = cache
+        self.local_classifier = local_classifier
+        self.breaker = breaker or CircuitBreaker("groq")
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.small_model = small_model
+        self.routing_max_words = routing_max_words
+        self.routing_max_products = routing_max_products
+        self.escalation_confidence = escalation_confidence
+        self.governor = governor
+        self.max_message_tokens = max_message_tokens
+        self.truncated_messages = 0
+        self.routed = {"small": 0, "large": 0, "escalated": 0}
+        self.model_stats: Dict[str, Dict[str, Any]] = {}
+        self.output_stats = {"valid": 0, "repaired": 0, "normalized": 0, "unrepairable": 0, "invalid": 0}
+        self.retries = 0
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.coalesced_calls = 0
+        self.deadline_calls = 0
+        self.deadline_misses = 0
+    
+    @property
+    def models(self) -> List[str]:
+        """LLMs that may answer a categorization"""
+        return [self.MODEL_VERSION] + ([self.small_model] if self.small_model else [])
+    
+    async def close(self) -> None:
+        """Release pooled Groq connections (app shutdown)"""
+        await self.client.close()
+    
+    async def train_local_classifier(self, limit: int = 5000) -> int:
+        """(Re)train the local fast path from stored ai_result activities"""
+        if not self.local_classifier:
+            return 0
+        examples = await load_training_examples(limit)
+        return self.local_classifier.train(examples)
+    
+    async def categorize_lead(
+        self, 
+        lead_data: Dict[str, Any],
+        retry_count: int = 3
+    ) -> Dict[str, Any]:
+        """
+        Categorize lead using AI with fallback
         
-        response = self.client.chat.completions.create(
-            model=self.MODEL_VERSION,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            response_format={"type": "json_object"},
-            timeout=30  # 30 second timeout
+        Returns dict with:
+        - input: original lead data (for replay)
+        - output: AI categorization
+        - model: model that answered
+        - prompt_version: prompt version used
+        - method: 'ai', 'cache', 'local' or 'fallback'
+        - timestamp: when categorization happened
+        - cached_at: when the cached answer was produced (cache hits only)
+        - confidence: local classifier confidence (local results only)
+        - coalesced: True if this call shared another caller's in-flight request
+        - routing: router decision (AI results with routing enabled only)
+        """
+        
+        # Store original input for replay capability
+        lead_input = self._lead_input(lead_data)
+        
+        key = CategorizationCache.make_key(lead_input, self.MODEL_VERSION, self.PROMPT_VERSION)
+        
+        # Serve repeated inputs from cache
+        cached = await self._cached_result(lead_input, key)
+        if cached:
+            return cached
+        
+        # Confident local predictions skip the LLM, except a sampled few
+        # that are sent anyway to measure agreement
+        audit = None
+        local = self._local_result(lead_input)
+        if local:
+            if random.random() >= self.local_classifier.audit_rate:
+                return local
+            audit = local["output"]
+        
+        # Identical concurrent calls share one request. It runs as its own
+        # task so a cancelled caller does not cancel it for the others.
+        coalesced = False
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._categorize_with_ai(lead_input, key, retry_count))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            coalesced = True
+            self.coalesced_calls += 1
+        
+        result = await asyncio.shield(task)
+        
+        if audit and result["method"] == "ai":
+            self.local_classifier.record_agreement(audit, result["output"])
+        
+        if coalesced:
+            return {**result, "input": lead_input, "coalesced": True}
+        return result
+    
+    async def categorize_lead_within(
+        self,
+        lead_data: Dict[str, Any],
+        deadline: float,
+        retry_count: int = 3
+    ) -> Tuple[Dict[str, Any], Optional[asyncio.Task]]:
+        """
+        Categorize lead, but never wait longer than deadline seconds
+        
+        Returns:
+            (result, pending): the categorize_lead result and None if it
+            finished in time; otherwise a fallback result (marked
+            deadline_exceeded) and the still-running categorize_lead task,
+            whose result the caller can apply once it lands
+        """
+        self.deadline_calls += 1
+        task = asyncio.create_task(self.categorize_lead(lead_data, retry_count))
+        done, _ = await asyncio.wait({task}, timeout=deadline)
+        if task in done:
+            return task.result(), None
+        
+        self.deadline_misses += 1
+        logger.info(f"AI categorization exceeded {deadline}s deadline, proceeding with fallback")
+        result = self.fallback_categorization(self._lead_input(lead_data))
+        result["deadline_exceeded"] = True
+        return result, task
+    
+    @staticmethod
+    def _lead_input(lead_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Fields of a lead that the categorization depends on"""
+        return {
+            "role": lead_data.get('role'),
+            "location": lead_data.get('location'),
+            "products": lead_data.get('products', []),
+            "message": lead_data.get('message')
+        }
+    
+    async def _cached_result(self, lead_input: Dict[str, Any], key: str) -> Optional[Dict[str, Any]]:
+        """categorize_lead result from the cache, or None"""
+        if not self.cache:
+            return None
+        cached = await self.cache.get(key)
+        if not cached:
+            return None
+        return {
+            "input": lead_input,
+            "output": cached["output"],
+            "model": cached.get("model") or self.MODEL_VERSION,
+            "prompt_version": self.PROMPT_VERSION,
+            "method": "cache",
+            "timestamp": datetime.utcnow().isoformat(),
+            "cached_at": cached["cached_at"]
+        }
+    
+    def _local_result(self, lead_input: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """categorize_lead result from a confident local prediction, or None"""
+        if not self.local_classifier:
+            return None
+        prediction = self.local_classifier.predict(lead_input)
+        if not prediction or prediction[1] < self.local_classifier.confidence_threshold:
+            return None
+        output, confidence = prediction
+        return {
+            "input": lead_input,
+            "output": output,
+            "model": LocalClassifier.MODEL_NAME,
+            "prompt_version": "N/A",
+            "method": "local",
+            "timestamp": datetime.utcnow().isoformat(),
+            "confidence": round(confidence, 4)
+        }
+    
+    async def _categorize_with_ai(
+        self,
+        lead_input: Dict[str, Any],
+        key: str,
+        retry_count: int
+    ) -> Dict[str, Any]:
+        """AI categorization with retries, then fallback"""
+        
+        # Try AI categorization with retries
+        for attempt in range(retry_count):
+            try:
+                result, model, routing = await self._call_routed(lead_input)
+                
+                if self.cache:
+                    await self.cache.set(key, result, model, self.PROMPT_VERSION)
+                
+                categorization = {
+                    "input": lead_input,
+                    "output": result,
+                    "model": model,
+                    "prompt_version": self.PROMPT_VERSION,
+                    "method": "ai",
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "attempt": attempt + 1
+                }
+                if routing:
+                    categorization["routing"] = routing
+                return categorization
+                
+            except CircuitOpenError:
+                logger.warning("Groq circuit open, using fallback for lead")
+                return self.fallback_categorization(lead_input)
+                
+            except BudgetExceededError as e:
+                logger.warning(f"{e}, using fallback for lead")
+                return self.fallback_categorization(lead_input)
+                
+            except Exception as e:
+                logger.warning(f"AI categorization attempt {attempt + 1} failed: {e}")
+                if attempt < retry_count - 1:
+                    self.retries += 1
+                    await asyncio.sleep(self.backoff_delay(attempt + 1))
+                    continue  # Retry
+                else:
+                    # All retries failed, use fallback
+                    logger.error(f"All AI attempts failed, using fallback for lead")
+                    return self.fallback_categorization(lead_input)
+    
+    async def categorize_leads(
+        self,
+        leads: List[Dict[str, Any]],
+        batch_size: int = 10,
+        retry_count: int = 3,
+        allow_local: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Categorize many leads, packing up to batch_size per LLM request
+        
+        The static rules and examples are sent once per batch instead of
+        once per lead. Cached, duplicate and confidently locally classified
+        inputs are not sent at all.
+        Leads missing from (or malformed in) a batch response go through
+        categorize_lead, which retries and falls back on its own.
+        
+        Args:
+            allow_local: Let the local classifier answer confident leads
+                (replays pass False to get LLM answers only)
+        
+        Returns:
+            One result per lead, in input order (same shape as categorize_lead)
+        """
+        lead_inputs = [self._lead_input(lead) for lead in leads]
+        keys = [
+            CategorizationCache.make_key(lead_input, self.MODEL_VERSION, self.PROMPT_VERSION)
+            for lead_input in lead_inputs
+        ]
+        
+        # Resolve each distinct input once
+        unique: Dict[str, Dict[str, Any]] = {}
+        for key, lead_input in zip(keys, lead_inputs):
+            unique.setdefault(key, lead_input)
+        
+        resolved: Dict[str, Dict[str, Any]] = {}
+        pending = []
+        for key, lead_input in unique.items():
+            result = await self._cached_result(lead_input, key)
+            if not result and allow_local:
+                result = self._local_result(lead_input)
+            if result:
+                resolved[key] = result
+            else:
+                pending.append(key)
+        
+        chunks = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        for chunk_results in await asyncio.gather(*[
+            self._categorize_batch([unique[key] for key in chunk], retry_count)
+            for chunk in chunks
+        ]):
+            for result in chunk_results:
+                key = CategorizationCache.make_key(result["input"], self.MODEL_VERSION, self.PROMPT_VERSION)
+                resolved[key] = result
+        
+        return [
+            {**resolved[key], "input": lead_input}
+            for key, lead_input in zip(keys, lead_inputs)
+        ]
+    
+    async def _categorize_batch(
+        self,
+        lead_inputs: List[Dict[str, Any]],
+        retry_count: int
+    ) -> List[Dict[str, Any]]:
+        """One batch request; per-lead calls for anything it did not answer"""
+        if len(lead_inputs) == 1:
+            return [await self.categorize_lead(lead_inputs[0], retry_count)]
+        
+        try:
+            outputs = await self._call_groq_api_batch(lead_inputs)
+        except BudgetExceededError as e:
+            logger.warning(f"{e}, using fallback for {len(lead_inputs)} batched leads")
+            return [self.fallback_categorization(lead_input) for lead_input in lead_inputs]
+        except Exception as e:
+            logger.warning(f"Batch categorization of {len(lead_inputs)} leads failed: {e}")
+            outputs = {}
+        
+        results = []
+        retry = []
+        for index, lead_input in enumerate(lead_inputs):
+            output = outputs.get(index)
+            if output is None:
+                retry.append(lead_input)
+                continue
+            
+            if self.cache:
+                key = CategorizationCache.make_key(lead_input, self.MODEL_VERSION, self.PROMPT_VERSION)
+                await self.cache.set(key, output, self.MODEL_VERSION, self.PROMPT_VERSION)
+            
+            results.append({
+                "input": lead_input,
+                "output": output,
+                "model": self.MODEL_VERSION,
+                "prompt_version": self.BATCH_PROMPT_VERSION,
+                "method": "ai",
+                "timestamp": datetime.utcnow().isoformat(),
+                "batch_size": len(lead_inputs)
+            })
+        
+        if retry:
+            logger.warning(f"{len(retry)} of {len(lead_inputs)} batched leads unanswered, categorizing individually")
+            results.extend(await asyncio.gather(*[
+                self.categorize_lead(lead_input, retry_count) for lead_input in retry
+            ]))
+        
+        return results
+    
+    def route(self, lead_input: Dict[str, Any]) -> Tuple[str, str]:
+        """(model, reason) the router picks for a lead"""
+        if not self.small_model:
+            return self.MODEL_VERSION, "routing_disabled"
+        if len((lead_input.get('message') or '').split()) > self.routing_max_words:
+            return self.MODEL_VERSION, "long_message"
+        if len(lead_input.get('products') or []) > self.routing_max_products:
+            return self.MODEL_VERSION, "many_products"
+        return self.small_model, "simple"
+    
+    async def _call_routed(self, lead_input: Dict[str, Any]) -> Tuple[Dict, str, Optional[Dict[str, Any]]]:
+        """
+        Categorize with the routed model, escalating when it is unsure
+        
+        Returns:
+            (output, model that answered, routing metadata or None when
+            routing is disabled)
+        """
+        model, reason = self.route(lead_input)
+        if model == self.MODEL_VERSION:
+            output = await self._call_groq_api(lead_input)
+            if not self.small_model:
+                return output, model, None
+            self.routed["large"] += 1
+            return output, model, {"route": "large", "reason": reason, "escalated": False}
+        
+        self.routed["small"] += 1
+        confidence = None
+        try:
+            output = await self._call_groq_api(lead_input, model=model)
+            confidence = output.pop("confidence", None)
+            escalation = self._escalation_reason(confidence)
+        except (CircuitOpenError, BudgetExceededError):
+            raise
+        except InvalidOutputError:
+            escalation = "invalid_output"
+        except Exception as e:
+            logger.warning(f"Small model {model} failed, escalating to {self.MODEL_VERSION}: {e}")
+            escalation = "small_model_error"
+        
+        routing = {"route": "small", "reason": reason, "small_model_confidence": confidence}
+        if escalation is None:
+            return output, model, {**routing, "escalated": False}
+        
+        self.routed["escalated"] += 1
+        output = await self._call_groq_api(lead_input)
+        return output, self.MODEL_VERSION, {**routing, "escalated": True, "escalation_reason": escalation}
+    
+    def _escalation_reason(self, confidence: Any) -> Optional[str]:
+        """Why a valid small-model answer should be redone by MODEL_VERSION, or None"""
+        if not isinstance(confidence, (int, float)) or confidence < self.escalation_confidence:
+            return "low_confidence"
+        return None
+    
+    def backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with jitter before retry number attempt"""
+        ceiling = min(self.retry_max_delay, self.retry_base_delay * (2 ** (attempt - 1)))
+        return random.uniform(ceiling / 2, ceiling)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Counters for /health"""
+        return {
+            "in_flight": len(self._in_flight),
+            "coalesced_calls": self.coalesced_calls,
+            "deadline_calls": self.deadline_calls,
+            "deadline_misses": self.deadline_misses,
+            "circuit_breaker": self.breaker.stats(),
+            "cache": self.cache.stats() if self.cache else None,
+            "local_classifier": self.local_classifier.stats() if self.local_classifier else None,
+            "routing": {
+                "small_model": self.small_model,
+                **self.routed,
+                "escalation_rate": (
+                    round(self.routed["escalated"] / self.routed["small"], 4) if self.routed["small"] else 0.0
+                )
+            } if self.small_model else None,
+            "llm_output": {**self.output_stats, "retries": self.retries},
+            "truncated_messages": self.truncated_messages,
+            "budget": self.governor.stats() if self.governor else None,
+            "models": {
+                model: {
+                    "calls": counters["calls"],
+                    "errors": counters["errors"],
+                    "avg_latency_ms": round(counters["latency_ms"] / counters["calls"], 1) if counters["calls"] else 0.0,
+                    "prompt_tokens": counters["prompt_tokens"],
+                    "completion_tokens": counters["completion_tokens"],
+                    "cached_prompt_tokens": counters["cached_prompt_tokens"],
+                    "total_tokens": counters["prompt_tokens"] + counters["completion_tokens"]
+                }
+                for model, counters in self.model_stats.items()
+            }
+        }
+    
+    async def _call_groq_api(self, lead_input: Dict, model: Optional[str] = None) -> Dict:
+        """Make actual Groq API call with enhanced prompt (MODEL_VERSION unless model is given)"""
+        
+        messages = self.build_messages(lead_input, model)
+        if not model or model == self.MODEL_VERSION:
+            return self._validated_output(await self._complete_json(messages))
+        
+        response = await self._complete_json(messages, model)
+        confidence = response.pop("confidence", None)
+        return {**self._validated_output(response), "confidence": confidence}
+    
+    def build_messages(self, lead_input: Dict, model: Optional[str] = None) -> List[Dict[str, str]]:
+        """Single-lead categorization messages (PROMPT_VERSION)"""
+        
+        routed = model is not None and model != self.MODEL_VERSION
+        return [
+            {"role": "system", "content": self.ROUTED_SYSTEM_PROMPT if routed else self.SYSTEM_PROMPT},
+            {"role": "user", "content": self._lead_line(lead_input)}
+        ]
+    
+    def estimate_tokens(
+        self,
+        messages: List[Dict[str, str]],
+        completion_tokens: int = COMPLETION_TOKENS_PER_LEAD
+    ) -> int:
+        """Rough token count of a call, reserved with the rate governor before sending"""
+        return sum(len(message["content"]) for message in messages) // self.CHARS_PER_TOKEN + completion_tokens
+    
+    def _lead_line(self, lead_input: Dict) -> str:
+        """One lead on one line, message cut to max_message_tokens"""
+        return (
+            f"Role: {lead_input.get('role', 'Unknown')} | "
+            f"Location: {lead_input.get('location', 'Unknown')} | "
+            f"Products: {', '.join(lead_input.get('products', []))} | "
+            f"Message: {self._compact_message(lead_input.get('message'))}"
         )
+    
+    def _compact_message(self, message: Optional[str]) -> str:
+        """Message with whitespace collapsed, cut at a word boundary past max_message_tokens"""
+        message = " ".join((message or "No message").split())
+        limit = self.max_message_tokens * self.CHARS_PER_TOKEN
+        if not self.max_message_tokens or len(message) <= limit:
+            return message
+        self.truncated_messages += 1
+        return message[:limit].rsplit(" ", 1)[0] + " [truncated]"
+    
+    async def _call_groq_api_batch(self, lead_inputs: List[Dict]) -> Dict[int, Dict]:
+        """
+        Categorize several leads in one Groq call
+        
+        Returns:
+            Valid outputs keyed by the lead's index in lead_inputs
+        """
         
-        return json.loads(response.choices[0].message.content)
+        messages = [
+            {"role": "system", "content": self.BATCH_SYSTEM_PROMPT},
+            {"role": "user", "content": "\n".join(
+                f"[{index}] {self._lead_line(lead_input)}" for index, lead_input in enumerate(lead_inputs)
+            )}
+        ]
+        
+        response = await self._complete_json(
+            messages,
+            completion_tokens=self.COMPLETION_TOKENS_PER_LEAD * len(lead_inputs)
+        )
+        
+        outputs = {}
+        for item in response.get("results", []):
+            if not isinstance(item, dict):
+                continue
+            index = item.pop("index", None)
+            if not isinstance(index, int) or not 0 <= index < len(lead_inputs):
+                continue
+            try:
+                outputs[index] = self._validated_output(item)
+            except InvalidOutputError:
+                continue  # Categorized individually instead
+        return outputs
+    
+    async def _complete_json(
+        self,
+        messages: List[Dict[str, str]],
+        model: Optional[str] = None,
+        completion_tokens: int = COMPLETION_TOKENS_PER_LEAD
+    ) -> Dict:
+        """Send messages in JSON mode and parse the response"""
+        
+        model = model or self.MODEL_VERSION
+        if not self.breaker.allow_request():
+            raise CircuitOpenError("Groq circuit is open")
+        
+        estimated_tokens = self.estimate_tokens(messages, completion_tokens)
+        if self.governor:
+            try:
+                await self.governor.acquire(estimated_tokens)
+            except (BudgetExceededError, asyncio.CancelledError):
+                self.breaker.release_probe()
+                raise
+        
+        # Bounded so a burst of leads cannot open unlimited LLM calls
+        try:
+            async with self.semaphore:
+                started = time.perf_counter()
+                response = await self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0.3,
+                    response_format={"type": "json_object"},
+                    timeout=self.timeout
+                )
+        except asyncio.CancelledError:
+            self.breaker.release_probe()
+            raise
+        except Exception as e:
+            self._record_model_call(model, started, None)
+            if self.governor and isinstance(e, RateLimitError):
+                self.governor.backoff(self._retry_after(e))
+            failed_generation = self._failed_generation(e)
+            if failed_generation is None:
+                self.breaker.record_failure()
+                raise
+            # Groq is up but rejected the model's invalid JSON: repair it here
+            self.breaker.record_success()
+            return self._parse_output(failed_generation)
+        self.breaker.record_success()
+        usage = self._record_model_call(model, started, response, estimated_tokens)
+        if self.governor:
+            self.governor.record_usage(estimated_tokens, usage)
+        
+        return self._parse_output(response.choices[0].message.content)
+    
+    def _parse_output(self, content: str) -> Dict:
+        """Parse LLM JSON, repairing fences, trailing commas and truncation"""
+        try:
+            data, repaired = parse_llm_json(content)
+        except JSONRepairError:
+            self.output_stats["unrepairable"] += 1
+            raise
+        self.output_stats["repaired" if repaired else "valid"] += 1
+        return data
+    
+    def _validated_output(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Output checked against AICategorizationOutput, with values normalized"""
+        try:
+            output = AICategorizationOutput.model_validate(data).model_dump()
+        except ValidationError as e:
+            self.output_stats["invalid"] += 1
+            raise InvalidOutputError(f"LLM output failed validation ({e.error_count()} errors)") from e
+        if any(output[field] != data.get(field) for field in AICategorizationOutput.ALLOWED_VALUES):
+            self.output_stats["normalized"] += 1
+        return output
+    
+    @staticmethod
+    def _retry_after(error: RateLimitError) -> float:
+        """Seconds Groq asked us to wait (retry-after header), 1s if absent"""
+        try:
+            return float(error.response.headers.get("retry-after", 1.0))
+        except (TypeError, ValueError):
+            return 1.0
+    
+    @staticmethod
+    def _failed_generation(error: Exception) -> Optional[str]:
+        """Text Groq rejected in JSON mode (json_validate_failed), if that is the error"""
+        body = getattr(error, "body", None)
+        details = body.get("error", body) if isinstance(body, dict) else None
+        if not isinstance(details, dict) or details.get("code") != "json_validate_failed":
+            return None
+        return details.get("failed_generation")
+    
+    def _record_model_call(
+        self,
+        model: str,
+        started: float,
+        response: Any,
+        estimated_tokens: Optional[int] = None
+    ) -> Optional[int]:
+        """
+        Per-model latency and token counters (response is None on errors)
+        
+        Returns:
+            Total tokens Groq reported for the call, or None
+        """
+        counters = self.model_stats.setdefault(model, {
+            "calls": 0, "errors": 0, "latency_ms": 0.0,
+            "prompt_tokens": 0, "completion_tokens": 0, "cached_prompt_tokens": 0
+        })
+        latency_ms = (time.perf_counter() - started) * 1000
+        counters["calls"] += 1
+        counters["latency_ms"] += latency_ms
+        if response is None:
+            counters["errors"] += 1
+            return None
+        usage = getattr(response, "usage", None)
+        total = None
+        for field in ("prompt_tokens", "completion_tokens"):
+            tokens = getattr(usage, field, None)
+            if isinstance(tokens, int):
+                counters[field] += tokens
+                total = (total or 0) + tokens
+        cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+        if isinstance(cached, int):
+            counters["cached_prompt_tokens"] += cached
+        logger.info(
+            f"Groq call to {model}: {getattr(usage, 'prompt_tokens', None)} prompt "
+            f"({cached if isinstance(cached, int) else 0} cached) + "
+            f"{getattr(usage, 'completion_tokens', None)} completion tokens, "
+            f"estimated {estimated_tokens}, {latency_ms:.0f} ms"
+        )
+        return total
     
     def fallback_categorization(self, lead_input: Dict) -> Dict:
         """
@@ -165,11 +839,8 @@ IMPORTANT:
         role = (lead_input.get('role') or '').lower()
         
         # Determine priority based on keywords
-        urgent_keywords = ["urgent", "asap", "immediately", "need now", "today"]
-        quote_keywords = ["quote", "price", "cost", "budget", "estimate"]
-        
-        is_urgent = any(kw in message for kw in urgent_keywords)
-        wants_quote = any(kw in message for kw in quote_keywords)
+        is_urgent = any(kw in message for kw in self.FALLBACK_URGENT_KEYWORDS)
+        wants_quote = any(kw in message for kw in self.FALLBACK_QUOTE_KEYWORDS)
         
         if is_urgent or wants_quote:
             priority = "high"
@@ -181,13 +852,7 @@ IMPORTANT:
             intent = "product_info"
         
         # Map role to lead_type
-        lead_type_map = {
-            "home owner": "home_owner",
-            "architect": "architect",
-            "builder": "builder",
-            "contractor": "contractor"
-        }
-        lead_type = lead_type_map.get(role, "home_owner")
+        lead_type = self.FALLBACK_LEAD_TYPES.get(role, "home_owner")
         
         return {
             "input": lead_input,
@@ -203,6 +868,63 @@ IMPORTANT:
             "method": "fallback",
             "timestamp": datetime.utcnow().isoformat()
         }
+    
+    def fallback_categorization_batch(
+        self,
+        messages: List[Optional[str]],
+        roles: List[Optional[str]],
+        lead_inputs: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """
+        Column-wise fallback_categorization for offline backfills
+        
+        Same rules and result schema as the per-lead version, but every
+        message is checked with one search of FALLBACK_HIGH_PATTERN
+        instead of a test per keyword, and the result rows share one
+        timestamp and outcome table.
+        
+        Args:
+            messages: Lead messages
+            roles: Lead roles, aligned with messages
+            lead_inputs: Original inputs to echo as "input" (defaults to
+                {"role", "message"} built from the columns)
+        
+        Returns:
+            One result per lead, in input order
+        """
+        if len(messages) != len(roles) or (lead_inputs is not None and len(lead_inputs) != len(messages)):
+            raise ValueError("messages, roles and lead_inputs must have the same length")
+        
+        search = self.FALLBACK_HIGH_PATTERN.search
+        high = [search((message or '').lower()) is not None for message in messages]
+        
+        lead_types = self.FALLBACK_LEAD_TYPES
+        if lead_inputs is None:
+            lead_inputs = [{"role": role, "message": message} for role, message in zip(roles, messages)]
+        
+        # (intent, priority, suggested_action) for high / other leads
+        outcomes = {
+            True: ("quote_request", "high", "call_within_30_min"),
+            False: ("product_info", "medium", "email_response")
+        }
+        timestamp = datetime.utcnow().isoformat()
+        return [
+            {
+                "input": lead_input,
+                "output": {
+                    "intent": outcomes[is_high][0],
+                    "lead_type": lead_types.get((role or '').lower(), "home_owner"),
+                    "priority": outcomes[is_high][1],
+                    "suggested_action": outcomes[is_high][2],
+                    "reasoning": "Fallback rule-based categorization (AI unavailable)"
+                },
+                "model": "rule_based_fallback",
+                "prompt_version": "N/A",
+                "method": "fallback",
+                "timestamp": timestamp
+            }
+            for lead_input, role, is_high in zip(lead_inputs, roles, high)
+        ]
 
 
 # Initialize AI service (singleton)
@@ -213,5 +935,37 @@ def get_ai_service() -> AIService:
     global ai_service
     if ai_service is None:
         from app.config import settings
-        ai_service = AIService(api_key=settings.GROQ_API_KEY)
+        ai_service = AIService(
+            api_key=settings.GROQ_API_KEY,
+            max_concurrency=settings.GROQ_MAX_CONCURRENCY,
+            timeout=settings.GROQ_TIMEOUT_SECONDS,
+            cache=CategorizationCache(
+                max_entries=settings.AI_CACHE_MAX_ENTRIES,
+                ttl_seconds=settings.AI_CACHE_TTL_SECONDS,
+                persistent=settings.AI_CACHE_PERSISTENT
+            ) if settings.AI_CACHE_ENABLED else None,
+            local_classifier=LocalClassifier(
+                confidence_threshold=settings.AI_LOCAL_CONFIDENCE_THRESHOLD,
+                min_samples=settings.AI_LOCAL_MIN_SAMPLES,
+                audit_rate=settings.AI_LOCAL_AUDIT_RATE
+            ) if settings.AI_LOCAL_CLASSIFIER_ENABLED else None,
+            breaker=CircuitBreaker(
+                "groq",
+                failure_threshold=settings.GROQ_BREAKER_FAILURE_THRESHOLD,
+                reset_timeout=settings.GROQ_BREAKER_RESET_SECONDS
+            ),
+            retry_base_delay=settings.GROQ_RETRY_BASE_DELAY_SECONDS,
+            retry_max_delay=settings.GROQ_RETRY_MAX_DELAY_SECONDS,
+            small_model=settings.AI_SMALL_MODEL if settings.AI_ROUTING_ENABLED else None,
+            routing_max_words=settings.AI_ROUTING_MAX_WORDS,
+            routing_max_products=settings.AI_ROUTING_MAX_PRODUCTS,
+            escalation_confidence=settings.AI_ESCALATION_CONFIDENCE,
+            max_message_tokens=settings.AI_MAX_MESSAGE_TOKENS,
+            governor=RateGovernor(
+                requests_per_minute=settings.GROQ_REQUESTS_PER_MINUTE,
+                tokens_per_minute=settings.GROQ_TOKENS_PER_MINUTE,
+                daily_token_budget=settings.AI_DAILY_TOKEN_BUDGET,
+                max_wait=settings.AI_RATE_MAX_WAIT_SECONDS
+            ) if settings.AI_RATE_LIMIT_ENABLED else None
+        )
     return ai_service
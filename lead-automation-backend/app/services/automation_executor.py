@@ -0,0 +1,382 @@
+import asyncio
+import inspect
+import time
+from typing import Dict, Any, List, Optional
+from datetime import datetime, timedelta
+import logging
+from app.services.email_templates import EmailTemplates
+from app.services.email_outbox import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+class AutomationExecutor:
+    """
+    Executes a matched AUTOMATION_RULES entry as a DAG of actions
+    
+    Independent actions (e.g. send_email and create_assignment) run
+    concurrently; an action only waits for the action types it depends
+    on. Handlers do their side effects (sending email) but return the
+    rows to persist instead of writing them, so the caller can store the
+    whole run in one transaction.
+    
+    With outbox=True emails are not sent inline: send_email returns a
+    queued email activity and a send_email job (see EmailOutbox) for the
+    caller to store in that same transaction.
+    """
+    
+    # Job type of timers for delayed actions (fired by ActionScheduler)
+    DELAYED_JOB_TYPE = "delayed_action"
+    
+    # Action type -> action types whose results it needs first
+    DEPENDENCIES = {
+        "create_follow_up": ["create_assignment"],  # follow-up is owned by the assignee
+        "create_approval": ["create_assignment"],
+        "notify_sales": ["create_assignment"]
+    }
+    
+    def __init__(self, email_service, outbox: bool = False):
+        self.email_service = email_service
+        self.outbox = outbox
+        self.handlers = {
+            "send_email": self._send_email,
+            "create_follow_up": self._create_follow_up,
+            "create_assignment": self._create_assignment,
+            "create_approval": self._create_approval,
+            "notify_sales": self._notify_sales
+        }
+    
+    async def execute(
+        self,
+        rule: Dict[str, Any],
+        context: Dict[str, Any],
+        only: Optional[List[str]] = None,
+        include_delayed: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Run all actions of a rule
+        
+        Args:
+            rule: Result of get_matching_rule (rule_name, actions, ...)
+            context: lead_data, products (names), ai_output, approval
+                (content-based approval row or None), and optionally
+                idempotency_key, a prefix for the Resend Idempotency-Key
+                of inline emails (so a retried run does not resend them)
+            only: Run just these action types (e.g. to re-evaluate SLA
+                and follow-up without re-sending email)
+            include_delayed: With only, also schedule the rule's delayed
+                actions of other types
+        
+        Returns dict with:
+        - activities: activity rows in action order
+        - assignment: assignment row or None
+        - email_result: result of the first immediate email, or None
+        - first_response_at: ISO timestamp if an email went out
+        - jobs: automation_jobs rows to enqueue (outbox emails, timers
+          for delayed actions)
+        - timings: per-action status and timing
+        - total_ms: wall-clock time of the whole run
+        """
+        context = {**context, "rule_name": rule.get("rule_name")}
+        actions = [
+            action for action in rule.get("actions", [])
+            if only is None or action["type"] in only or (include_delayed and self._delay(action))
+        ]
+        results: Dict[int, Dict[str, Any]] = {}
+        tasks: Dict[int, asyncio.Task] = {}
+        run_started = time.perf_counter()
+        
+        async def run_action(index: int, action: Dict[str, Any]) -> None:
+            dependencies = [
+                tasks[i] for i, other in enumerate(actions)
+                if other["type"] in self.DEPENDENCIES.get(action["type"], []) and i != index
+            ]
+            if dependencies:
+                await asyncio.gather(*dependencies)
+            
+            started = time.perf_counter()
+            handler = self.handlers.get(action["type"])
+            if handler is None:
+                outcome = {"status": "skipped", "reason": f"Unknown action type '{action['type']}'"}
+            elif self._delay(action):
+                # Delayed actions are not executed inline but stored as timers
+                outcome = self._defer(action, context, self._delay(action))
+            else:
+                try:
+                    outcome = await handler(action, context, results)
+                    outcome.setdefault("status", "completed")
+                except Exception as e:
+                    logger.error(f"Automation action {action['type']} failed: {e}")
+                    outcome = {"status": "failed", "error": str(e)}
+            
+            outcome["timing"] = {
+                "index": index,
+                "type": action["type"],
+                "status": outcome["status"],
+                "started_ms": round((started - run_started) * 1000, 2),
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+            }
+            if outcome.get("error") or outcome.get("reason"):
+                outcome["timing"]["detail"] = outcome.get("error") or outcome.get("reason")
+            results[index] = outcome
+        
+        for index, action in enumerate(actions):
+            tasks[index] = asyncio.create_task(run_action(index, action))
+        await asyncio.gather(*tasks.values())
+        
+        ordered = [results[i] for i in range(len(actions))]
+        email_results = [r["email_result"] for r in ordered if r.get("email_result")]
+        first_response_at = next(
+            (r["sent_at"] for r in email_results if r.get("success")), None
+        )
+        
+        return {
+            "rule_name": rule.get("rule_name"),
+            "activities": [row for r in ordered for row in r.get("activities", [])],
+            "assignment": next((r["assignment"] for r in ordered if r.get("assignment")), None),
+            "email_result": email_results[0] if email_results else None,
+            "first_response_at": first_response_at,
+            "jobs": [job for r in ordered for job in r.get("jobs", [])],
+            "timings": [r["timing"] for r in ordered],
+            "total_ms": round((time.perf_counter() - run_started) * 1000, 2)
+        }
+    
+    # ============================================
+    # ACTION HANDLERS
+    # ============================================
+    
+    async def _send_email(
+        self,
+        action: Dict[str, Any],
+        context: Dict[str, Any],
+        results: Dict[int, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        lead_data = context["lead_data"]
+        template_name = action["template"]
+        
+        if self.outbox:
+            queued = EmailOutbox.queue_email(
+                to_email=lead_data["email"],
+                template_name=template_name,
+                template_kwargs=self._template_kwargs(template_name, context)
+            )
+            return {
+                "status": "queued",
+                "email_result": {"success": False, "queued": True, "template": template_name},
+                "activities": [queued["activity"]],
+                "jobs": [queued["job"]]
+            }
+        
+        idempotency_key = context.get("idempotency_key")
+        email_result = await self.email_service.send_template_email(
+            to_email=lead_data["email"],
+            template_name=template_name,
+            idempotency_key=f"{idempotency_key}-{template_name}" if idempotency_key else None,
+            **self._template_kwargs(template_name, context)
+        )
+        
+        return {
+            "status": "completed" if email_result["success"] else "failed",
+            "email_result": email_result,
+            "activities": [{
+                "type": "email",
+                "status": "completed" if email_result["success"] else "failed",
+                "message": f"{template_name} email sent" if email_result["success"] else f"{template_name} email failed",
+                "actor_type": "system",
+                "metadata": email_result
+            }]
+        }
+    
+    async def _create_assignment(
+        self,
+        action: Dict[str, Any],
+        context: Dict[str, Any],
+        results: Dict[int, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        sla_hours = action["sla_hours"]
+        owner = action.get("owner", "system_auto")
+        assignment = {
+            "owner_id": owner,
+            "owner_name": owner.replace("_", " ").title(),
+            "sla_deadline": (datetime.utcnow() + timedelta(hours=sla_hours)).isoformat()
+        }
+        
+        return {
+            "assignment": assignment,
+            "activities": [{
+                "type": "assignment",
+                "status": "completed",
+                "message": f"Lead auto-assigned to {assignment['owner_name']} with {sla_hours}h SLA",
+                "actor_type": "system",
+                "metadata": {
+                    "assigned_by": "system",
+                    "owner_id": assignment["owner_id"],
+                    "owner_name": assignment["owner_name"],
+                    "sla_deadline": assignment["sla_deadline"],
+                    "rule_name": context.get("rule_name")
+                }
+            }]
+        }
+    
+    async def _create_follow_up(
+        self,
+        action: Dict[str, Any],
+        context: Dict[str, Any],
+        results: Dict[int, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        assignment = self._assignment(results)
+        scheduled_time = datetime.utcnow() + self._due_in(action)
+        
+        return {
+            "activities": [{
+                "type": "follow_up",
+                "status": "pending",
+                "message": action["message"],
+                "metadata": {
+                    "action": action["action"],
+                    "scheduled_for": scheduled_time.isoformat(),
+                    "reason": context.get("rule_name"),
+                    "priority": context["ai_output"].get("priority"),
+                    "owner_id": assignment.get("owner_id") if assignment else None
+                }
+            }]
+        }
+    
+    async def _create_approval(
+        self,
+        action: Dict[str, Any],
+        context: Dict[str, Any],
+        results: Dict[int, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        lead_data = context["lead_data"]
+        assignment = self._assignment(results)
+        content_approval = context.get("approval")
+        
+        if content_approval:
+            # A content check (quantity/keywords) already flagged the lead:
+            # keep its specific reason and details, note the rule as well
+            approval = {
+                **content_approval,
+                "metadata": {**content_approval["metadata"]}
+            }
+        else:
+            message = f"{action.get('description', 'Rule')} ({context.get('rule_name')})"
+            approval = {
+                "type": "approval",
+                "status": "pending",
+                "message": f"Approval Required: {message}",
+                "actor_type": "system",
+                "metadata": {
+                    "approval_type": action["approval_type"],
+                    "lead_name": lead_data["name"],
+                    "lead_email": lead_data["email"],
+                    "lead_phone": lead_data.get("phone"),
+                    "lead_role": lead_data.get("role"),
+                    "lead_company": lead_data.get("company"),
+                    "priority": context["ai_output"].get("priority"),
+                    "details": {
+                        "products": context["products"],
+                        "message": message
+                    },
+                    "created_at": datetime.utcnow().isoformat()
+                }
+            }
+        
+        approval["metadata"].update({
+            "rule_name": context.get("rule_name"),
+            "rule_approval_type": action["approval_type"],
+            "requires_manager": action.get("requires_manager", False),
+            "owner_id": assignment.get("owner_id") if assignment else None
+        })
+        
+        return {"approval_created": True, "activities": [approval]}
+    
+    async def _notify_sales(
+        self,
+        action: Dict[str, Any],
+        context: Dict[str, Any],
+        results: Dict[int, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        # No chat integration is configured yet; keep the run honest
+        logger.info(f"[{action.get('channel')}] {action.get('message')} ({context['lead_data'].get('email')})")
+        return {
+            "status": "skipped",
+            "reason": f"No notifier configured for channel '{action.get('channel')}'"
+        }
+    
+    def _defer(
+        self,
+        action: Dict[str, Any],
+        context: Dict[str, Any],
+        delay: timedelta
+    ) -> Dict[str, Any]:
+        """Timer job (and, for outbox emails, the scheduled activity) for a delayed action"""
+        run_at = datetime.utcnow() + delay
+        outcome = {
+            "status": "deferred",
+            "delay_seconds": delay.total_seconds(),
+            "scheduled_for": run_at.isoformat()
+        }
+        
+        if action["type"] == "send_email" and self.outbox:
+            queued = EmailOutbox.queue_email(
+                to_email=context["lead_data"]["email"],
+                template_name=action["template"],
+                template_kwargs=self._template_kwargs(action["template"], context),
+                first_response=False,
+                run_at=run_at,
+                rule_name=context.get("rule_name")
+            )
+            return {**outcome, "activities": [queued["activity"]], "jobs": [queued["job"]]}
+        
+        return {**outcome, "jobs": [{
+            "job_type": self.DELAYED_JOB_TYPE,
+            "run_at": run_at.isoformat(),
+            "payload": {
+                "action": action,
+                "rule_name": context.get("rule_name"),
+                "products": context["products"],
+                "ai_output": context["ai_output"],
+                "scheduled_for": run_at.isoformat()
+            }
+        }]}
+    
+    # ============================================
+    # HELPERS
+    # ============================================
+    
+    @staticmethod
+    def _assignment(results: Dict[int, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        return next((r["assignment"] for r in results.values() if r.get("assignment")), None)
+    
+    @staticmethod
+    def _delay(action: Dict[str, Any]) -> Optional[timedelta]:
+        """Delay before an action should run (None = run now)"""
+        delay = timedelta(
+            minutes=action.get("delay_minutes", 0),
+            hours=action.get("delay_hours", 0),
+            days=action.get("delay_days", 0)
+        )
+        return delay if delay.total_seconds() > 0 else None
+    
+    @staticmethod
+    def _due_in(action: Dict[str, Any]) -> timedelta:
+        """Due time of a follow-up task relative to now"""
+        return timedelta(
+            minutes=action.get("due_in_minutes", 0),
+            hours=action.get("due_in_hours", 0),
+            days=action.get("due_in_days", 0)
+        )
+    
+    @staticmethod
+    def _template_kwargs(template_name: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Pick the arguments a template accepts from the lead context"""
+        available = {
+            "name": context["lead_data"]["name"],
+            "products": context["products"]
+        }
+        template_func = getattr(EmailTemplates, template_name, None)
+        if template_func is None:
+            return available
+        accepted = inspect.signature(template_func).parameters
+        return {k: v for k, v in available.items() if k in accepted}
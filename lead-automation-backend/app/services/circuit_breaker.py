@@ -0,0 +1,94 @@
+from typing import Dict, Any, Optional
+from datetime import datetime
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for an external dependency
+    
+    - closed: calls go through; failure_threshold consecutive failures
+      trip the breaker
+    - open: calls are refused for reset_timeout seconds
+    - half_open: a single probe call is let through; success closes the
+      circuit, failure opens it again
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.consecutive_failures = 0
+        self.times_opened = 0
+        self.rejected_calls = 0
+        self._opened_at: Optional[float] = None
+        self._opened_at_wall: Optional[str] = None
+        self._probe_in_flight = False
+    
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+    
+    def allow_request(self) -> bool:
+        """Whether a call may be made now (claims the probe when half-open)"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        self.rejected_calls += 1
+        return False
+    
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info(f"Circuit '{self.name}' closed after successful probe")
+        self.consecutive_failures = 0
+        self._opened_at = None
+        self._opened_at_wall = None
+        self._probe_in_flight = False
+    
+    def release_probe(self) -> None:
+        """Give up a claimed probe without a verdict (e.g. the call was cancelled)"""
+        self._probe_in_flight = False
+    
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        if self._probe_in_flight or (
+            self._opened_at is None and self.consecutive_failures >= self.failure_threshold
+        ):
+            if self._opened_at is None:
+                self.times_opened += 1
+            logger.error(
+                f"Circuit '{self.name}' opened after {self.consecutive_failures} consecutive failures"
+            )
+            self._opened_at = time.monotonic()
+            self._opened_at_wall = datetime.utcnow().isoformat()
+            self._probe_in_flight = False
+    
+    def stats(self) -> Dict[str, Any]:
+        """Breaker state for /health"""
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "opened_at": self._opened_at_wall,
+            "times_opened": self.times_opened,
+            "rejected_calls": self.rejected_calls
+        }
@@ -0,0 +1,222 @@
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import asyncio
+import inspect
+import logging
+from app.utils.db import execute_rpc, insert_records
+from app.services.email_service import EmailService, get_email_service
+from app.services.email_templates import EmailTemplates
+from app.services.email_transport import ResendTransport, is_permanent_error
+from app.services.job_queue import CheckpointedRun, JobQueue, get_job_queue
+
+logger = logging.getLogger(__name__)
+
+
+class EmailCampaignService(CheckpointedRun):
+    """
+    Bulk template emails to leads selected by status and AI priority
+    
+    A run pages (keyset on lead id) through get_campaign_recipients,
+    renders each chunk of a page in a worker thread and sends it with
+    one Resend batch request (up to 100 emails), with at most
+    `concurrency` chunks in flight and no more than rate_per_minute
+    emails a minute. Each chunk's email activities are written with one
+    bulk insert as soon as it is sent.
+    
+    Runs execute as email_campaign jobs on the durable job queue,
+    checkpointed and time-sliced by CheckpointedRun. A page cut off by a
+    crash is fetched again without the leads that already have this
+    run's email activity; every chunk carries an Idempotency-Key (run id
+    and first lead), so Resend does not send a chunk that was accepted
+    but not yet recorded twice.
+    """
+    
+    JOB_TYPE = "email_campaign"
+    TEMPLATES = ("nurture_day_3", "follow_up_reminder")
+    
+    def __init__(
+        self,
+        email_service: EmailService,
+        job_queue: JobQueue,
+        page_size: int = 500,
+        chunk_size: int = ResendTransport.BATCH_LIMIT,
+        concurrency: int = 2,
+        rate_per_minute: int = 1000,
+        slice_seconds: float = 120.0
+    ):
+        super().__init__(job_queue, slice_seconds)
+        self.email_service = email_service
+        self.page_size = page_size
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.rate_per_minute = rate_per_minute
+    
+    async def start(
+        self,
+        template_name: str,
+        statuses: List[str],
+        priorities: Optional[List[str]] = None,
+        template_kwargs: Optional[Dict[str, Any]] = None,
+        page_size: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        rate_per_minute: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Create a campaign checkpoint and enqueue its first job
+        
+        Raises:
+            ValueError: Unknown template or missing template arguments
+        """
+        template_kwargs = template_kwargs or {}
+        if template_name not in self.TEMPLATES:
+            raise ValueError(f"Template '{template_name}' cannot be used for campaigns (use one of {', '.join(self.TEMPLATES)})")
+        missing = [
+            param for param in inspect.signature(getattr(EmailTemplates, template_name)).parameters
+            if param not in ("name", "products") and param not in template_kwargs
+        ]
+        if missing:
+            raise ValueError(f"Template '{template_name}' needs template_kwargs: {', '.join(missing)}")
+        
+        selection = {"statuses": statuses, "priorities": priorities or None}
+        total = await execute_rpc("count_campaign_recipients", selection)
+        
+        run = await self._create({
+            "template": template_name,
+            "template_kwargs": template_kwargs,
+            "selection": selection,
+            "options": {
+                "page_size": page_size or self.page_size,
+                "chunk_size": min(chunk_size or self.chunk_size, ResendTransport.BATCH_LIMIT),
+                "concurrency": concurrency or self.concurrency,
+                "rate_per_minute": rate_per_minute or self.rate_per_minute
+            },
+            "total": total or 0,
+            "sent": 0,
+            "failed": 0,
+            "batches": 0
+        })
+        
+        logger.info(f"Started {template_name} email campaign {run['run_id']} for {run['total']} leads")
+        return run
+    
+    async def _fetch_page(self, run_id: str, checkpoint: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return await execute_rpc("get_campaign_recipients", {
+            **checkpoint["selection"],
+            "after_lead": checkpoint["cursor"],
+            "page_size": checkpoint["options"]["page_size"],
+            "exclude_run": run_id
+        })
+    
+    async def _process_page(
+        self,
+        run_id: str,
+        page: List[Dict[str, Any]],
+        checkpoint: Dict[str, Any]
+    ) -> None:
+        """Send one page in batch chunks, bulk-inserting each chunk's email activities"""
+        options = checkpoint["options"]
+        chunk_size = options["chunk_size"]
+        semaphore = asyncio.Semaphore(options["concurrency"])
+        
+        async def send_chunk(chunk: List[Dict[str, Any]]) -> None:
+            async with semaphore:
+                # Rendering is CPU work: keep it off the event loop serving the API
+                emails = await asyncio.to_thread(self._render, chunk, checkpoint)
+                try:
+                    results = await self.email_service.transport.send_batch(
+                        emails,
+                        idempotency_key=f"campaign-{run_id}-{chunk[0]['lead_id']}"
+                    )
+                    rows = [
+                        self._activity(run_id, lead, checkpoint, resend_id=result.get("id"))
+                        for lead, result in zip(chunk, results)
+                    ]
+                except Exception as e:
+                    if not is_permanent_error(e):
+                        raise  # The job is retried and resumes at this page
+                    logger.error(f"Campaign {run_id} batch of {len(chunk)} rejected by Resend: {e}")
+                    rows = [self._activity(run_id, lead, checkpoint, error=str(e)) for lead in chunk]
+            
+            # Recorded before the stats, so a retried page skips these leads
+            await insert_records("lead_activity", rows)
+            sent = sum(1 for row in rows if row["status"] == "completed")
+            checkpoint["processed"] += len(chunk)
+            checkpoint["sent"] += sent
+            checkpoint["failed"] += len(rows) - sent
+            checkpoint["batches"] += 1
+        
+        chunks = [page[start:start + chunk_size] for start in range(0, len(page), chunk_size)]
+        # Let every chunk finish (and record) before a failure is raised
+        outcomes = await asyncio.gather(*(send_chunk(chunk) for chunk in chunks), return_exceptions=True)
+        errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+        if errors:
+            raise errors[0]
+    
+    def _render(self, chunk: List[Dict[str, Any]], checkpoint: Dict[str, Any]) -> List[Dict[str, Any]]:
+        template_func = getattr(EmailTemplates, checkpoint["template"])
+        accepted = inspect.signature(template_func).parameters
+        emails = []
+        for lead in chunk:
+            available = {"name": lead["name"], "products": lead.get("products") or []}
+            template = template_func(
+                **{k: v for k, v in available.items() if k in accepted},
+                **checkpoint["template_kwargs"]
+            )
+            emails.append({
+                "from": self.email_service.from_email,
+                "to": lead["email"],
+                "subject": template["subject"],
+                "html": template["html"]
+            })
+        return emails
+    
+    def _summary(self, checkpoint: Dict[str, Any]) -> str:
+        return f"{checkpoint['sent']} sent, {checkpoint['failed']} failed"
+    
+    @staticmethod
+    def _activity(
+        run_id: str,
+        lead: Dict[str, Any],
+        checkpoint: Dict[str, Any],
+        resend_id: Optional[str] = None,
+        error: Optional[str] = None
+    ) -> Dict[str, Any]:
+        metadata = {
+            "success": error is None,
+            "template": checkpoint["template"],
+            "to": lead["email"],
+            "campaign_run_id": run_id
+        }
+        if error is None:
+            metadata.update({"resend_id": resend_id, "sent_at": datetime.utcnow().isoformat()})
+        else:
+            metadata["error"] = error
+        return {
+            "lead_id": lead["lead_id"],
+            "type": "email",
+            "status": "completed" if error is None else "failed",
+            "message": f"{checkpoint['template']} campaign email {'sent' if error is None else 'failed'}",
+            "actor_type": "system",
+            "metadata": metadata
+        }
+
+
+# Initialize email campaign service (singleton)
+email_campaign_service = None
+
+def get_email_campaign_service() -> EmailCampaignService:
+    """Get or create email campaign service instance"""
+    global email_campaign_service
+    if email_campaign_service is None:
+        from app.config import settings
+        email_campaign_service = EmailCampaignService(
+            email_service=get_email_service(),
+            job_queue=get_job_queue(),
+            page_size=settings.EMAIL_CAMPAIGN_PAGE_SIZE,
+            chunk_size=settings.EMAIL_CAMPAIGN_BATCH_SIZE,
+            concurrency=settings.EMAIL_CAMPAIGN_CONCURRENCY,
+            rate_per_minute=settings.EMAIL_CAMPAIGN_RATE_PER_MINUTE,
+            slice_seconds=settings.EMAIL_CAMPAIGN_SLICE_SECONDS
+        )
+    return email_campaign_service
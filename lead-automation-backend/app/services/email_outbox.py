@@ -0,0 +1,183 @@
+from typing import Dict, Any, Optional
+from datetime import datetime
+import logging
+import uuid
+from app.services.email_service import EmailService, get_email_service
+from app.services.email_transport import is_permanent_error
+from app.services.email_templates import EmailTemplates
+from app.utils.db import get_record, record_email_delivery
+from app.config.automation_rules import STOP_DELAYED_ACTIONS_STATUSES
+
+logger = logging.getLogger(__name__)
+
+
+class EmailOutbox:
+    """
+    Transactional outbox for automation emails
+    
+    With the outbox on, the send_email automation action does not call
+    Resend: it returns a queued email activity (with its id assigned
+    here) and a send_email job, and the caller stores both in the same
+    transaction as the lead. Pipeline workers claim the jobs in batches
+    and dispatch() sends them; failed sends are retried by the job queue
+    with exponential backoff.
+    
+    - success marks the activity completed and sets the lead's
+      first_response_at if it is still empty
+    - Resend rejections a retry cannot fix (4xx other than 429) fail
+      the activity at once; other errors fail it on the last attempt
+    - the activity id is sent as Resend's Idempotency-Key, so a
+      redelivered job does not send the email twice
+    
+    Delayed rule emails (e.g. nurture after 2 hours) are outbox jobs
+    with a future run_at; they are cancelled if the lead was converted
+    or lost in the meantime.
+    """
+    
+    JOB_TYPE = "send_email"
+    
+    def __init__(self, email_service: EmailService):
+        self.email_service = email_service
+    
+    @classmethod
+    def queue_email(
+        cls,
+        to_email: str,
+        template_name: str,
+        template_kwargs: Dict[str, Any],
+        first_response: bool = True,
+        run_at: Optional[datetime] = None,
+        rule_name: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Outbox rows for one template email (sent at run_at if given)
+        
+        rule_name tags the activity with the automation rule that
+        scheduled it, so a re-evaluation can cancel it.
+        
+        Returns:
+            Dict with the queued email activity and its send_email job
+            (both without lead_id)
+        """
+        activity_id = str(uuid.uuid4())
+        activity = {
+            "id": activity_id,
+            "type": "email",
+            "status": "scheduled" if run_at else "queued",
+            "message": f"{template_name} email {'scheduled' if run_at else 'queued'}",
+            "actor_type": "system",
+            "metadata": {
+                "success": False,
+                "queued": True,
+                "template": template_name,
+                "to": to_email,
+                "queued_at": datetime.utcnow().isoformat()
+            }
+        }
+        job = {
+            "job_type": cls.JOB_TYPE,
+            "payload": {
+                "activity_id": activity_id,
+                "to_email": to_email,
+                "template_name": template_name,
+                "template_kwargs": template_kwargs,
+                "first_response": first_response
+            }
+        }
+        if rule_name:
+            activity["metadata"]["rule_name"] = rule_name
+        if run_at:
+            activity["metadata"]["scheduled_for"] = run_at.isoformat()
+            job["payload"]["scheduled_for"] = run_at.isoformat()
+            job["run_at"] = run_at.isoformat()
+        return {"activity": activity, "job": job}
+    
+    async def dispatch(self, job: Dict[str, Any]) -> None:
+        """
+        Job handler: send one outbox email and record the outcome
+        
+        Raises on errors worth retrying, so the job queue backs off and
+        redelivers the job.
+        """
+        payload = job["payload"]
+        activity_id = payload["activity_id"]
+        template_name = payload["template_name"]
+        
+        if payload.get("scheduled_for"):
+            lead = await get_record("leads", job["lead_id"]) if job.get("lead_id") else None
+            if lead and lead.get("status") in STOP_DELAYED_ACTIONS_STATUSES:
+                await record_email_delivery(
+                    activity_id,
+                    status="cancelled",
+                    message=f"{template_name} email cancelled (lead {lead['status']})",
+                    metadata={"queued": False}
+                )
+                return
+        
+        template_func = getattr(EmailTemplates, template_name, None)
+        if template_func is None:
+            await self._record_failure(activity_id, template_name, f"Template '{template_name}' not found", job)
+            return
+        template = template_func(**payload.get("template_kwargs", {}))
+        
+        try:
+            result = await self.email_service.transport.send({
+                "from": self.email_service.from_email,
+                "to": payload["to_email"],
+                "subject": template["subject"],
+                "html": template["html"]
+            }, idempotency_key=activity_id)
+        except Exception as e:
+            permanent = is_permanent_error(e)
+            if permanent or job.get("attempts", 1) >= job.get("max_attempts", 1):
+                await self._record_failure(activity_id, template_name, str(e), job)
+            if permanent:
+                logger.error(f"Outbox email {activity_id} rejected by Resend, not retrying: {e}")
+                return
+            raise
+        
+        sent_at = datetime.utcnow().isoformat()
+        await record_email_delivery(
+            activity_id,
+            status="completed",
+            message=f"{template_name} email sent",
+            metadata={
+                "success": True,
+                "queued": False,
+                "resend_id": result["id"],
+                "sent_at": sent_at,
+                "attempts": job.get("attempts", 1)
+            },
+            first_response_at=sent_at if payload.get("first_response") else None
+        )
+        logger.info(f"Outbox email '{template_name}' sent to {payload['to_email']}, ID: {result['id']}")
+    
+    @staticmethod
+    async def _record_failure(
+        activity_id: str,
+        template_name: str,
+        error: str,
+        job: Dict[str, Any]
+    ) -> None:
+        await record_email_delivery(
+            activity_id,
+            status="failed",
+            message=f"{template_name} email failed",
+            metadata={
+                "success": False,
+                "queued": False,
+                "error": error,
+                "attempts": job.get("attempts", 1)
+            }
+        )
+
+
+# Initialize email outbox (singleton)
+email_outbox = None
+
+def get_email_outbox() -> EmailOutbox:
+    """Get or create email outbox instance"""
+    global email_outbox
+    if email_outbox is None:
+        email_outbox = EmailOutbox(email_service=get_email_service())
+    return email_outbox
@@ -2,15 +2,27 @@ import resend
 from typing import Dict, Any, Optional, List
 import logging
 from datetime import datetime
+from app.services.email_transport import ResendTransport
+from app.services.email_templates import EmailTemplates
 
 logger = logging.getLogger(__name__)
 
 class EmailService:
-    """Email service using Resend API"""
+    """Email service using Resend API (async, pooled connections)"""
     
-    def __init__(self, api_key: str, from_email: str):
+    def __init__(
+        self,
+        api_key: str,
+        from_email: str,
+        max_concurrency: int = 10,
+        timeout: float = 15.0
+    ):
         resend.api_key = api_key
         self.from_email = from_email
+        self.transport = ResendTransport(api_key, max_concurrency=max_concurrency, timeout=timeout)
+    
+    async def close(self) -> None:
+        await self.transport.close()
     
     async def send_acknowledgement(
         self,
@@ -20,31 +32,14 @@ class EmailService:
     ) -> Dict[str, Any]:
         """Send acknowledgement email to new lead"""
         
-        subject = f"Thank you for your inquiry, {name}!"
-        
-        html_content = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-            <h2 style="color: #2563eb;">Thank you for contacting us!</h2>
-            <p>Dear {name},</p>
-            <p>We've received your inquiry about:</p>
-            <ul style="background-color: #f3f4f6; padding: 15px; border-radius: 5px;">
-                {"".join([f"<li style='margin: 5px 0;'>{product}</li>" for product in products])}
-            </ul>
-            <p>Our team will review your request and get back to you within 24 hours.</p>
-            <p style="margin-top: 30px;">Best regards,<br><strong>The Sales Team</strong></p>
-            <hr style="margin-top: 30px; border: none; border-top: 1px solid #e5e7eb;">
-            <p style="font-size: 12px; color: #6b7280;">This is an automated message. Please do not reply to this email.</p>
-        </body>
-        </html>
-        """
+        template = EmailTemplates.acknowledgement(name=name, products=products)
         
         try:
-            result = resend.Emails.send({
+            result = await self.transport.send({
                 "from": self.from_email,
                 "to": to_email,
-                "subject": subject,
-                "html": html_content
+                "subject": template["subject"],
+                "html": template["html"]
             })
             
             logger.info(f"Acknowledgement email sent to {to_email}, ID: {result['id']}")
@@ -68,6 +63,7 @@ class EmailService:
         self,
         to_email: str,
         template_name: str,
+        idempotency_key: Optional[str] = None,
         **kwargs
     ) -> Dict[str, Any]:
         """
@@ -76,13 +72,13 @@ class EmailService:
         Args:
             to_email: Recipient email address
             template_name: Name of the template method in EmailTemplates class
+            idempotency_key: Resend Idempotency-Key, so a retried send
+                within 24h does not deliver the email twice
             **kwargs: Template-specific parameters
         
         Returns:
             Dict with success status, resend_id, and metadata
         """
-        from .email_templates import EmailTemplates
-        
         # Get template method
         template_func = getattr(EmailTemplates, template_name, None)
         if not template_func:
@@ -98,12 +94,12 @@ class EmailService:
             template = template_func(**kwargs)
             
             # Send email
-            result = resend.Emails.send({
+            result = await self.transport.send({
                 "from": self.from_email,
                 "to": to_email,
                 "subject": template["subject"],
                 "html": template["html"]
-            })
+            }, idempotency_key=idempotency_key)
             
             logger.info(f"Template email '{template_name}' sent to {to_email}, ID: {result['id']}")
             
@@ -131,7 +127,7 @@ class EmailService:
         """Send custom email"""
         
         try:
-            result = resend.Emails.send({
+            result = await self.transport.send({
                 "from": self.from_email,
                 "to": to_email,
                 "subject": subject,
@@ -164,6 +160,8 @@ def get_email_service() -> EmailService:
         from app.config import settings
         email_service = EmailService(
             api_key=settings.RESEND_API_KEY,
-            from_email=settings.RESEND_FROM_EMAIL
+            from_email=settings.RESEND_FROM_EMAIL,
+            max_concurrency=settings.RESEND_MAX_CONCURRENCY,
+            timeout=settings.RESEND_TIMEOUT_SECONDS
         )
     return email_service
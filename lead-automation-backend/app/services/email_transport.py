@@ -0,0 +1,142 @@
+from typing import Dict, Any, List, Optional
+import asyncio
+import httpx
+import logging
+import resend
+from resend.exceptions import ResendError, raise_for_code_and_type
+
+logger = logging.getLogger(__name__)
+
+
+def is_permanent_error(error: Exception) -> bool:
+    """Resend rejected the email itself (retrying sends the same request)"""
+    if not isinstance(error, ResendError):
+        return False
+    try:
+        code = int(error.code)
+    except (TypeError, ValueError):
+        return False
+    return 400 <= code < 500 and code != 429
+
+
+class ResendTransport:
+    """
+    Async client for the Resend emails API
+    
+    Replaces the blocking resend.Emails.send: requests go through one
+    keep-alive httpx connection pool, with a semaphore bounding sends in
+    flight so a burst of leads cannot open unlimited connections. Error
+    responses raise the same resend.exceptions types as the SDK.
+    """
+    
+    BATCH_LIMIT = 100  # Emails per /emails/batch request
+    
+    def __init__(
+        self,
+        api_key: str,
+        api_url: str = resend.api_url,
+        max_concurrency: int = 10,
+        timeout: float = 15.0
+    ):
+        self.api_url = api_url
+        self.http_client = httpx.AsyncClient(
+            base_url=api_url,
+            headers={
+                "Accept": "application/json",
+                "Authorization": f"Bearer {api_key}"
+            },
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency
+            ),
+            timeout=timeout
+        )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.sent = 0
+        self.failed = 0
+    
+    async def send(self, params: Dict[str, Any], idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Send one email (same params and response as resend.Emails.send)
+        
+        Resend answers a repeated idempotency_key (within 24h) with the
+        first send's result instead of sending again.
+        
+        Raises:
+            ResendError: Resend rejected the email
+            httpx.HTTPError: network failure or timeout
+        """
+        return await self._post("/emails", params, idempotency_key, count=1)
+    
+    async def send_batch(
+        self,
+        emails: List[Dict[str, Any]],
+        idempotency_key: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Send up to BATCH_LIMIT emails in one request (resend.Batch.send)
+        
+        Returns:
+            One {"id": ...} per email, in order
+        
+        Raises:
+            ResendError: Resend rejected the batch (no email is sent)
+            httpx.HTTPError: network failure or timeout
+        """
+        if len(emails) > self.BATCH_LIMIT:
+            raise ValueError(f"A batch holds at most {self.BATCH_LIMIT} emails, got {len(emails)}")
+        body = await self._post("/emails/batch", emails, idempotency_key, count=len(emails))
+        return body.get("data", []) if isinstance(body, dict) else body
+    
+    async def _post(
+        self,
+        path: str,
+        params: Any,
+        idempotency_key: Optional[str],
+        count: int
+    ) -> Any:
+        async with self.semaphore:
+            self.in_flight += 1
+            try:
+                response = await self.http_client.post(
+                    path,
+                    json=params,
+                    headers={"Idempotency-Key": idempotency_key} if idempotency_key else None
+                )
+            except httpx.HTTPError:
+                self.failed += count
+                raise
+            finally:
+                self.in_flight -= 1
+        
+        if not response.is_success:
+            self.failed += count
+            # Proxies and gateways answer errors with HTML or empty bodies
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            if not isinstance(body, dict):
+                body = {}
+            raise_for_code_and_type(
+                code=body.get("statusCode", response.status_code),
+                message=body.get("message", response.text[:500] or response.reason_phrase),
+                error_type=body.get("name", "application_error")
+            )
+        self.sent += count
+        return response.json() if response.content else {}
+    
+    async def close(self) -> None:
+        """Release pooled connections (called on shutdown)"""
+        await self.http_client.aclose()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Counters for /health"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "sent": self.sent,
+            "failed": self.failed
+        }
@@ -0,0 +1,297 @@
+from typing import Dict, Any, List, Optional
+from abc import ABC, abstractmethod
+from datetime import datetime
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from app.utils.db import (
+    execute_rpc,
+    insert_record,
+    update_record,
+    upsert_record,
+    query_records
+)
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """
+    Durable job queue backed by the automation_jobs table
+    
+    Delivery is at-least-once:
+    - claim() leases jobs with FOR UPDATE SKIP LOCKED, so any number of
+      workers (across processes and hosts) can drain the queue concurrently
+    - a job whose worker dies is redelivered once its lease expires
+    - failed jobs are retried with exponential backoff and jitter, then
+      moved to the dead-letter state after max_attempts
+    """
+    
+    def __init__(
+        self,
+        lease_seconds: int = 300,
+        max_attempts: int = 5,
+        base_backoff_seconds: float = 5.0,
+        max_backoff_seconds: float = 3600.0,
+        worker_id: Optional[str] = None
+    ):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.base_backoff_seconds = base_backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    
+    async def enqueue(
+        self,
+        job_type: str,
+        payload: Dict[str, Any],
+        lead_id: Optional[str] = None,
+        run_at: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Add a job to the queue (runs immediately unless run_at is given)"""
+        job = {
+            "job_type": job_type,
+            "lead_id": lead_id,
+            "payload": payload,
+            "max_attempts": self.max_attempts
+        }
+        if run_at:
+            job["run_at"] = run_at.isoformat()
+        return await insert_record("automation_jobs", job)
+    
+    async def claim(self, batch_size: int = 10) -> List[Dict[str, Any]]:
+        """Lease up to batch_size ready jobs for this worker"""
+        jobs = await execute_rpc("claim_automation_jobs", {
+            "worker_id": self.worker_id,
+            "batch_size": batch_size,
+            "lease_seconds": self.lease_seconds
+        })
+        return jobs or []
+    
+    async def complete(self, job_id: str) -> None:
+        """Mark a claimed job as done"""
+        await execute_rpc("complete_automation_job", {"job_uuid": job_id})
+    
+    async def fail(self, job: Dict[str, Any], error: str) -> str:
+        """
+        Record a failed attempt
+        
+        Returns:
+            New job status: 'queued' (will retry) or 'dead'
+        """
+        delay = self.backoff_delay(job.get("attempts", 1))
+        status = await execute_rpc("fail_automation_job", {
+            "job_uuid": job["id"],
+            "error_message": error[:2000],
+            "retry_delay_seconds": int(delay)
+        })
+        if status == "dead":
+            logger.error(f"Job {job['id']} ({job['job_type']}) moved to dead letters: {error}")
+        else:
+            logger.warning(
+                f"Job {job['id']} ({job['job_type']}) attempt {job.get('attempts')} failed, "
+                f"retrying in {int(delay)}s: {error}"
+            )
+        return status
+    
+    def backoff_delay(self, attempts: int) -> float:
+        """Exponential backoff with full jitter for the given attempt number"""
+        ceiling = min(self.max_backoff_seconds, self.base_backoff_seconds * (2 ** max(attempts - 1, 0)))
+        return random.uniform(0, ceiling)
+    
+    async def list_dead(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Dead-letter view: jobs that exhausted their retries"""
+        return await query_records(
+            "automation_jobs",
+            filters={"status": "dead"},
+            order_by="updated_at.desc",
+            limit=limit
+        )
+    
+    async def retry(self, job_id: str) -> Dict[str, Any]:
+        """Requeue a dead job with a fresh attempt budget"""
+        return await update_record("automation_jobs", job_id, {
+            "status": "queued",
+            "attempts": 0,
+            "run_at": datetime.utcnow().isoformat(),
+            "last_error": None
+        })
+    
+    async def stats(self) -> Dict[str, Any]:
+        """Queue depth by status"""
+        return await execute_rpc("get_job_queue_stats")
+
+
+class CheckpointedRun(ABC):
+    """
+    Base for long batch runs (bulk re-categorization, email campaigns)
+    
+    A run pages through its rows with a keyset cursor, and its cursor and
+    stats live in job_checkpoints. Each job works for at most
+    slice_seconds (well under the job lease), saves the checkpoint after
+    every page and enqueues a continuation job; a crashed worker's job is
+    redelivered and resumes from the last checkpoint. Pages are paced so
+    a run handles at most options["rate_per_minute"] rows a minute.
+    
+    One job execution at a time holds a run's lock (renewed with every
+    save), so a redelivered job cannot work alongside the continuation
+    of the job it replaces. A page cut off by a crash is fetched again:
+    _fetch_page must skip rows whose results were already written for the
+    run, so their side effects and stats are not repeated. When the run's
+    job fails its last attempt the run is marked failed (retrying the
+    dead job resumes it).
+    
+    Subclasses set JOB_TYPE and implement _fetch_page (the page after
+    checkpoint["cursor"]), _process_page and _summary.
+    """
+    
+    JOB_TYPE = ""
+    CURSOR_FIELD = "lead_id"
+    
+    def __init__(self, job_queue: JobQueue, slice_seconds: float = 120.0):
+        self.job_queue = job_queue
+        self.slice_seconds = slice_seconds
+    
+    async def progress(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Checkpoint of a run, with percent complete"""
+        rows = await query_records("job_checkpoints", filters={"run_id": run_id}, limit=1)
+        if not rows or rows[0]["job_type"] != self.JOB_TYPE:
+            return None
+        run = rows[0]
+        checkpoint = run["checkpoint"]
+        total = checkpoint.get("total") or 0
+        return {
+            **run,
+            "percent_complete": 100.0 if run["status"] == "completed" else (
+                round(min(checkpoint.get("processed", 0) / total, 1.0) * 100, 1) if total else 0.0
+            )
+        }
+    
+    async def run(self, job: Dict[str, Any]) -> None:
+        """
+        Job handler: process pages until done or the time slice is used
+        
+        Raises:
+            RuntimeError: Another job holds the run (retried later)
+        """
+        run_id = job["payload"]["run_id"]
+        holder = uuid.uuid4().hex
+        run = await self._lock(run_id, holder)
+        if not run or run["job_type"] != self.JOB_TYPE or run["status"] not in ("running", "failed"):
+            logger.info(f"{self.JOB_TYPE} run {run_id} is not running, dropping job {job['id']}")
+            return
+        if not run["acquired"]:
+            raise RuntimeError(f"{self.JOB_TYPE} run {run_id} is being processed by another job")
+        
+        checkpoint = run["checkpoint"]
+        slice_ends = time.monotonic() + self.slice_seconds
+        
+        try:
+            while time.monotonic() < slice_ends:
+                page = await self._fetch_page(run_id, checkpoint) or []
+                if not page:
+                    checkpoint["completed_at"] = datetime.utcnow().isoformat()
+                    await self._save(run_id, holder, checkpoint, "completed", keep_lock=False)
+                    logger.info(f"{self.JOB_TYPE} run {run_id} completed: {self._summary(checkpoint)}")
+                    return
+                
+                page_started = time.monotonic()
+                await self._process_page(run_id, page, checkpoint)
+                checkpoint["cursor"] = page[-1][self.CURSOR_FIELD]
+                if not await self._save(run_id, holder, checkpoint, "running"):
+                    logger.warning(f"{self.JOB_TYPE} run {run_id} was taken over by another job, stopping job {job['id']}")
+                    return
+                
+                # Rate limit: a page of N rows takes at least N / rate minutes
+                min_duration = len(page) * 60 / checkpoint["options"]["rate_per_minute"]
+                remaining = min_duration - (time.monotonic() - page_started)
+                if remaining > 0:
+                    await asyncio.sleep(remaining)
+        except Exception as e:
+            # Release the run for the retry, or mark it failed if there is none
+            last_attempt = job.get("attempts", 1) >= job.get("max_attempts", 1)
+            if last_attempt:
+                checkpoint["error"] = str(e)[:2000]
+            await self._save(run_id, holder, checkpoint, "failed" if last_attempt else "running", keep_lock=False)
+            raise
+        
+        # Slice used up: continue in a fresh job so no job outlives its lease
+        await self._save(run_id, holder, checkpoint, "running", keep_lock=False)
+        await self.job_queue.enqueue(self.JOB_TYPE, {"run_id": run_id})
+    
+    async def _create(self, checkpoint: Dict[str, Any]) -> Dict[str, Any]:
+        """Save a new run's first checkpoint and enqueue its first job"""
+        run_id = uuid.uuid4().hex
+        checkpoint = {
+            "cursor": None,
+            "processed": 0,
+            **checkpoint,
+            "started_at": datetime.utcnow().isoformat()
+        }
+        await upsert_record("job_checkpoints", {
+            "run_id": run_id,
+            "job_type": self.JOB_TYPE,
+            "status": "running",
+            "checkpoint": checkpoint
+        }, on_conflict="run_id")
+        job = await self.job_queue.enqueue(self.JOB_TYPE, {"run_id": run_id})
+        return {"run_id": run_id, "job_id": job.get("id"), "total": checkpoint.get("total", 0)}
+    
+    @abstractmethod
+    async def _fetch_page(self, run_id: str, checkpoint: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Rows after checkpoint["cursor"], without those already processed by run_id"""
+    
+    @abstractmethod
+    async def _process_page(
+        self,
+        run_id: str,
+        page: List[Dict[str, Any]],
+        checkpoint: Dict[str, Any]
+    ) -> None:
+        """Handle one page and update the checkpoint's stats"""
+    
+    def _summary(self, checkpoint: Dict[str, Any]) -> str:
+        return f"{checkpoint.get('processed', 0)} processed"
+    
+    async def _lock(self, run_id: str, holder: str) -> Optional[Dict[str, Any]]:
+        return await execute_rpc("lock_job_checkpoint", {
+            "checkpoint_run_id": run_id,
+            "holder": holder,
+            "lease_seconds": self.job_queue.lease_seconds
+        })
+    
+    async def _save(
+        self,
+        run_id: str,
+        holder: str,
+        checkpoint: Dict[str, Any],
+        status: str,
+        keep_lock: bool = True
+    ) -> bool:
+        """Save the checkpoint if holder still has the lock (False if it lost it)"""
+        return bool(await execute_rpc("save_job_checkpoint", {
+            "checkpoint_run_id": run_id,
+            "holder": holder,
+            "new_checkpoint": checkpoint,
+            "new_status": status,
+            "lease_seconds": self.job_queue.lease_seconds if keep_lock else None
+        }))
+
+
+# Initialize job queue (singleton)
+job_queue = None
+
+def get_job_queue() -> JobQueue:
+    """Get or create job queue instance"""
+    global job_queue
+    if job_queue is None:
+        from app.config import settings
+        job_queue = JobQueue(
+            lease_seconds=settings.JOB_LEASE_SECONDS,
+            max_attempts=settings.JOB_MAX_ATTEMPTS
+        )
+    return job_queue
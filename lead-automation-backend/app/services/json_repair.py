@@ -0,0 +1,118 @@
+from typing import Dict, Any, List, Optional, Tuple
+import json
+import re
+
+FENCE_PATTERN = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL | re.IGNORECASE)
+
+
+class JSONRepairError(ValueError):
+    """Raised when no JSON object can be recovered from an LLM response"""
+
+
+def parse_llm_json(content: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    Parse the JSON object in an LLM response, repairing it if needed
+    
+    Repairs, in order: markdown code fences, text around the first JSON
+    object, trailing commas, and brackets left open by a truncated
+    response.
+    
+    Returns:
+        (object, repaired) where repaired is False if the content was
+        already valid JSON
+    
+    Raises:
+        JSONRepairError: if the content cannot be repaired
+    """
+    try:
+        parsed = json.loads(content)
+        if isinstance(parsed, dict):
+            return parsed, False
+    except (TypeError, ValueError):
+        pass
+    
+    text = content or ""
+    fenced = FENCE_PATTERN.search(text)
+    if fenced:
+        text = fenced.group(1)
+    
+    candidate = _first_object(text)
+    if candidate is None:
+        raise JSONRepairError("No JSON object in LLM response")
+    
+    try:
+        parsed = json.loads(candidate)
+    except ValueError as e:
+        raise JSONRepairError(f"Unrepairable JSON in LLM response: {e}") from e
+    if not isinstance(parsed, dict):
+        raise JSONRepairError("LLM response is not a JSON object")
+    return parsed, True
+
+
+def _first_object(text: str) -> Optional[str]:
+    """
+    The first {...} in text, without trailing commas and with unclosed
+    brackets closed
+    
+    Single pass that tracks strings, so braces and commas inside string
+    values are left alone.
+    """
+    start = text.find("{")
+    if start == -1:
+        return None
+    
+    out: List[str] = []
+    closers: List[str] = []
+    in_string = False
+    escaped = False
+    for char in text[start:]:
+        if in_string:
+            out.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            closers.append("}" if char == "{" else "]")
+        elif char in "}]":
+            _drop_trailing_comma(out)
+            if not closers or closers.pop() != char:
+                return None
+            out.append(char)
+            if not closers:
+                return "".join(out)
+            continue
+        out.append(char)
+    
+    # Truncated response: close the open string and brackets
+    if in_string:
+        if escaped:
+            out.pop()
+        out.append('"')
+    _drop_trailing_comma(out)
+    if _last_significant(out) == ":":
+        out.append("null")
+    while closers:
+        out.append(closers.pop())
+    return "".join(out)
+
+
+def _last_significant(out: List[str]) -> Optional[str]:
+    for char in reversed(out):
+        if not char.isspace():
+            return char
+    return None
+
+
+def _drop_trailing_comma(out: List[str]) -> None:
+    if _last_significant(out) == ",":
+        index = len(out) - 1
+        while out[index].isspace():
+            index -= 1
+        del out[index]
@@ -0,0 +1,189 @@
+import asyncio
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+import logging
+from app.utils.db import get_record
+from app.services.lead_service import get_lead_service
+from app.services.job_queue import JobQueue, get_job_queue
+from app.services.email_outbox import EmailOutbox, get_email_outbox
+from app.services.action_scheduler import ActionScheduler, get_action_scheduler
+from app.services.recategorization import RecategorizationService, get_recategorization_service
+from app.services.email_campaign import EmailCampaignService, get_email_campaign_service
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class LeadPipeline:
+    """
+    Background worker pool for post-capture lead automation
+    
+    POST /api/leads stores the lead and enqueues a durable job in the
+    same transaction; the slow steps (Groq categorization, Resend email,
+    assignment, follow-up) run here, as do outbox emails (send_email
+    jobs) in either pipeline mode. Workers poll the job queue, so any
+    number of API or standalone worker processes (python -m app.worker)
+    can drain it together.
+    
+    Delayed rule actions are timers in the same queue; the optional
+    ActionScheduler wakes the workers when one comes due.
+    """
+    
+    def __init__(
+        self,
+        job_queue: JobQueue,
+        workers: int = 4,
+        batch_size: int = 5,
+        poll_interval: float = 2.0,
+        scheduler: Optional[ActionScheduler] = None
+    ):
+        self.job_queue = job_queue
+        self.scheduler = scheduler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.handlers: Dict[str, JobHandler] = {
+            "lead_automation": self._automate_lead,
+            RecategorizationService.JOB_TYPE: self._recategorize,
+            EmailCampaignService.JOB_TYPE: self._send_campaign,
+            EmailOutbox.JOB_TYPE: self._send_email,
+            ActionScheduler.JOB_TYPE: self._fire_delayed_action
+        }
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+    
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+    
+    def register(self, job_type: str, handler: JobHandler) -> None:
+        """Register a handler for a job type"""
+        self.handlers[job_type] = handler
+    
+    async def start(self) -> None:
+        """Start the worker tasks (idempotent)"""
+        if self.running:
+            return
+        self._stopping = False
+        self._tasks = [
+            asyncio.create_task(self._worker(i), name=f"lead-pipeline-{i}")
+            for i in range(self.workers)
+        ]
+        if self.scheduler and self._tasks:
+            await self.scheduler.start(self.wake)
+        logger.info(f"Lead pipeline started with {self.workers} workers ({self.job_queue.worker_id})")
+    
+    async def stop(self, timeout: float = 10.0) -> None:
+        """
+        Stop claiming new jobs and let in-flight ones finish (up to timeout)
+        
+        Jobs cut off by the timeout keep their lease and are redelivered
+        to another worker once it expires.
+        """
+        if not self.running:
+            return
+        if self.scheduler:
+            await self.scheduler.stop()
+        self._stopping = True
+        self._wakeup.set()
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    def wake(self) -> None:
+        """Nudge idle workers to poll now (a job was just enqueued)"""
+        self._wakeup.set()
+    
+    async def _worker(self, worker_id: int) -> None:
+        while not self._stopping:
+            try:
+                jobs = await self.job_queue.claim(self.batch_size)
+            except Exception as e:
+                logger.error(f"Worker {worker_id} failed to claim jobs: {e}")
+                jobs = []
+            
+            if not jobs:
+                await self._wait_for_work()
+                continue
+            
+            await asyncio.gather(*[self._run_job(job) for job in jobs])
+    
+    async def _wait_for_work(self) -> None:
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        if not self._stopping:
+            self._wakeup.clear()
+    
+    async def _run_job(self, job: Dict[str, Any]) -> None:
+        handler = self.handlers.get(job["job_type"])
+        try:
+            if handler is None:
+                raise ValueError(f"No handler registered for job type '{job['job_type']}'")
+            await handler(job)
+        except Exception as e:
+            try:
+                await self.job_queue.fail(job, str(e))
+            except Exception as fail_error:
+                # Lease expiry will redeliver the job
+                logger.error(f"Could not record failure for job {job['id']}: {fail_error}")
+            return
+        
+        try:
+            await self.job_queue.complete(job["id"])
+        except Exception as e:
+            # Lease expiry will redeliver; run_automation is idempotent
+            logger.error(f"Could not mark job {job['id']} completed: {e}")
+    
+    async def _automate_lead(self, job: Dict[str, Any]) -> None:
+        """Handler for lead_automation jobs"""
+        lead = await get_record("leads", job["lead_id"])
+        if not lead:
+            logger.warning(f"Lead {job['lead_id']} no longer exists, dropping job {job['id']}")
+            return
+        result = await get_lead_service().run_automation(
+            lead,
+            job["payload"].get("product_interests", [])
+        )
+        if result.get("email_queued"):
+            self.wake()  # Send the outbox email without waiting for the next poll
+    
+    async def _recategorize(self, job: Dict[str, Any]) -> None:
+        """Handler for ai_recategorization jobs (one time slice of a run)"""
+        await get_recategorization_service().run(job)
+    
+    async def _send_campaign(self, job: Dict[str, Any]) -> None:
+        """Handler for email_campaign jobs (one time slice of a campaign)"""
+        await get_email_campaign_service().run(job)
+    
+    async def _send_email(self, job: Dict[str, Any]) -> None:
+        """Handler for send_email jobs (transactional email outbox)"""
+        if self.scheduler and job["payload"].get("scheduled_for"):
+            self.scheduler.observe(job)
+        await get_email_outbox().dispatch(job)
+    
+    async def _fire_delayed_action(self, job: Dict[str, Any]) -> None:
+        """Handler for delayed_action jobs (timers of delayed rule actions)"""
+        await (self.scheduler or get_action_scheduler()).fire(job)
+
+
+# Initialize pipeline (singleton)
+lead_pipeline = None
+
+def get_lead_pipeline() -> LeadPipeline:
+    """Get or create lead pipeline instance"""
+    global lead_pipeline
+    if lead_pipeline is None:
+        from app.config import settings
+        lead_pipeline = LeadPipeline(
+            job_queue=get_job_queue(),
+            workers=settings.LEAD_PIPELINE_WORKERS,
+            batch_size=settings.JOB_BATCH_SIZE,
+            poll_interval=settings.JOB_POLL_INTERVAL_SECONDS,
+            scheduler=get_action_scheduler()
+        )
+    return lead_pipeline
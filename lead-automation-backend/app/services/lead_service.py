@@ -1,23 +1,39 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Set, Tuple
 from datetime import datetime, timedelta
+import asyncio
 import logging
 from app.utils.db import (
-    insert_record,
     update_record,
-    get_record,
-    query_records
+    insert_records,
+    create_lead_full,
+    record_lead_automation,
+    reevaluate_lead_automation
 )
 from app.services.ai_service import get_ai_service
+from app.services.shadow_evaluation import get_shadow_evaluator
 from app.services.email_service import get_email_service
+from app.services.automation_executor import AutomationExecutor
+from app.models.activity import AICategorizationOutput
+from app.config.automation_rules import get_matching_rule
 
 logger = logging.getLogger(__name__)
 
 class LeadService:
     """Business logic for lead processing"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        ai_deadline_seconds: Optional[float] = None,
+        email_outbox: bool = False,
+        recovery_delay_seconds: float = 300.0
+    ):
         self.ai_service = get_ai_service()
+        self.shadow = get_shadow_evaluator()
         self.email_service = get_email_service()
+        self.executor = AutomationExecutor(self.email_service, outbox=email_outbox)
+        self.ai_deadline_seconds = ai_deadline_seconds
+        self.recovery_delay_seconds = recovery_delay_seconds
+        self._background: Set[asyncio.Task] = set()
     
     async def create_lead_with_products(
         self,
@@ -26,110 +42,416 @@ class LeadService:
     ) -> Dict[str, Any]:
         """
         Complete lead capture workflow:
-        1. Insert lead
-        2. Insert products
-        3. AI categorization
-        4. Log AI activity
-        5. Auto-assign
-        6. Send acknowledgement email
-        7. Create follow-up
+        1. Persist lead and products in one create_lead_full call, before
+           anything is sent, so a rejected lead (e.g. a same-day
+           duplicate) is never emailed
+        2. Run automation (AI, assignment, email, approval, follow-up) and
+           record its results atomically, as run_automation does
+        
+        A lead_automation job due after recovery_delay_seconds is stored
+        with the lead: if step 2 fails or the process dies, a pipeline
+        worker automates the lead then (the job does nothing once the
+        lead is completed).
         """
+        created = await create_lead_full(
+            lead={**self._build_lead_row(lead_data), "pipeline_status": "processing"},
+            products=self._build_product_rows(product_interests),
+            jobs=[self._automation_job(
+                product_interests,
+                run_at=datetime.utcnow() + timedelta(seconds=self.recovery_delay_seconds)
+            )]
+        )
+        lead = created["lead"]
         
-        # Step 1: Insert lead
-        lead = await insert_record("leads", {
-            "name": lead_data["name"],
-            "email": lead_data["email"],
-            "phone": lead_data.get("phone"),
-            "company": lead_data.get("company"),
-            "role": lead_data.get("role"),
-            "location": lead_data.get("location"),
-            "message": lead_data.get("message"),
-            "source": lead_data.get("source", "website_form"),
-            "status": "new"
-        })
+        automation, recorded = await self._automate(lead["id"], lead_data, product_interests)
+        logger.info(f"Created lead {lead['id']} with {len(automation['activities'])} activities")
         
+        return {
+            "lead": {
+                **lead,
+                "pipeline_status": "completed",
+                "first_response_at": automation["first_response_at"]
+            },
+            "products": created.get("products") or [],
+            "ai_categorization": automation["ai_result"]["output"],
+            "assignment": (recorded or {}).get("assignment"),
+            "email_sent": automation["email_result"]["success"],
+            "email_queued": automation["email_result"].get("queued", False)
+        }
+    
+    async def capture_lead(
+        self,
+        lead_data: Dict[str, Any],
+        product_interests: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Persist only the lead and its products (background pipeline mode)
+        
+        The lead is stored with pipeline_status='pending' and a
+        lead_automation job is enqueued in the same transaction; a
+        pipeline worker completes it later via run_automation.
+        """
+        created = await create_lead_full(
+            lead={**self._build_lead_row(lead_data), "pipeline_status": "pending"},
+            products=self._build_product_rows(product_interests),
+            jobs=[self._automation_job(product_interests)]
+        )
+        logger.info(f"Captured lead {created['lead']['id']} for background automation")
+        return created
+    
+    async def run_automation(
+        self,
+        lead: Dict[str, Any],
+        product_interests: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Run the post-capture pipeline for an already stored lead
+        
+        Tracks progress in leads.pipeline_status:
+        pending -> processing -> completed | failed
+        
+        Safe to call again for the same lead (jobs are delivered at least
+        once): completed leads are skipped, and results are recorded
+        atomically together with the completed status.
+        """
         lead_id = lead["id"]
-        logger.info(f"Created lead {lead_id}")
+        if lead.get("pipeline_status") == "completed":
+            logger.info(f"Lead {lead_id} already automated, skipping")
+            return {"lead_id": lead_id, "skipped": True}
         
-        # Step 2: Insert products
-        products = []
-        for product in product_interests:
-            p = await insert_record("lead_products", {
-                "lead_id": lead_id,
-                "category": product["category"],
-                "product": product["product"],
-                "quantity": product.get("quantity"),
-                "notes": product.get("notes")
-            })
-            products.append(p)
+        await update_record("leads", lead_id, {"pipeline_status": "processing"})
+        
+        automation, recorded = await self._automate(lead_id, lead, product_interests)
+        if recorded is None:
+            return {"lead_id": lead_id, "skipped": True}
         
-        # Step 3: AI Categorization
-        ai_result = await self.ai_service.categorize_lead({
+        logger.info(f"Automation pipeline completed for lead {lead_id}")
+        return {
+            "lead_id": lead_id,
+            "ai_categorization": automation["ai_result"]["output"],
+            "assignment": recorded.get("assignment"),
+            "email_sent": automation["email_result"]["success"],
+            "email_queued": automation["email_result"].get("queued", False)
+        }
+    
+    async def _automate(
+        self,
+        lead_id: str,
+        lead_data: Dict[str, Any],
+        product_interests: List[Dict[str, Any]]
+    ) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+        """
+        Run the automation steps for a stored lead and record the results
+        
+        Returns:
+            (automation, recorded); recorded is None if another worker
+            completed the lead first
+        
+        Raises:
+            Exception: After marking the lead's pipeline as failed
+        """
+        try:
+            automation = await self._run_automation_steps(lead_id, lead_data, product_interests)
+            
+            recorded = await record_lead_automation(
+                lead_id,
+                assignment=automation["assignment"],
+                activities=automation["activities"],
+                first_response_at=automation["first_response_at"],
+                jobs=automation["jobs"]
+            )
+        
+        except Exception as e:
+            logger.error(f"Automation pipeline failed for lead {lead_id}: {e}")
+            await update_record("leads", lead_id, {"pipeline_status": "failed"})
+            raise
+        
+        if recorded is None:
+            logger.info(f"Lead {lead_id} was completed by another worker, results discarded")
+            return automation, None
+        
+        self._schedule_upgrade(lead_id, lead_data, product_interests, automation)
+        self.shadow.submit(lead_id, automation["ai_result"])
+        return automation, recorded
+    
+    async def _run_automation_steps(
+        self,
+        lead_id: str,
+        lead_data: Dict[str, Any],
+        product_interests: List[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Automation steps shared by the inline and background paths:
+        1. AI categorization (within ai_deadline_seconds if set; the
+           fallback answer is used meanwhile and the AI answer is applied
+           by _upgrade_categorization once it lands)
+        2. Match an AUTOMATION_RULES entry and run its actions
+           (email, assignment, follow-up, approval) as a concurrent DAG
+        3. Build activity log (AI result, rule actions, automation timings)
+        
+        Nothing is written to the database here; callers persist the
+        returned assignment and activity rows. Inline emails carry an
+        Idempotency-Key derived from the lead id, so a recovery run after
+        a failed write does not email the lead again.
+        """
+        product_names = [p["product"] for p in product_interests]
+        
+        # Step 1: AI Categorization
+        ai_input = {
             "role": lead_data.get("role"),
             "location": lead_data.get("location"),
-            "products": [p["product"] for p in product_interests],
+            "products": product_names,
             "message": lead_data.get("message")
-        })
+        }
+        pending_ai = None
+        if self.ai_deadline_seconds:
+            ai_result, pending_ai = await self.ai_service.categorize_lead_within(
+                ai_input, self.ai_deadline_seconds
+            )
+        else:
+            ai_result = await self.ai_service.categorize_lead(ai_input)
+        priority = ai_result["output"]["priority"]
         
-        # Step 4: Log AI activity
-        await insert_record("lead_activity", {
-            "lead_id": lead_id,
-            "type": "ai_result",
-            "status": "completed",
-            "message": "AI analyzed lead and suggested priority action",
-            "actor_type": "ai",
-            "metadata": ai_result
+        # Step 2: Run the matching automation rule
+        rule = get_matching_rule(ai_result["output"])
+        approval = self._build_approval(lead_data, product_interests, priority)
+        run = await self.executor.execute(rule, {
+            "lead_data": lead_data,
+            "products": product_names,
+            "ai_output": ai_result["output"],
+            "approval": approval,
+            "idempotency_key": f"lead-{lead_id}"
         })
         
-        # Step 5: Auto-assign based on priority
-        priority = ai_result["output"]["priority"]
-        sla_hours = 1 if priority == "high" else 24
+        # Step 3: Build activity log
+        activities = [
+            {
+                "type": "ai_result",
+                "status": "completed",
+                "message": "AI analyzed lead and suggested priority action",
+                "actor_type": "ai",
+                "metadata": ai_result
+            },
+            *run["activities"]
+        ]
         
-        assignment = await insert_record("assignments", {
-            "lead_id": lead_id,
-            "owner_id": "system_auto",  # TODO: Implement round-robin assignment
-            "owner_name": "Auto-assigned",
-            "sla_deadline": (datetime.utcnow() + timedelta(hours=sla_hours)).isoformat()
-        })
+        # Content-based approvals apply even when the rule has no approval step
+        if approval and not any(a["type"] == "approval" for a in run["activities"]):
+            activities.append(approval)
         
-        # Log assignment activity
-        await insert_record("lead_activity", {
-            "lead_id": lead_id,
-            "type": "assignment",
+        activities.append({
+            "type": "automation",
             "status": "completed",
-            "message": f"Lead auto-assigned with {sla_hours}h SLA",
+            "message": f"Automation rule '{run['rule_name']}' executed",
             "actor_type": "system",
             "metadata": {
-                "owner_id": assignment["owner_id"],
-                "owner_name": assignment["owner_name"],
-                "sla_deadline": assignment["sla_deadline"]
+                "rule_name": run["rule_name"],
+                "actions": run["timings"],
+                "total_ms": run["total_ms"]
             }
         })
         
-        # Step 6: Send acknowledgement email
-        email_result = await self.email_service.send_acknowledgement(
-            to_email=lead_data["email"],
-            name=lead_data["name"],
-            products=[p["product"] for p in product_interests]
-        )
+        return {
+            "ai_result": ai_result,
+            "rule_name": run["rule_name"],
+            "assignment": run["assignment"],
+            "email_result": run["email_result"] or {"success": False},
+            "activities": activities,
+            "first_response_at": run["first_response_at"],
+            "jobs": run["jobs"],
+            "pending_ai": pending_ai
+        }
+    
+    # ============================================
+    # LATE AI RESULTS (deadline mode)
+    # ============================================
+    
+    def _schedule_upgrade(
+        self,
+        lead_id: str,
+        lead_data: Dict[str, Any],
+        product_interests: List[Dict[str, Any]],
+        automation: Dict[str, Any]
+    ) -> None:
+        """Apply the late AI answer in the background, if one is pending"""
+        if not automation.get("pending_ai"):
+            return
+        task = asyncio.create_task(self._upgrade_categorization(
+            lead_id,
+            lead_data,
+            product_interests,
+            automation["ai_result"],
+            automation["rule_name"],
+            automation["pending_ai"]
+        ))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+    
+    async def _upgrade_categorization(
+        self,
+        lead_id: str,
+        lead_data: Dict[str, Any],
+        product_interests: List[Dict[str, Any]],
+        provisional: Dict[str, Any],
+        provisional_rule: Optional[str],
+        pending_ai: asyncio.Task
+    ) -> None:
+        """
+        Record the AI answer that missed the deadline
         
-        # Log email activity
-        await insert_record("lead_activity", {
-            "lead_id": lead_id,
-            "type": "email",
-            "status": "completed" if email_result["success"] else "failed",
-            "message": "Acknowledgement email sent" if email_result["success"] else "Email failed",
-            "actor_type": "system",
-            "metadata": email_result
-        })
+        Always logs it as a second ai_result activity. Only if priority,
+        intent or lead type changed is the lead moved to the matching
+        rule: assignment (owner and SLA), follow-up and delayed actions
+        replace provisional_rule's in one reevaluate_lead_automation call;
+        the acknowledgement email already went out and is not repeated.
+        """
+        try:
+            ai_result = await pending_ai
+            if ai_result["method"] == "fallback":
+                return  # AI failed too; the provisional answer stands
+            
+            activities = [{
+                "type": "ai_result",
+                "status": "completed",
+                "message": "AI categorization arrived after deadline",
+                "actor_type": "ai",
+                "metadata": {**ai_result, "supersedes": provisional["method"]}
+            }]
+            
+            # The fallback uses its own spellings (product_info, home_owner)
+            changes = {}
+            for field in AICategorizationOutput.ALLOWED_VALUES:
+                before = AICategorizationOutput.canonical(field, provisional["output"].get(field))
+                after = ai_result["output"].get(field)
+                if before != after:
+                    changes[field] = {"from": before, "to": after}
+            if changes:
+                reevaluation = await self._reevaluate(lead_data, product_interests, ai_result, changes)
+                await reevaluate_lead_automation(
+                    lead_id,
+                    provisional_rule,
+                    assignment=reevaluation["assignment"],
+                    activities=activities + reevaluation["activities"],
+                    jobs=reevaluation["jobs"]
+                )
+            else:
+                await insert_records("lead_activity", [{**a, "lead_id": lead_id} for a in activities])
+            logger.info(f"Applied late AI categorization to lead {lead_id} ({len(changes)} fields changed)")
+        except Exception as e:
+            logger.error(f"Could not apply late AI categorization to lead {lead_id}: {e}")
+    
+    async def _reevaluate(
+        self,
+        lead_data: Dict[str, Any],
+        product_interests: List[Dict[str, Any]],
+        ai_result: Dict[str, Any],
+        changes: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Redo assignment, follow-up and delayed actions under the rule for
+        the AI answer
         
-        # Update first_response_at
-        if email_result["success"]:
-            await update_record("leads", lead_id, {
-                "first_response_at": datetime.utcnow().isoformat()
-            })
+        Returns:
+            Dict with the new assignment, the activities (new follow-up,
+            scheduled emails and an audit row) and timer jobs, for
+            reevaluate_lead_automation to apply in place of the
+            provisional ones
+        """
+        rule = get_matching_rule(ai_result["output"])
+        run = await self.executor.execute(rule, {
+            "lead_data": lead_data,
+            "products": [p["product"] for p in product_interests],
+            "ai_output": ai_result["output"],
+            "approval": None
+        }, only=["create_assignment", "create_follow_up"], include_delayed=True)
         
-        # Step 6.5: Check if approval needed for high-value scenarios
+        summary = ", ".join(f"{field} {c['from']} -> {c['to']}" for field, c in changes.items())
+        return {
+            "assignment": run["assignment"],
+            "activities": run["activities"] + [{
+                "type": "automation",
+                "status": "completed",
+                "message": f"Categorization upgraded ({summary}); SLA and follow-up re-evaluated",
+                "actor_type": "system",
+                "metadata": {
+                    "rule_name": run["rule_name"],
+                    "changes": changes,
+                    "actions": run["timings"],
+                    "total_ms": run["total_ms"]
+                }
+            }],
+            "jobs": run["jobs"]
+        }
+    
+    async def drain(self, timeout: float = 10.0) -> None:
+        """Wait for pending late-AI upgrades (shutdown)"""
+        if self._background:
+            await asyncio.wait(self._background, timeout=timeout)
+    
+    # ============================================
+    # ROW BUILDERS
+    # ============================================
+    
+    @staticmethod
+    def _automation_job(
+        product_interests: List[Dict[str, Any]],
+        run_at: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """lead_automation job row (runs now unless run_at is given)"""
+        job = {
+            "job_type": "lead_automation",
+            "payload": {"product_interests": product_interests}
+        }
+        if run_at:
+            job["run_at"] = run_at.isoformat()
+        return job
+    
+    def _build_lead_row(
+        self,
+        lead_data: Dict[str, Any],
+        first_response_at: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Source-data columns for the leads table"""
+        return {
+            "name": lead_data["name"],
+            "email": lead_data["email"],
+            "phone": lead_data.get("phone"),
+            "company": lead_data.get("company"),
+            "role": lead_data.get("role"),
+            "location": lead_data.get("location"),
+            "message": lead_data.get("message"),
+            "source": lead_data.get("source", "website_form"),
+            "status": "new",
+            "first_response_at": first_response_at
+        }
+    
+    def _build_product_rows(
+        self,
+        product_interests: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """lead_products rows (lead_id is filled in by the database)"""
+        return [
+            {
+                "category": product["category"],
+                "product": product["product"],
+                "quantity": product.get("quantity"),
+                "notes": product.get("notes")
+            }
+            for product in product_interests
+        ]
+    
+    def _build_approval(
+        self,
+        lead_data: Dict[str, Any],
+        product_interests: List[Dict[str, Any]],
+        priority: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Check if approval needed for high-value scenarios
+        
+        Returns:
+            Pending approval activity row, or None
+        """
         approval_needed = False
         approval_reason = ""
         approval_details = {}
@@ -179,83 +501,27 @@ class LeadService:
                 "message": "Bulk/discount request requires pricing approval"
             }
         
-        # Create approval if needed
-        if approval_needed:
-            logger.info(f"Creating approval for lead {lead_id}: {approval_reason}")
-            
-            await insert_record("lead_activity", {
-                "lead_id": lead_id,
-                "type": "approval",
-                "status": "pending",
-                "message": f"Approval Required: {approval_details['message']}",
-                "actor_type": "system",
-                "metadata": {
-                    "approval_type": approval_reason,
-                    "lead_name": lead_data["name"],
-                    "lead_email": lead_data["email"],
-                    "lead_phone": lead_data.get("phone"),
-                    "lead_role": lead_data.get("role"),
-                    "lead_company": lead_data.get("company"),
-                    "priority": priority,
-                    "details": approval_details,
-                    "created_at": datetime.utcnow().isoformat()
-                }
-            })
-        
-        
-        # Step 7: Create follow-up based on priority
-        # All leads get a follow-up, but timing varies by priority
-        follow_up_schedule = {
-            "high": {
-                "minutes": 30,
-                "action": "call",
-                "message": "High-priority lead - urgent call required",
-                "reason": "high_priority_lead"
-            },
-            "medium": {
-                "hours": 24,
-                "action": "email",
-                "message": "Medium-priority lead - follow up within 24 hours",
-                "reason": "medium_priority_lead"
-            },
-            "low": {
-                "days": 3,
-                "action": "nurture",
-                "message": "Low-priority lead - add to nurture sequence",
-                "reason": "low_priority_lead"
-            }
-        }
-        
-        schedule_config = follow_up_schedule.get(priority, follow_up_schedule["medium"])
+        if not approval_needed:
+            return None
         
-        # Calculate scheduled time based on priority
-        if "minutes" in schedule_config:
-            scheduled_time = datetime.utcnow() + timedelta(minutes=schedule_config["minutes"])
-        elif "hours" in schedule_config:
-            scheduled_time = datetime.utcnow() + timedelta(hours=schedule_config["hours"])
-        else:  # days
-            scheduled_time = datetime.utcnow() + timedelta(days=schedule_config["days"])
+        logger.info(f"Creating approval for lead {lead_data['email']}: {approval_reason}")
         
-        await insert_record("lead_activity", {
-            "lead_id": lead_id,
-            "type": "follow_up",
+        return {
+            "type": "approval",
             "status": "pending",
-            "message": schedule_config["message"],
+            "message": f"Approval Required: {approval_details['message']}",
+            "actor_type": "system",
             "metadata": {
-                "action": schedule_config["action"],
-                "scheduled_for": scheduled_time.isoformat(),
-                "reason": schedule_config["reason"],
-                "priority": priority
+                "approval_type": approval_reason,
+                "lead_name": lead_data["name"],
+                "lead_email": lead_data["email"],
+                "lead_phone": lead_data.get("phone"),
+                "lead_role": lead_data.get("role"),
+                "lead_company": lead_data.get("company"),
+                "priority": priority,
+                "details": approval_details,
+                "created_at": datetime.utcnow().isoformat()
             }
-        })
-        
-        
-        return {
-            "lead": lead,
-            "products": products,
-            "ai_categorization": ai_result["output"],
-            "assignment": assignment,
-            "email_sent": email_result["success"]
         }
 
 
@@ -266,5 +532,11 @@ def get_lead_service() -> LeadService:
     """Get or create lead service instance"""
     global lead_service
     if lead_service is None:
-        lead_service = LeadService()
+        from app.config import settings
+        lead_service = LeadService(
+            ai_deadline_seconds=settings.AI_DEADLINE_MS / 1000 if settings.AI_DEADLINE_MS else None,
+            email_outbox=settings.EMAIL_OUTBOX_ENABLED,
+            # Sync captures are automated inline well within a job lease
+            recovery_delay_seconds=settings.JOB_LEASE_SECONDS
+        )
     return lead_service
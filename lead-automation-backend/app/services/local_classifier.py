@@ -0,0 +1,182 @@
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+import math
+import re
+
+logger = logging.getLogger(__name__)
+
+
+class LocalClassifier:
+    """
+    Multinomial naive Bayes fast path in front of the LLM
+    
+    Trained on past ai_result activities (their stored input and the
+    model's output), one model per target field. Features are message
+    words plus role and product tokens. When every target is predicted
+    with at least confidence_threshold, the prediction is used instead of
+    a Groq call; a small audit_rate of confident predictions still goes to
+    Groq so the agreement rate stays measurable.
+    """
+    
+    MODEL_NAME = "naive_bayes_local"
+    TARGETS = ("priority", "intent", "lead_type")
+    
+    # Same mapping the prompt asks the LLM to follow
+    SUGGESTED_ACTIONS = {
+        "high": ["call", "send_quote"],
+        "medium": ["email", "send_quote"],
+        "low": ["nurture", "email"]
+    }
+    
+    def __init__(
+        self,
+        confidence_threshold: float = 0.9,
+        min_samples: int = 200,
+        audit_rate: float = 0.05
+    ):
+        self.confidence_threshold = confidence_threshold
+        self.min_samples = min_samples
+        self.audit_rate = audit_rate
+        self.samples = 0
+        self._models: Dict[str, Dict[str, Any]] = {}
+        
+        self.predictions = 0
+        self.confident = 0
+        self.audited = 0
+        self.agreed = 0
+    
+    @property
+    def ready(self) -> bool:
+        return self.samples >= self.min_samples
+    
+    @staticmethod
+    def features(lead_input: Dict[str, Any]) -> List[str]:
+        """Message words plus role and product tokens"""
+        tokens = set(re.findall(r"[a-z0-9]+", (lead_input.get("message") or "").lower()))
+        role = (lead_input.get("role") or "").strip().lower()
+        if role:
+            tokens.add(f"role={role}")
+        for product in lead_input.get("products") or []:
+            tokens.add(f"product={product.strip().lower()}")
+        return list(tokens)
+    
+    def train(self, examples: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> int:
+        """
+        Fit on (input, output) pairs
+        
+        Returns:
+            Number of examples used
+        """
+        examples = [
+            (lead_input, output) for lead_input, output in examples
+            if all(output.get(target) for target in self.TARGETS)
+        ]
+        models = {}
+        for target in self.TARGETS:
+            class_counts = Counter()
+            token_counts: Dict[str, Counter] = {}
+            vocabulary = set()
+            for lead_input, output in examples:
+                label = output[target]
+                tokens = self.features(lead_input)
+                class_counts[label] += 1
+                token_counts.setdefault(label, Counter()).update(tokens)
+                vocabulary.update(tokens)
+            models[target] = {
+                "class_counts": class_counts,
+                "token_counts": token_counts,
+                "token_totals": {label: sum(counts.values()) for label, counts in token_counts.items()},
+                "vocabulary": vocabulary
+            }
+        
+        self._models = models
+        self.samples = len(examples)
+        logger.info(f"Local classifier trained on {self.samples} examples (ready={self.ready})")
+        return self.samples
+    
+    def predict(self, lead_input: Dict[str, Any]) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Predict all targets
+        
+        Returns:
+            (output, confidence) where confidence is the lowest per-target
+            posterior, or None if the model is not trained enough
+        """
+        if not self.ready:
+            return None
+        
+        tokens = self.features(lead_input)
+        output = {}
+        confidence = 1.0
+        for target in self.TARGETS:
+            label, probability = self._predict_target(self._models[target], tokens)
+            output[target] = label
+            confidence = min(confidence, probability)
+        
+        output["suggested_actions"] = self.SUGGESTED_ACTIONS.get(output["priority"], ["email"])
+        output["reasoning"] = f"Local {self.MODEL_NAME} prediction ({confidence:.0%} confidence)"
+        
+        self.predictions += 1
+        if confidence >= self.confidence_threshold:
+            self.confident += 1
+        return output, confidence
+    
+    def record_agreement(self, predicted: Dict[str, Any], actual: Dict[str, Any]) -> bool:
+        """Compare an audited prediction with the LLM's answer"""
+        agreed = all(predicted.get(target) == actual.get(target) for target in self.TARGETS)
+        self.audited += 1
+        if agreed:
+            self.agreed += 1
+        return agreed
+    
+    def stats(self) -> Dict[str, Any]:
+        """Fast-path hit ratio and agreement with the LLM"""
+        return {
+            "trained_samples": self.samples,
+            "ready": self.ready,
+            "predictions": self.predictions,
+            "confident": self.confident,
+            "hit_ratio": round(self.confident / self.predictions, 4) if self.predictions else 0.0,
+            "audited": self.audited,
+            "agreement_rate": round(self.agreed / self.audited, 4) if self.audited else None
+        }
+    
+    @staticmethod
+    def _predict_target(model: Dict[str, Any], tokens: List[str]) -> Tuple[str, float]:
+        class_counts = model["class_counts"]
+        total = sum(class_counts.values())
+        vocabulary_size = len(model["vocabulary"]) or 1
+        known = [token for token in tokens if token in model["vocabulary"]]
+        
+        # Log-space scores with Laplace smoothing, then softmax
+        scores = {}
+        for label, count in class_counts.items():
+            counts = model["token_counts"][label]
+            denominator = model["token_totals"][label] + vocabulary_size
+            scores[label] = math.log(count / total) + sum(
+                math.log((counts[token] + 1) / denominator) for token in known
+            )
+        
+        best = max(scores, key=scores.get)
+        normalizer = sum(math.exp(score - scores[best]) for score in scores.values())
+        return best, 1.0 / normalizer
+
+
+async def load_training_examples(limit: int = 5000) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """(input, output) pairs from stored LLM categorizations"""
+    from app.utils.db import query_records
+    
+    activities = await query_records(
+        "lead_activity",
+        filters={"type": "ai_result"},
+        order_by="created_at.desc",
+        limit=limit
+    )
+    examples = []
+    for activity in activities:
+        metadata = activity.get("metadata") or {}
+        # Only learn from the LLM (cache hits replay its answers), not from heuristics
+        if metadata.get("method") in ("ai", "cache") and metadata.get("input") and metadata.get("output"):
+            examples.append((metadata["input"], metadata["output"]))
+    return examples
@@ -0,0 +1,188 @@
+from typing import Dict, Any, Optional
+from datetime import datetime
+import asyncio
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class BudgetExceededError(Exception):
+    """Raised instead of calling a dependency whose rate or spend budget is used up"""
+
+
+class TokenBucket:
+    """Bucket holding up to capacity units, refilled continuously"""
+    
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.level = capacity
+        self._updated_at = time.monotonic()
+    
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated_at) * self.refill_per_second)
+        self._updated_at = now
+    
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount is available (inf if it never fits)"""
+        self.refill()
+        if amount > self.capacity:
+            return math.inf
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.refill_per_second
+
+
+class RateGovernor:
+    """
+    Requests/minute, tokens/minute and daily token budget for Groq calls
+    
+    - acquire() reserves one request and the estimated tokens; callers
+      queue (FIFO) until both buckets can cover them, and are shed with
+      BudgetExceededError if that would take longer than max_wait
+    - record_usage() replaces the estimate with the tokens Groq reports
+    - once the daily budget (UTC day) is spent every call is shed, so
+      leads go to the rule-based fallback until midnight
+    - try_acquire() reserves only if there is room right now (for
+      optional work that must never delay live calls)
+    - backoff() pauses all calls after a 429 from Groq
+    
+    Limits are per process; with several API/worker processes, divide
+    the account limits between them.
+    """
+    
+    def __init__(
+        self,
+        requests_per_minute: int = 30,
+        tokens_per_minute: int = 12000,
+        daily_token_budget: int = 0,
+        max_wait: float = 10.0
+    ):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self.daily_token_budget = daily_token_budget
+        self.max_wait = max_wait
+        self.day = datetime.utcnow().date()
+        self.tokens_today = 0
+        self.requests_today = 0
+        self.granted = 0
+        self.queued = 0
+        self.shed = {"rate_limited": 0, "daily_budget": 0}
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    @property
+    def budget_exhausted(self) -> bool:
+        self._roll_day()
+        return bool(self.daily_token_budget) and self.tokens_today >= self.daily_token_budget
+    
+    async def acquire(self, estimated_tokens: int) -> None:
+        """
+        Wait for room for one call of estimated_tokens
+        
+        Raises:
+            BudgetExceededError: daily budget spent, or no room within max_wait
+        """
+        if not self._within_daily_budget(estimated_tokens):
+            self.shed["daily_budget"] += 1
+            raise BudgetExceededError("Daily AI token budget exhausted")
+        
+        deadline = time.monotonic() + self.max_wait
+        try:
+            await asyncio.wait_for(self._lock.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            self.shed["rate_limited"] += 1
+            raise BudgetExceededError("Timed out queueing for the AI rate limit")
+        
+        try:
+            waited = False
+            while True:
+                wait = self._wait_time(estimated_tokens)
+                if wait <= 0:
+                    break
+                if time.monotonic() + wait > deadline:
+                    self.shed["rate_limited"] += 1
+                    raise BudgetExceededError(f"AI rate limit would delay this call {wait:.1f}s")
+                if not waited:
+                    waited = True
+                    self.queued += 1
+                await asyncio.sleep(wait)
+            self._reserve(estimated_tokens)
+        finally:
+            self._lock.release()
+    
+    def try_acquire(self, estimated_tokens: int) -> bool:
+        """Reserve room for one call only if available now (never queues, not counted as shed)"""
+        if (
+            self._lock.locked()
+            or not self._within_daily_budget(estimated_tokens)
+            or self._wait_time(estimated_tokens) > 0
+        ):
+            return False
+        self._reserve(estimated_tokens)
+        return True
+    
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]) -> None:
+        """Correct a reservation with the usage Groq reported"""
+        if actual_tokens is None:
+            return
+        difference = actual_tokens - estimated_tokens
+        # May go below zero: an underestimate is paid back before the next call
+        self.tokens.level = min(self.tokens.capacity, self.tokens.level - difference)
+        self.tokens_today = max(0, self.tokens_today + difference)
+    
+    def backoff(self, seconds: float) -> None:
+        """Hold all calls for seconds (Groq answered 429)"""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        logger.warning(f"Groq rate limited, pausing AI calls for {seconds:.1f}s")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Budget usage for /health and /api/ai/metrics"""
+        self._roll_day()
+        self.requests.refill()
+        self.tokens.refill()
+        return {
+            "requests_per_minute": self.requests.capacity,
+            "tokens_per_minute": self.tokens.capacity,
+            "requests_available": int(self.requests.level),
+            "tokens_available": int(self.tokens.level),
+            "daily_token_budget": self.daily_token_budget or None,
+            "tokens_today": self.tokens_today,
+            "requests_today": self.requests_today,
+            "budget_used_pct": (
+                round(self.tokens_today / self.daily_token_budget * 100, 1) if self.daily_token_budget else None
+            ),
+            "budget_exhausted": self.budget_exhausted,
+            "granted": self.granted,
+            "queued": self.queued,
+            "shed": dict(self.shed),
+            "paused_for_seconds": round(max(0.0, self._blocked_until - time.monotonic()), 1)
+        }
+    
+    def _within_daily_budget(self, estimated_tokens: int) -> bool:
+        self._roll_day()
+        return not self.daily_token_budget or self.tokens_today + estimated_tokens <= self.daily_token_budget
+    
+    def _wait_time(self, estimated_tokens: int) -> float:
+        return max(
+            self._blocked_until - time.monotonic(),
+            self.requests.wait_time(1),
+            self.tokens.wait_time(estimated_tokens)
+        )
+    
+    def _reserve(self, estimated_tokens: int) -> None:
+        self.requests.level -= 1
+        self.tokens.level -= estimated_tokens
+        self.tokens_today += estimated_tokens
+        self.requests_today += 1
+        self.granted += 1
+    
+    def _roll_day(self) -> None:
+        today = datetime.utcnow().date()
+        if today != self.day:
+            self.day = today
+            self.tokens_today = 0
+            self.requests_today = 0
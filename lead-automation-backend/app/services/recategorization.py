@@ -0,0 +1,176 @@
+from typing import Dict, Any, List, Optional
+import logging
+from app.utils.db import execute_rpc, insert_records
+from app.services.ai_service import AIService, get_ai_service
+from app.services.job_queue import CheckpointedRun, JobQueue, get_job_queue
+
+logger = logging.getLogger(__name__)
+
+
+class RecategorizationService(CheckpointedRun):
+    """
+    Bulk replay of stored ai_result inputs after a prompt or model bump
+    
+    A run pages (keyset on lead_id) through leads whose latest ai_result
+    has another prompt_version or a model that is no longer used, re-runs the stored inputs with
+    AIService.categorize_leads and bulk-inserts new ai_result rows.
+    
+    Runs execute as ai_recategorization jobs on the durable job queue,
+    checkpointed and time-sliced by CheckpointedRun. A lead whose new
+    ai_result was written is no longer stale, so a repeated page skips
+    it; a page's stats are counted only once its rows are written.
+    """
+    
+    JOB_TYPE = "ai_recategorization"
+    
+    def __init__(
+        self,
+        ai_service: AIService,
+        job_queue: JobQueue,
+        page_size: int = 100,
+        batch_size: int = 10,
+        concurrency: int = 2,
+        rate_per_minute: int = 120,
+        slice_seconds: float = 120.0
+    ):
+        super().__init__(job_queue, slice_seconds)
+        self.ai_service = ai_service
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.rate_per_minute = rate_per_minute
+    
+    async def start(
+        self,
+        page_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        rate_per_minute: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Create a run checkpoint and enqueue its first job"""
+        total = await execute_rpc("count_stale_ai_results", self._version_params())
+        
+        run = await self._create({
+            "prompt_version": self.ai_service.PROMPT_VERSION,
+            "models": self.ai_service.models,
+            "options": {
+                "page_size": page_size or self.page_size,
+                "batch_size": batch_size or self.batch_size,
+                "concurrency": concurrency or self.concurrency,
+                "rate_per_minute": rate_per_minute or self.rate_per_minute
+            },
+            "total": total or 0,
+            "written": 0,
+            "fallback": 0,
+            "changed": {"any": 0, "priority": 0, "intent": 0, "lead_type": 0},
+            "priority_transitions": {}
+        })
+        
+        logger.info(f"Started AI re-categorization run {run['run_id']} for {run['total']} leads")
+        return run
+    
+    async def _fetch_page(self, run_id: str, checkpoint: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return await execute_rpc("get_stale_ai_results", {
+            **self._version_params(),
+            "after_lead": checkpoint["cursor"],
+            "page_size": checkpoint["options"]["page_size"]
+        })
+    
+    async def _process_page(
+        self,
+        run_id: str,
+        page: List[Dict[str, Any]],
+        checkpoint: Dict[str, Any]
+    ) -> None:
+        """Re-run one page and bulk-insert the new ai_result rows"""
+        options = checkpoint["options"]
+        inputs = [(row.get("metadata") or {}).get("input") or {} for row in page]
+        
+        # At most `concurrency` batch requests in flight for this run, so
+        # live lead traffic keeps most of the Groq concurrency
+        results = []
+        group = options["batch_size"] * options["concurrency"]
+        for start in range(0, len(inputs), group):
+            results.extend(await self.ai_service.categorize_leads(
+                inputs[start:start + group],
+                batch_size=options["batch_size"],
+                allow_local=False
+            ))
+        
+        rows = []
+        compared = []
+        for row, result in zip(page, results):
+            if result["method"] == "fallback":
+                continue  # Keep the older answer rather than replace it with heuristics
+            
+            previous = row.get("metadata") or {}
+            compared.append((previous.get("output") or {}, result["output"]))
+            rows.append({
+                "lead_id": row["lead_id"],
+                "type": "ai_result",
+                "status": "completed",
+                "message": (
+                    f"AI re-categorization with prompt {result['prompt_version']} "
+                    f"(was {previous.get('prompt_version')})"
+                ),
+                "actor_type": "system",
+                "metadata": {**result, "replay_of": row["activity_id"]}
+            })
+        
+        if rows:
+            await insert_records("lead_activity", rows)
+        
+        checkpoint["processed"] += len(page)
+        checkpoint["fallback"] += len(page) - len(rows)
+        checkpoint["written"] += len(rows)
+        for previous, current in compared:
+            self._count_changes(checkpoint, previous, current)
+    
+    @staticmethod
+    def _count_changes(
+        checkpoint: Dict[str, Any],
+        previous: Dict[str, Any],
+        current: Dict[str, Any]
+    ) -> None:
+        changed = [
+            field for field in ("priority", "intent", "lead_type")
+            if previous.get(field) != current.get(field)
+        ]
+        for field in changed:
+            checkpoint["changed"][field] += 1
+        if changed:
+            checkpoint["changed"]["any"] += 1
+        if "priority" in changed:
+            transition = f"{previous.get('priority')}->{current.get('priority')}"
+            transitions = checkpoint["priority_transitions"]
+            transitions[transition] = transitions.get(transition, 0) + 1
+    
+    def _summary(self, checkpoint: Dict[str, Any]) -> str:
+        return f"{checkpoint['processed']} processed, {checkpoint['changed']['priority']} priorities changed"
+    
+    def _version_params(self) -> Dict[str, Any]:
+        return {
+            # categorize_leads stamps multi-lead answers with the batch prompt
+            "current_prompt_versions": [self.ai_service.PROMPT_VERSION, self.ai_service.BATCH_PROMPT_VERSION],
+            "current_models": self.ai_service.models
+        }
+
+
+# Initialize recategorization service (singleton)
+recategorization_service = None
+
+def get_recategorization_service() -> RecategorizationService:
+    """Get or create recategorization service instance"""
+    global recategorization_service
+    if recategorization_service is None:
+        from app.config import settings
+        recategorization_service = RecategorizationService(
+            ai_service=get_ai_service(),
+            job_queue=get_job_queue(),
+            page_size=settings.RECATEGORIZE_PAGE_SIZE,
+            batch_size=settings.RECATEGORIZE_BATCH_SIZE,
+            concurrency=settings.RECATEGORIZE_CONCURRENCY,
+            rate_per_minute=settings.RECATEGORIZE_RATE_PER_MINUTE,
+            slice_seconds=settings.RECATEGORIZE_SLICE_SECONDS
+        )
+    return recategorization_service
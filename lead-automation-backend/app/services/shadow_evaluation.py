@@ -0,0 +1,255 @@
+from groq import AsyncGroq
+from typing import Dict, Any, List, Optional, Set
+from datetime import datetime
+import asyncio
+import httpx
+import logging
+import math
+import random
+import time
+from app.models.activity import AICategorizationOutput
+from app.services.ai_service import AIService, get_ai_service
+from app.services.json_repair import parse_llm_json
+from app.utils.db import insert_record, query_records
+
+logger = logging.getLogger(__name__)
+
+
+class ShadowEvaluator:
+    """
+    Shadow-mode evaluation of a candidate model on live leads
+    
+    A sample_rate share of leads whose primary answer came from the LLM
+    (method ai or cache) is re-categorized by candidate_model in a
+    fire-and-forget task; the answer, its latency and its agreement with
+    the primary answer are stored as an ai_shadow activity.
+    
+    The primary path never waits on it: shadow calls use their own small
+    Groq connection pool and concurrency limit, skip the primary circuit
+    breaker, are dropped (not queued) when the backlog is full or the
+    rate governor has no spare room, and never change the lead.
+    """
+    
+    ACTIVITY_TYPE = "ai_shadow"
+    TARGETS = ("priority", "intent", "lead_type")
+    
+    def __init__(
+        self,
+        ai_service: AIService,
+        candidate_model: Optional[str] = None,
+        api_key: Optional[str] = None,
+        sample_rate: float = 0.05,
+        max_concurrency: int = 2,
+        max_pending: int = 20
+    ):
+        self.ai_service = ai_service
+        self.candidate_model = candidate_model
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+        self.client = None
+        if candidate_model:
+            self.client = AsyncGroq(
+                api_key=api_key,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=max_concurrency),
+                    timeout=ai_service.timeout
+                ),
+                max_retries=0
+            )
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: Set[asyncio.Task] = set()
+        self.started = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.candidate_model) and self.sample_rate > 0
+    
+    def submit(self, lead_id: str, primary: Dict[str, Any]) -> bool:
+        """
+        Maybe start a shadow categorization of a lead (returns at once)
+        
+        Returns:
+            True if a shadow task was started
+        """
+        if not self.enabled or primary.get("method") not in ("ai", "cache"):
+            return False
+        if random.random() >= self.sample_rate:
+            return False
+        if len(self._tasks) >= self.max_pending:
+            self.dropped += 1
+            return False
+        
+        self.started += 1
+        task = asyncio.create_task(self._run(lead_id, primary))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return True
+    
+    async def close(self, timeout: float = 5.0) -> None:
+        """Let running shadow calls finish (up to timeout) and release connections"""
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=timeout)
+        if self.client:
+            await self.client.close()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "candidate_model": self.candidate_model,
+            "sample_rate": self.sample_rate,
+            "pending": len(self._tasks),
+            "started": self.started,
+            "dropped": self.dropped,
+            "completed": self.completed,
+            "failed": self.failed
+        }
+    
+    async def _run(self, lead_id: str, primary: Dict[str, Any]) -> None:
+        try:
+            messages = self.ai_service.build_messages(primary["input"])
+            estimated_tokens = self.ai_service.estimate_tokens(messages)
+            governor = self.ai_service.governor
+            if governor and not governor.try_acquire(estimated_tokens):
+                self.dropped += 1
+                return
+            
+            output, error, latency_ms = None, None, None
+            async with self.semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await self.client.chat.completions.create(
+                        model=self.candidate_model,
+                        messages=messages,
+                        temperature=0.3,
+                        response_format={"type": "json_object"},
+                        timeout=self.ai_service.timeout
+                    )
+                    latency_ms = round((time.perf_counter() - started) * 1000, 1)
+                    data, _ = parse_llm_json(response.choices[0].message.content)
+                    output = AICategorizationOutput.model_validate(data).model_dump()
+                except Exception as e:
+                    error = str(e)
+                    latency_ms = latency_ms or round((time.perf_counter() - started) * 1000, 1)
+            
+            await insert_record("lead_activity", self._activity(lead_id, primary, output, error, latency_ms))
+            if error:
+                self.failed += 1
+            else:
+                self.completed += 1
+        except Exception as e:
+            # Shadow runs must never surface errors into the live path
+            self.failed += 1
+            logger.warning(f"Shadow categorization for lead {lead_id} failed: {e}")
+    
+    def _activity(
+        self,
+        lead_id: str,
+        primary: Dict[str, Any],
+        output: Optional[Dict[str, Any]],
+        error: Optional[str],
+        latency_ms: Optional[float]
+    ) -> Dict[str, Any]:
+        agreement = None
+        if output:
+            fields = {field: output[field] == primary["output"].get(field) for field in self.TARGETS}
+            agreement = {**fields, "all": all(fields.values())}
+        
+        return {
+            "lead_id": lead_id,
+            "type": self.ACTIVITY_TYPE,
+            "status": "failed" if error else "completed",
+            "message": f"Shadow categorization by {self.candidate_model}",
+            "actor_type": "system",
+            "metadata": {
+                "input": primary["input"],
+                "output": output,
+                "error": error,
+                "model": self.candidate_model,
+                "prompt_version": self.ai_service.PROMPT_VERSION,
+                "latency_ms": latency_ms,
+                "primary": {
+                    "model": primary.get("model"),
+                    "prompt_version": primary.get("prompt_version"),
+                    "method": primary.get("method"),
+                    "output": primary["output"]
+                },
+                "agreement": agreement,
+                "timestamp": datetime.utcnow().isoformat()
+            }
+        }
+
+
+async def shadow_report(model: Optional[str] = None, limit: int = 1000) -> Dict[str, Any]:
+    """
+    Agreement and latency of shadow runs, from the latest ai_shadow activities
+    
+    Args:
+        model: Only runs of this candidate model (default: all)
+        limit: Most recent activities considered
+    """
+    activities = await query_records(
+        "lead_activity",
+        filters={"type": ShadowEvaluator.ACTIVITY_TYPE},
+        order_by="created_at.desc",
+        limit=limit
+    )
+    runs = [a.get("metadata") or {} for a in activities]
+    if model:
+        runs = [run for run in runs if run.get("model") == model]
+    
+    answered = [run for run in runs if run.get("agreement")]
+    agreement = {
+        field: round(sum(run["agreement"][field] for run in answered) / len(answered), 4) if answered else None
+        for field in (*ShadowEvaluator.TARGETS, "all")
+    }
+    
+    priority_changes: Dict[str, int] = {}
+    for run in answered:
+        if not run["agreement"]["priority"]:
+            change = f"{run['primary']['output'].get('priority')}->{run['output']['priority']}"
+            priority_changes[change] = priority_changes.get(change, 0) + 1
+    
+    latencies = sorted(run["latency_ms"] for run in runs if run.get("latency_ms") is not None)
+    return {
+        "model": model,
+        "samples": len(runs),
+        "answered": len(answered),
+        "errors": len(runs) - len(answered),
+        "agreement_rate": agreement,
+        "priority_changes": priority_changes,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 1) if latencies else None,
+            "p50": _percentile(latencies, 50),
+            "p90": _percentile(latencies, 90),
+            "p99": _percentile(latencies, 99),
+            "max": latencies[-1] if latencies else None
+        }
+    }
+
+
+def _percentile(values: List[float], percent: float) -> Optional[float]:
+    """Nearest-rank percentile of sorted values"""
+    if not values:
+        return None
+    rank = max(1, math.ceil(len(values) * percent / 100))
+    return values[rank - 1]
+
+
+# Initialize shadow evaluator (singleton)
+shadow_evaluator = None
+
+def get_shadow_evaluator() -> ShadowEvaluator:
+    """Get or create shadow evaluator instance"""
+    global shadow_evaluator
+    if shadow_evaluator is None:
+        from app.config import settings
+        shadow_evaluator = ShadowEvaluator(
+            ai_service=get_ai_service(),
+            candidate_model=settings.AI_SHADOW_MODEL or None,
+            api_key=settings.GROQ_API_KEY,
+            sample_rate=settings.AI_SHADOW_SAMPLE_RATE,
+            max_concurrency=settings.AI_SHADOW_MAX_CONCURRENCY
+        )
+    return shadow_evaluator
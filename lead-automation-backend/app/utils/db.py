@@ -1,6 +1,9 @@
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
+from concurrent.futures import ThreadPoolExecutor
 from app.config import settings
 from typing import Dict, Any, List, Optional
+import asyncio
+import httpx
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,12 +12,50 @@ logger = logging.getLogger(__name__)
 # SUPABASE CLIENT
 # ============================================
 
+# Shared keep-alive connection pool for all PostgREST calls
+http_client = httpx.Client(
+    limits=httpx.Limits(
+        max_connections=settings.DB_POOL_SIZE,
+        max_keepalive_connections=settings.DB_POOL_SIZE
+    ),
+    timeout=settings.DB_TIMEOUT_SECONDS
+)
+
 # Initialize Supabase client with service key for backend operations
 supabase: Client = create_client(
     settings.SUPABASE_URL,
-    settings.SUPABASE_SERVICE_KEY  # Use service key for backend (bypasses RLS)
+    settings.SUPABASE_SERVICE_KEY,  # Use service key for backend (bypasses RLS)
+    options=ClientOptions(httpx_client=http_client)
 )
 
+# The Supabase client is synchronous, so every .execute() runs on this bounded
+# executor instead of the event loop. Sized to match the connection pool so
+# concurrent requests overlap their I/O without queueing on connections.
+db_executor = ThreadPoolExecutor(
+    max_workers=settings.DB_POOL_SIZE,
+    thread_name_prefix="supabase-db"
+)
+
+
+async def run_query(query: Any) -> Any:
+    """
+    Execute a Supabase query builder without blocking the event loop
+    
+    Args:
+        query: Query/RPC builder exposing a blocking .execute()
+        
+    Returns:
+        The APIResponse returned by .execute()
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, query.execute)
+
+
+def close_db() -> None:
+    """Release the DB executor and pooled connections (app shutdown)"""
+    db_executor.shutdown(wait=False)
+    http_client.close()
+
 
 # ============================================
 # DATABASE HELPER FUNCTIONS
@@ -35,7 +76,7 @@ async def execute_rpc(function_name: str, params: Optional[Dict] = None) -> Any:
         Exception: If RPC call fails
     """
     try:
-        result = supabase.rpc(function_name, params or {}).execute()
+        result = await run_query(supabase.rpc(function_name, params or {}))
         return result.data
     except Exception as e:
         logger.error(f"RPC call to {function_name} failed: {str(e)}")
@@ -55,6 +96,132 @@ async def get_lead_full(lead_id: str) -> Dict[str, Any]:
     return await execute_rpc("get_lead_full", {"lead_uuid": lead_id})
 
 
+async def create_lead_full(
+    lead: Dict[str, Any],
+    products: List[Dict[str, Any]],
+    assignment: Optional[Dict[str, Any]] = None,
+    activities: Optional[List[Dict[str, Any]]] = None,
+    jobs: Optional[List[Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Atomically insert a lead with its products, assignment, activities
+    and automation jobs
+    
+    Args:
+        lead: Lead columns (name, email, ..., first_response_at)
+        products: Product interest rows (without lead_id)
+        assignment: Optional assignment row (without lead_id)
+        activities: Activity rows (without lead_id), inserted in order
+        jobs: automation_jobs rows ({"job_type", "payload"}) to enqueue
+        
+    Returns:
+        Dict with the inserted lead, products and assignment
+    """
+    return await execute_rpc("create_lead_full", {
+        "lead_payload": lead,
+        "products_payload": products,
+        "assignment_payload": assignment,
+        "activities_payload": activities or [],
+        "jobs_payload": jobs or []
+    })
+
+
+async def record_lead_automation(
+    lead_id: str,
+    assignment: Optional[Dict[str, Any]] = None,
+    activities: Optional[List[Dict[str, Any]]] = None,
+    first_response_at: Optional[str] = None,
+    jobs: Optional[List[Dict[str, Any]]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Atomically store background automation results and mark the lead's
+    pipeline as completed
+    
+    Args:
+        lead_id: UUID of the captured lead
+        assignment: Optional assignment row (without lead_id)
+        activities: Activity rows (without lead_id), inserted in order
+        first_response_at: ISO timestamp of the first outbound response
+        jobs: automation_jobs rows ({"job_type", "payload"}) to enqueue,
+            e.g. outbox emails
+        
+    Returns:
+        Dict with the inserted assignment, or None if the lead was
+        already completed (e.g. a redelivered job)
+    """
+    return await execute_rpc("record_lead_automation", {
+        "lead_uuid": lead_id,
+        "assignment_payload": assignment,
+        "activities_payload": activities or [],
+        "response_at": first_response_at,
+        "jobs_payload": jobs or []
+    })
+
+
+async def reevaluate_lead_automation(
+    lead_id: str,
+    superseded_rule: Optional[str],
+    assignment: Optional[Dict[str, Any]] = None,
+    activities: Optional[List[Dict[str, Any]]] = None,
+    jobs: Optional[List[Dict[str, Any]]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Atomically apply a re-evaluated rule to an automated lead
+    
+    Cancels the superseded rule's pending follow-ups, delayed_action
+    timers and scheduled outbox emails (follow-ups created by hand are
+    kept), updates the active assignment and writes the new activities
+    and jobs in one transaction.
+    
+    Args:
+        lead_id: UUID of the lead
+        superseded_rule: Name of the rule the lead was automated under
+        assignment: Optional new owner and SLA ({"owner_id",
+            "owner_name", "sla_deadline"}) for the active assignment
+        activities: Activity rows (without lead_id), inserted in order
+        jobs: automation_jobs rows to enqueue (the new rule's timers)
+        
+    Returns:
+        Dict with cancelled_follow_ups, cancelled_timers,
+        cancelled_emails and reassigned counts, or None if the lead does
+        not exist
+    """
+    return await execute_rpc("reevaluate_lead_automation", {
+        "lead_uuid": lead_id,
+        "superseded_rule": superseded_rule,
+        "assignment_payload": assignment,
+        "activities_payload": activities or [],
+        "jobs_payload": jobs or []
+    })
+
+
+async def record_email_delivery(
+    activity_id: str,
+    status: str,
+    message: str,
+    metadata: Dict[str, Any],
+    first_response_at: Optional[str] = None
+) -> None:
+    """
+    Record the outcome of an outbox email on its activity
+    
+    Args:
+        activity_id: UUID of the queued email activity
+        status: New activity status (completed, failed)
+        message: New activity message
+        metadata: Keys merged into the activity metadata
+        first_response_at: ISO send time; sets the lead's
+            first_response_at if it is still empty
+    """
+    await execute_rpc("record_email_delivery", {
+        "activity_uuid": activity_id,
+        "new_status": status,
+        "new_message": message,
+        "metadata_patch": metadata,
+        "response_at": first_response_at
+    })
+
+
 async def get_dashboard_stats() -> Dict[str, Any]:
     """
     Get dashboard statistics
@@ -101,13 +268,75 @@ async def insert_record(table: str, data: Dict[str, Any]) -> Dict[str, Any]:
         Exception: If insert fails
     """
     try:
-        result = supabase.table(table).insert(data).execute()
+        result = await run_query(supabase.table(table).insert(data))
         return result.data[0] if result.data else {}
     except Exception as e:
         logger.error(f"Insert into {table} failed: {str(e)}")
         raise
 
 
+async def insert_records(
+    table: str,
+    rows: List[Dict[str, Any]],
+    chunk_size: int = 500
+) -> List[Dict[str, Any]]:
+    """
+    Insert many records with multi-row INSERTs
+    
+    Args:
+        table: Table name
+        rows: List of data dicts to insert
+        chunk_size: Max rows per request (keeps payloads under PostgREST limits)
+        
+    Returns:
+        Inserted records, in the same order as rows
+        
+    Raises:
+        Exception: If any chunk fails (earlier chunks stay committed)
+    """
+    inserted = []
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        try:
+            result = await run_query(supabase.table(table).insert(chunk))
+            inserted.extend(result.data or [])
+        except Exception as e:
+            logger.error(
+                f"Bulk insert into {table} failed at rows {start}-{start + len(chunk) - 1}: {str(e)}"
+            )
+            raise
+    return inserted
+
+
+async def upsert_record(
+    table: str,
+    data: Dict[str, Any],
+    on_conflict: str = "id"
+) -> Dict[str, Any]:
+    """
+    Insert a record, or update it if on_conflict already matches a row
+    
+    Args:
+        table: Table name
+        data: Data dict to upsert
+        on_conflict: Unique column(s) that identify an existing row
+        
+    Returns:
+        Upserted record
+        
+    Raises:
+        Exception: If upsert fails
+    """
+    try:
+        result = await run_query(
+            supabase.table(table).upsert(data, on_conflict=on_conflict)
+        )
+        return result.data[0] if result.data else {}
+    except Exception as e:
+        logger.error(f"Upsert into {table} failed: {str(e)}")
+        raise
+
+
 async def update_record(
     table: str, 
     record_id: str, 
@@ -128,7 +357,9 @@ async def update_record(
         Exception: If update fails
     """
     try:
-        result = supabase.table(table).update(data).eq("id", record_id).execute()
+        result = await run_query(
+            supabase.table(table).update(data).eq("id", record_id)
+        )
         return result.data[0] if result.data else {}
     except Exception as e:
         logger.error(f"Update {table} record {record_id} failed: {str(e)}")
@@ -147,7 +378,9 @@ async def get_record(table: str, record_id: str) -> Optional[Dict[str, Any]]:
         Record dict or None
     """
     try:
-        result = supabase.table(table).select("*").eq("id", record_id).execute()
+        result = await run_query(
+            supabase.table(table).select("*").eq("id", record_id)
+        )
         return result.data[0] if result.data else None
     except Exception as e:
         logger.error(f"Get {table} record {record_id} failed: {str(e)}")
@@ -193,7 +426,7 @@ async def query_records(
         if limit:
             query = query.limit(limit)
         
-        result = query.execute()
+        result = await run_query(query)
         return result.data or []
     except Exception as e:
         logger.error(f"Query {table} failed: {str(e)}")
@@ -212,7 +445,7 @@ async def delete_record(table: str, record_id: str) -> bool:
         True if successful, False otherwise
     """
     try:
-        supabase.table(table).delete().eq("id", record_id).execute()
+        await run_query(supabase.table(table).delete().eq("id", record_id))
         return True
     except Exception as e:
         logger.error(f"Delete from {table} record {record_id} failed: {str(e)}")
@@ -231,7 +464,9 @@ async def get_leads_with_products() -> List[Dict[str, Any]]:
         List of leads with products nested
     """
     try:
-        result = supabase.table("leads").select("*, lead_products(*)").execute()
+        result = await run_query(
+            supabase.table("leads").select("*, lead_products(*)")
+        )
         return result.data or []
     except Exception as e:
         logger.error(f"Get leads with products failed: {str(e)}")
@@ -0,0 +1,46 @@
+"""
+Standalone automation worker
+
+Drains the durable automation_jobs queue without serving HTTP. Run as
+many as needed next to the API (set LEAD_PIPELINE_WORKERS per process):
+    
+    python -m app.worker
+"""
+import asyncio
+import logging
+import signal
+from app.config import settings
+from app.services.lead_pipeline import get_lead_pipeline
+from app.services.lead_service import get_lead_service
+from app.services.ai_service import get_ai_service
+from app.services.shadow_evaluation import get_shadow_evaluator
+from app.services.email_service import get_email_service
+from app.utils.db import close_db
+
+logger = logging.getLogger(__name__)
+
+
+async def main():
+    await get_ai_service().train_local_classifier(settings.AI_LOCAL_TRAINING_LIMIT)
+    
+    pipeline = get_lead_pipeline()
+    await pipeline.start()
+    
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    
+    await stop.wait()
+    logger.info("Shutting down worker")
+    await pipeline.stop()
+    await get_lead_service().drain()
+    await get_shadow_evaluator().close()
+    await get_ai_service().close()
+    await get_email_service().close()
+    close_db()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,41 @@
+import json
+import pytest
+from unittest.mock import Mock, AsyncMock
+
+
+@pytest.fixture
+def make_checkpointed_run(monkeypatch):
+    """
+    Factory for a CheckpointedRun service over a mocked queue and checkpoint store
+    
+    make_checkpointed_run(ServiceClass, *service_args, checkpoint=..., slice_seconds=60)
+    returns (service, queue, saved); saved collects (status, checkpoint copy)
+    for every checkpoint written, including a new run's first one.
+    """
+    def make(service_class, *service_args, checkpoint, slice_seconds=60):
+        queue = Mock()
+        queue.enqueue = AsyncMock(return_value={"id": "job-2"})
+        queue.lease_seconds = 300
+        service = service_class(*service_args, queue, slice_seconds=slice_seconds)
+        saved = []
+        
+        async def save(run_id, holder, data, status, keep_lock=True):
+            saved.append((status, json.loads(json.dumps(data))))
+            return True
+        
+        async def create(table, data, on_conflict=None):
+            saved.append((data["status"], json.loads(json.dumps(data["checkpoint"]))))
+            return data
+        
+        service._save = save
+        service._lock = AsyncMock(return_value={
+            "run_id": "run-1",
+            "job_type": service_class.JOB_TYPE,
+            "status": "running",
+            "acquired": True,
+            "checkpoint": checkpoint
+        })
+        monkeypatch.setattr("app.services.job_queue.upsert_record", create)
+        return service, queue, saved
+    
+    return make
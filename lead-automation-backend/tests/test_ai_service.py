@@ -1,5 +1,6 @@
 import pytest
 from app.services.ai_service import AIService
+from app.models.activity import AICategorizationOutput
 from unittest.mock import Mock, patch, AsyncMock
 import json
 
@@ -250,6 +251,15 @@ def test_fallback_categorization_role_mapping(ai_service):
         assert result["output"]["lead_type"] == expected_type
 
 
+def test_fallback_output_has_canonical_spellings(ai_service):
+    """Test fallback values map onto the validated AI vocabulary"""
+    output = ai_service.fallback_categorization({"role": "Home Owner", "message": "Browsing"})["output"]
+    
+    canonical = {field: AICategorizationOutput.canonical(field, output[field]) for field in AICategorizationOutput.ALLOWED_VALUES}
+    assert canonical == {"priority": "medium", "intent": "information", "lead_type": "homeowner"}
+    assert AICategorizationOutput.canonical("intent", "Not Sure") == "Not Sure"  # unknown values pass through
+
+
 # ============================================================================
 # Test: Retry Logic
 # ============================================================================
@@ -375,6 +385,38 @@ def test_fallback_categorization_handles_empty_message(ai_service):
     assert result["output"]["intent"] == "product_info"  # Default
 
 
+def test_fallback_categorization_batch_matches_scalar(ai_service):
+    """Test the column-wise fallback gives the per-lead fallback's results"""
+    leads = [
+        {"role": "Builder", "message": "Need a QUOTE for tiles"},
+        {"role": "ARCHITECT", "message": "Please call today"},
+        {"role": "Contractor", "message": "we need\nnow"},  # keyword split across lines
+        {"role": "Interior Designer", "message": "Browsing catalogues"},
+        {"role": None, "message": None},
+        {"role": "Home Owner", "message": "cheapest price asap"}
+    ]
+    
+    results = ai_service.fallback_categorization_batch(
+        [lead["message"] for lead in leads],
+        [lead["role"] for lead in leads],
+        leads
+    )
+    
+    for lead, result in zip(leads, results):
+        expected = ai_service.fallback_categorization(lead)
+        assert result["input"] is lead
+        assert result["output"] == expected["output"]
+        assert result["method"] == "fallback"
+        assert result["model"] == expected["model"]
+    assert [r["output"]["priority"] for r in results] == ["high", "high", "medium", "medium", "medium", "high"]
+
+
+def test_fallback_categorization_batch_rejects_misaligned_columns(ai_service):
+    """Test columns of different lengths are rejected"""
+    with pytest.raises(ValueError):
+        ai_service.fallback_categorization_batch(["urgent"], [])
+
+
 # ============================================================================
 # Test: Model and Prompt Versioning
 # ============================================================================
@@ -438,3 +480,1194 @@ async def test_categorize_lead_stores_input_for_replay(ai_service):
         assert result["input"]["location"] == "Pune"
         assert result["input"]["products"] == ["Product 1", "Product 2"]
         assert result["input"]["message"] == "Test message"
+
+
+# ============================================================================
+# Test: Async Client and Concurrency Limit
+# ============================================================================
+
+def make_groq_response(content: str, prompt_tokens: int = None, completion_tokens: int = None):
+    """Minimal chat completion response (with token usage if given)"""
+    response = Mock(choices=[Mock(message=Mock(content=content))])
+    if prompt_tokens is not None:
+        response.usage = Mock(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+    return response
+
+
+@pytest.mark.asyncio
+async def test_groq_calls_do_not_block_event_loop():
+    """Test concurrent categorizations overlap instead of running back to back"""
+    import asyncio
+    import time
+    
+    service = AIService(api_key="test_api_key_12345", max_concurrency=10)
+    
+    async def slow_create(**kwargs):
+        await asyncio.sleep(0.1)
+        return make_groq_response('{"priority": "high", "intent": "quote_request", "lead_type": "builder"}')
+    
+    service.client.chat.completions.create = AsyncMock(side_effect=slow_create)
+    
+    started = time.perf_counter()
+    results = await asyncio.gather(*[
+        service.categorize_lead({"role": "Builder", "message": f"Lead {i}"}) for i in range(5)
+    ])
+    elapsed = time.perf_counter() - started
+    
+    assert all(r["method"] == "ai" for r in results)
+    assert elapsed < 0.3  # 5 x 0.1s sequentially would take 0.5s
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_groq_concurrency_is_bounded():
+    """Test the semaphore caps in-flight Groq calls"""
+    import asyncio
+    
+    service = AIService(api_key="test_api_key_12345", max_concurrency=2)
+    in_flight = 0
+    peak = 0
+    
+    async def tracked_create(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        return make_groq_response('{"priority": "low", "intent": "information", "lead_type": "homeowner"}')
+    
+    service.client.chat.completions.create = AsyncMock(side_effect=tracked_create)
+    
+    await asyncio.gather(*[service.categorize_lead({"message": f"Lead {i}"}) for i in range(6)])
+    
+    assert peak == 2
+    assert service.client.chat.completions.create.await_count == 6
+    await service.close()
+
+
+# ============================================================================
+# Test: Categorization Cache
+# ============================================================================
+
+AI_OUTPUT = {
+    "priority": "low",
+    "intent": "information",
+    "lead_type": "homeowner",
+    "suggested_actions": ["nurture", "email"],
+    "reasoning": "Browsing"
+}
+
+
+@pytest.mark.asyncio
+async def test_cache_serves_repeated_input_without_llm_call():
+    """Test an identical (after normalization) input is answered from cache"""
+    from app.services.ai_cache import CategorizationCache
+    
+    service = AIService(api_key="test_api_key_12345", cache=CategorizationCache())
+    
+    with patch.object(service, '_call_groq_api', return_value=AI_OUTPUT) as mock_api:
+        first = await service.categorize_lead({
+            "role": "Home Owner",
+            "products": ["Tiles", "Laminate"],
+            "message": "Just looking at flooring options"
+        })
+        second = await service.categorize_lead({
+            "role": "home owner",
+            "products": ["Laminate", "Tiles"],
+            "message": "  Just looking at   flooring options "
+        })
+    
+    assert mock_api.call_count == 1
+    assert first["method"] == "ai"
+    assert second["method"] == "cache"
+    assert second["output"] == AI_OUTPUT
+    assert second["model"] == service.MODEL_VERSION
+    assert second["input"]["role"] == "home owner"
+    assert "cached_at" in second
+    
+    stats = service.cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_cache_does_not_store_fallback_results():
+    """Test fallback answers are not cached, so the next call retries the AI"""
+    from app.services.ai_cache import CategorizationCache
+    
+    service = AIService(api_key="test_api_key_12345", cache=CategorizationCache())
+    
+    with patch.object(service, '_call_groq_api', side_effect=Exception("API Error")):
+        result = await service.categorize_lead({"message": "Need a quote"}, retry_count=1)
+    
+    assert result["method"] == "fallback"
+    assert service.cache.stats()["entries"] == 0
+
+
+def test_cache_key_depends_on_prompt_version():
+    """Test a prompt or model change never reuses old answers"""
+    from app.services.ai_cache import CategorizationCache
+    
+    lead_input = {"role": "Builder", "message": "Bulk order"}
+    
+    assert CategorizationCache.make_key(lead_input, "m", "v1") != CategorizationCache.make_key(lead_input, "m", "v2")
+    assert CategorizationCache.make_key(lead_input, "m", "v1") != CategorizationCache.make_key(lead_input, "m2", "v1")
+
+
+@pytest.mark.asyncio
+async def test_cache_lru_eviction_and_ttl():
+    """Test least recently used entries are evicted and expired ones miss"""
+    from app.services.ai_cache import CategorizationCache
+    
+    cache = CategorizationCache(max_entries=2)
+    await cache.set("a", AI_OUTPUT, "m", "v")
+    await cache.set("b", AI_OUTPUT, "m", "v")
+    await cache.get("a")  # a is now most recently used
+    await cache.set("c", AI_OUTPUT, "m", "v")
+    
+    assert await cache.get("b") is None
+    assert await cache.get("a") is not None
+    assert await cache.get("c") is not None
+    
+    expired = CategorizationCache(ttl_seconds=0)
+    await expired.set("a", AI_OUTPUT, "m", "v")
+    assert await expired.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_cache_persistent_tier_fills_memory_tier():
+    """Test a persistent hit is served and then kept in memory"""
+    from app.services.ai_cache import CategorizationCache
+    
+    cache = CategorizationCache(persistent=True)
+    row = {"output": AI_OUTPUT, "created_at": "2026-01-01T10:00:00", "expires_at": "2999-01-01T00:00:00"}
+    
+    with patch("app.utils.db.query_records", new=AsyncMock(return_value=[row])) as mock_query:
+        first = await cache.get("key")
+        second = await cache.get("key")
+    
+    mock_query.assert_awaited_once()
+    assert first["output"] == AI_OUTPUT
+    assert second["cached_at"] == "2026-01-01T10:00:00"
+    assert cache.stats()["persistent_hits"] == 1
+    assert cache.stats()["hits"] == 1
+
+
+# ============================================================================
+# Test: Single-Flight Coalescing
+# ============================================================================
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_request(ai_service):
+    """Test N concurrent identical categorizations make one Groq call"""
+    import asyncio
+    
+    async def slow_api(lead_input):
+        await asyncio.sleep(0.05)
+        return AI_OUTPUT
+    
+    with patch.object(ai_service, '_call_groq_api', side_effect=slow_api) as mock_api:
+        results = await asyncio.gather(*[
+            ai_service.categorize_lead({"role": "Home Owner", "message": "Just looking"})
+            for _ in range(5)
+        ] + [ai_service.categorize_lead({"role": "Builder", "message": "Bulk order"})])
+    
+    assert mock_api.call_count == 2  # one per distinct input
+    assert all(r["output"] == AI_OUTPUT for r in results)
+    assert sum(1 for r in results if r.get("coalesced")) == 4
+    assert ai_service.stats()["coalesced_calls"] == 4
+    assert ai_service.stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_request(ai_service):
+    """Test the shared request survives the first caller being cancelled"""
+    import asyncio
+    
+    async def slow_api(lead_input):
+        await asyncio.sleep(0.05)
+        return AI_OUTPUT
+    
+    with patch.object(ai_service, '_call_groq_api', side_effect=slow_api):
+        first = asyncio.create_task(ai_service.categorize_lead({"message": "Just looking"}))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(ai_service.categorize_lead({"message": "Just looking"}))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        result = await second
+    
+    assert result["method"] == "ai"
+    assert result["coalesced"] is True
+
+
+# ============================================================================
+# Test: Batch Categorization
+# ============================================================================
+
+def batch_output(priority):
+    return {"priority": priority, "intent": "quote_request", "lead_type": "builder", "suggested_actions": ["call"]}
+
+
+@pytest.mark.asyncio
+async def test_categorize_leads_packs_batch_and_maps_by_index(ai_service):
+    """Test one LLM request answers the whole batch, mapped back by index"""
+    leads = [{"role": "Builder", "message": f"Lead {i}"} for i in range(3)]
+    response = {"results": [
+        {"index": 2, **batch_output("low")},
+        {"index": 0, **batch_output("high")},
+        {"index": 1, **batch_output("medium")}
+    ]}
+    
+    with patch.object(ai_service, '_complete_json', new=AsyncMock(return_value=response)) as mock_complete, \
+         patch.object(ai_service, '_call_groq_api') as mock_single:
+        results = await ai_service.categorize_leads(leads)
+    
+    mock_complete.assert_awaited_once()
+    mock_single.assert_not_called()
+    assert [r["output"]["priority"] for r in results] == ["high", "medium", "low"]
+    assert [r["input"]["message"] for r in results] == ["Lead 0", "Lead 1", "Lead 2"]
+    assert all(r["method"] == "ai" and r["batch_size"] == 3 for r in results)
+    assert results[0]["prompt_version"] == ai_service.BATCH_PROMPT_VERSION
+    assert "index" not in results[0]["output"]
+    assert "Lead 2" in mock_complete.call_args.args[0][1]["content"]
+
+
+@pytest.mark.asyncio
+async def test_categorize_leads_retries_unanswered_items_individually(ai_service):
+    """Test missing or malformed batch items fall back to per-lead calls"""
+    leads = [{"role": "Builder", "message": f"Lead {i}"} for i in range(3)]
+    response = {"results": [
+        {"index": 0, **batch_output("high")},
+        {"index": 1, "priority": "medium"},  # missing intent and lead_type
+        "garbage"
+    ]}
+    
+    with patch.object(ai_service, '_complete_json', new=AsyncMock(return_value=response)), \
+         patch.object(ai_service, '_call_groq_api', return_value=batch_output("low")) as mock_single:
+        results = await ai_service.categorize_leads(leads)
+    
+    assert mock_single.call_count == 2
+    assert [r["output"]["priority"] for r in results] == ["high", "low", "low"]
+    assert "batch_size" not in results[1]
+
+
+@pytest.mark.asyncio
+async def test_categorize_leads_whole_batch_failure_uses_fallback(ai_service):
+    """Test a failed batch request degrades to per-lead AI, then fallback"""
+    leads = [{"role": "Builder", "message": "Need a quote ASAP"}, {"role": "Home Owner", "message": "Browsing"}]
+    
+    with patch.object(ai_service, '_complete_json', new=AsyncMock(side_effect=Exception("invalid JSON"))), \
+         patch.object(ai_service, '_call_groq_api', side_effect=Exception("API Error")):
+        results = await ai_service.categorize_leads(leads, retry_count=1)
+    
+    assert [r["method"] for r in results] == ["fallback", "fallback"]
+    assert results[0]["output"]["priority"] == "high"
+
+
+@pytest.mark.asyncio
+async def test_categorize_leads_dedupes_and_uses_cache():
+    """Test duplicates are sent once and cached inputs are not sent at all"""
+    from app.services.ai_cache import CategorizationCache
+    
+    service = AIService(api_key="test_api_key_12345", cache=CategorizationCache())
+    cached_input = {"role": "Home Owner", "message": "Just looking"}
+    key = CategorizationCache.make_key(cached_input, service.MODEL_VERSION, service.PROMPT_VERSION)
+    await service.cache.set(key, AI_OUTPUT, service.MODEL_VERSION, service.PROMPT_VERSION)
+    
+    leads = [cached_input, {"role": "Builder", "message": "Bulk"}, {"role": "builder", "message": "bulk"}]
+    
+    with patch.object(service, '_call_groq_api', return_value=batch_output("high")) as mock_single:
+        results = await service.categorize_leads(leads)
+    
+    mock_single.assert_called_once()  # single pending input, no batch prompt needed
+    assert results[0]["method"] == "cache"
+    assert results[1]["output"] == results[2]["output"]
+    assert results[2]["input"]["role"] == "builder"
+
+
+@pytest.mark.asyncio
+async def test_categorize_leads_splits_into_batches(ai_service):
+    """Test inputs are split into batch_size chunks"""
+    leads = [{"message": f"Lead {i}"} for i in range(5)]
+    
+    async def answer(messages, **kwargs):
+        count = messages[1]["content"].count("] Role:")
+        return {"results": [{"index": i, **batch_output("medium")} for i in range(count)]}
+    
+    with patch.object(ai_service, '_complete_json', new=AsyncMock(side_effect=answer)) as mock_complete, \
+         patch.object(ai_service, '_call_groq_api', return_value=batch_output("medium")) as mock_single:
+        results = await ai_service.categorize_leads(leads, batch_size=2)
+    
+    assert mock_complete.await_count == 2  # chunks of 2 + 2, the last lead goes single
+    assert mock_single.call_count == 1
+    assert len(results) == 5
+
+
+# ============================================================================
+# Test: Prompt Layout
+# ============================================================================
+
+@pytest.mark.asyncio
+async def test_prompt_static_system_message_and_compact_lead(ai_service):
+    """Test rules go in an identical system message and the lead in a one-line user message"""
+    ai_service.client.chat.completions.create = AsyncMock(return_value=make_groq_response(json.dumps(AI_OUTPUT)))
+    
+    await ai_service._call_groq_api({"role": "Architect", "location": "Pune", "products": ["A", "B"], "message": "Need  a\nquote"})
+    await ai_service._call_groq_api({"role": "Builder", "message": "Bulk order"})
+    
+    first, second = [call.kwargs["messages"] for call in ai_service.client.chat.completions.create.call_args_list]
+    assert first[0] == second[0] == {"role": "system", "content": AIService.SYSTEM_PROMPT}
+    assert "EXAMPLES:" in first[0]["content"]
+    assert first[1] == {
+        "role": "user",
+        "content": "Role: Architect | Location: Pune | Products: A, B | Message: Need a quote"
+    }
+    assert len(second[1]["content"]) < 100
+
+
+def test_prompt_long_message_cut_to_token_cap():
+    """Test messages past max_message_tokens are cut at a word boundary and counted"""
+    service = AIService(api_key="test_api_key_12345", max_message_tokens=10)
+    message = "word " * 100
+    
+    user_message = service.build_messages({"role": "Builder", "message": message})[1]["content"]
+    
+    body = user_message.split("Message: ")[1]
+    assert body.endswith(" [truncated]")
+    assert len(body) <= 10 * service.CHARS_PER_TOKEN + len(" [truncated]")
+    assert service.stats()["truncated_messages"] == 1
+    
+    short = service.build_messages({"role": "Builder", "message": "Need quote"})[1]["content"]
+    assert short.endswith("Message: Need quote")
+    assert service.truncated_messages == 1
+
+
+@pytest.mark.asyncio
+async def test_prompt_token_usage_recorded_per_call(ai_service, caplog):
+    """Test prompt, cached and completion tokens are counted and logged for each call"""
+    import logging
+    
+    response = make_groq_response(json.dumps(AI_OUTPUT))
+    response.usage = Mock(prompt_tokens=700, completion_tokens=60, prompt_tokens_details=Mock(cached_tokens=640))
+    ai_service.client.chat.completions.create = AsyncMock(return_value=response)
+    
+    with caplog.at_level(logging.INFO, logger="app.services.ai_service"):
+        await ai_service._call_groq_api({"role": "Builder", "message": "Bulk order"})
+    
+    counters = ai_service.stats()["models"][ai_service.MODEL_VERSION]
+    assert counters["prompt_tokens"] == 700
+    assert counters["cached_prompt_tokens"] == 640
+    assert counters["completion_tokens"] == 60
+    assert "700 prompt (640 cached) + 60 completion tokens" in caplog.text
+
+
+# ============================================================================
+# Test: Local Fast-Path Classifier
+# ============================================================================
+
+def training_examples():
+    """Synthetic history of LLM answers"""
+    examples = []
+    for i in range(30):
+        examples.append((
+            {"role": "Builder", "products": ["Tiles"], "message": f"Bulk pricing for {i} unit project"},
+            {"priority": "high", "intent": "quote_request", "lead_type": "builder"}
+        ))
+        examples.append((
+            {"role": "Home Owner", "products": ["Laminate"], "message": f"Just looking at flooring options {i}"},
+            {"priority": "low", "intent": "information", "lead_type": "homeowner"}
+        ))
+    return examples
+
+
+def test_local_classifier_predicts_confidently_after_training():
+    """Test naive Bayes learns the stored LLM answers"""
+    from app.services.local_classifier import LocalClassifier
+    
+    classifier = LocalClassifier(min_samples=50)
+    assert classifier.predict({"message": "anything"}) is None  # untrained
+    
+    assert classifier.train(training_examples()) == 60
+    output, confidence = classifier.predict({"role": "Builder", "message": "Bulk pricing for a project"})
+    
+    assert output["priority"] == "high"
+    assert output["lead_type"] == "builder"
+    assert output["suggested_actions"] == ["call", "send_quote"]
+    assert confidence > 0.9
+
+
+@pytest.mark.asyncio
+async def test_confident_local_prediction_skips_llm():
+    """Test a confident prediction answers without calling Groq"""
+    from app.services.local_classifier import LocalClassifier
+    
+    classifier = LocalClassifier(min_samples=50, audit_rate=0)
+    classifier.train(training_examples())
+    service = AIService(api_key="test_api_key_12345", local_classifier=classifier)
+    
+    with patch.object(service, '_call_groq_api') as mock_api:
+        result = await service.categorize_lead({"role": "Home Owner", "message": "Just looking at flooring options"})
+    
+    mock_api.assert_not_called()
+    assert result["method"] == "local"
+    assert result["model"] == LocalClassifier.MODEL_NAME
+    assert result["output"]["priority"] == "low"
+    assert service.stats()["local_classifier"]["hit_ratio"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_low_confidence_prediction_goes_to_llm():
+    """Test leads the model is unsure about are sent to Groq"""
+    from app.services.local_classifier import LocalClassifier
+    
+    classifier = LocalClassifier(min_samples=50, confidence_threshold=0.999999)
+    classifier.train(training_examples())
+    service = AIService(api_key="test_api_key_12345", local_classifier=classifier)
+    
+    with patch.object(service, '_call_groq_api', return_value=AI_OUTPUT) as mock_api:
+        result = await service.categorize_lead({"role": "Contractor", "message": "Do you deliver?"})
+    
+    mock_api.assert_called_once()
+    assert result["method"] == "ai"
+
+
+@pytest.mark.asyncio
+async def test_audited_prediction_records_agreement():
+    """Test sampled confident predictions are checked against Groq"""
+    from app.services.local_classifier import LocalClassifier
+    
+    classifier = LocalClassifier(min_samples=50, audit_rate=1.0)
+    classifier.train(training_examples())
+    service = AIService(api_key="test_api_key_12345", local_classifier=classifier)
+    
+    with patch.object(service, '_call_groq_api', return_value=AI_OUTPUT):
+        result = await service.categorize_lead({"role": "Home Owner", "message": "Just looking at flooring options"})
+    
+    assert result["method"] == "ai"
+    stats = classifier.stats()
+    assert stats["audited"] == 1
+    assert stats["agreement_rate"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_train_local_classifier_uses_llm_answers_only():
+    """Test training skips fallback results"""
+    from app.services.local_classifier import LocalClassifier
+    
+    classifier = LocalClassifier(min_samples=1)
+    service = AIService(api_key="test_api_key_12345", local_classifier=classifier)
+    activities = [
+        {"metadata": {"method": "ai", "input": {"message": "bulk"}, "output": {"priority": "high", "intent": "quote_request", "lead_type": "builder"}}},
+        {"metadata": {"method": "fallback", "input": {"message": "hi"}, "output": {"priority": "medium", "intent": "product_info", "lead_type": "home_owner"}}}
+    ]
+    
+    with patch("app.utils.db.query_records", new=AsyncMock(return_value=activities)) as mock_query:
+        trained = await service.train_local_classifier()
+    
+    assert trained == 1
+    assert mock_query.call_args.kwargs["filters"] == {"type": "ai_result"}
+
+
+# ============================================================================
+# Test: Backoff and Circuit Breaker
+# ============================================================================
+
+def test_backoff_delay_grows_with_jitter_and_caps():
+    """Test retry delays double per attempt, jittered, up to the cap"""
+    service = AIService(api_key="test_api_key_12345", retry_base_delay=1.0, retry_max_delay=4.0)
+    
+    assert 0.5 <= service.backoff_delay(1) <= 1.0
+    assert 1.0 <= service.backoff_delay(2) <= 2.0
+    assert 2.0 <= service.backoff_delay(5) <= 4.0
+
+
+@pytest.mark.asyncio
+async def test_retries_wait_between_attempts(ai_service):
+    """Test failed attempts back off instead of retrying in a tight loop"""
+    with patch.object(ai_service, '_call_groq_api', side_effect=Exception("API Error")), \
+         patch("app.services.ai_service.asyncio.sleep", new=AsyncMock()) as mock_sleep:
+        result = await ai_service.categorize_lead({"message": "Need a quote"})
+    
+    assert result["method"] == "fallback"
+    assert mock_sleep.await_count == 2  # between 3 attempts, none after the last
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_and_skips_groq():
+    """Test repeated Groq failures open the circuit and later leads go straight to fallback"""
+    from app.services.circuit_breaker import CircuitBreaker
+    
+    service = AIService(
+        api_key="test_api_key_12345",
+        breaker=CircuitBreaker("groq", failure_threshold=2, reset_timeout=60),
+        retry_base_delay=0
+    )
+    service.client.chat.completions.create = AsyncMock(side_effect=Exception("503 Service Unavailable"))
+    
+    first = await service.categorize_lead({"message": "Lead 1"})
+    second = await service.categorize_lead({"message": "Lead 2"})
+    
+    assert first["method"] == "fallback"
+    assert second["method"] == "fallback"
+    assert service.client.chat.completions.create.await_count == 2  # tripped after 2, rest skipped
+    stats = service.stats()["circuit_breaker"]
+    assert stats["state"] == "open"
+    assert stats["rejected_calls"] == 2
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_half_open_probe_closes_circuit():
+    """Test a successful probe after the reset timeout closes the circuit"""
+    from app.services.circuit_breaker import CircuitBreaker
+    
+    breaker = CircuitBreaker("groq", failure_threshold=1, reset_timeout=0)
+    service = AIService(api_key="test_api_key_12345", breaker=breaker)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    
+    service.client.chat.completions.create = AsyncMock(return_value=make_groq_response(
+        '{"priority": "high", "intent": "quote_request", "lead_type": "builder"}'
+    ))
+    result = await service.categorize_lead({"message": "Lead"})
+    
+    assert result["method"] == "ai"
+    assert breaker.state == "closed"
+    await service.close()
+
+
+def test_half_open_allows_single_probe_and_failed_probe_reopens():
+    """Test only one probe is let through and its failure reopens the circuit"""
+    from app.services.circuit_breaker import CircuitBreaker
+    
+    breaker = CircuitBreaker("groq", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    
+    assert breaker.allow_request() is True
+    assert breaker.allow_request() is False  # probe already in flight
+    
+    breaker.reset_timeout = 60
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.times_opened == 1
+
+
+# ============================================================================
+# Test: Deadline Mode
+# ============================================================================
+
+@pytest.mark.asyncio
+async def test_categorize_within_deadline_returns_ai_result(ai_service):
+    """Test a fast AI answer is returned directly"""
+    with patch.object(ai_service, '_call_groq_api', return_value=AI_OUTPUT):
+        result, pending = await ai_service.categorize_lead_within({"message": "Hi"}, deadline=1.0)
+    
+    assert result["method"] == "ai"
+    assert pending is None
+
+
+@pytest.mark.asyncio
+async def test_categorize_past_deadline_returns_fallback_and_keeps_running(ai_service):
+    """Test a slow AI call yields fallback now and the AI answer later"""
+    import asyncio
+    
+    async def slow_api(lead_input):
+        await asyncio.sleep(0.1)
+        return AI_OUTPUT
+    
+    with patch.object(ai_service, '_call_groq_api', side_effect=slow_api):
+        result, pending = await ai_service.categorize_lead_within({"message": "Need a quote"}, deadline=0.01)
+        
+        assert result["method"] == "fallback"
+        assert result["deadline_exceeded"] is True
+        assert result["output"]["priority"] == "high"
+        
+        late = await pending
+    
+    assert late["method"] == "ai"
+    assert late["output"] == AI_OUTPUT
+    assert ai_service.stats()["deadline_misses"] == 1
+
+
+# ============================================================================
+# Test: Bulk Re-categorization
+# ============================================================================
+
+@pytest.fixture
+def make_recategorization(make_checkpointed_run, ai_service):
+    """Recategorization service over a mocked queue and checkpoint store"""
+    from app.services.recategorization import RecategorizationService
+    
+    def make(slice_seconds=60):
+        return make_checkpointed_run(RecategorizationService, ai_service, checkpoint={
+            "options": {"page_size": 2, "batch_size": 2, "concurrency": 1, "rate_per_minute": 100000},
+            "cursor": None, "total": 2, "processed": 0, "written": 0, "fallback": 0,
+            "changed": {"any": 0, "priority": 0, "intent": 0, "lead_type": 0},
+            "priority_transitions": {}
+        }, slice_seconds=slice_seconds)
+    
+    return make
+
+
+STALE_PAGE = [
+    {"lead_id": "lead-a", "activity_id": "act-a", "metadata": {
+        "input": {"role": "Builder", "message": "Bulk"}, "prompt_version": "v1.0",
+        "output": {"priority": "medium", "intent": "quote_request", "lead_type": "builder"}
+    }},
+    {"lead_id": "lead-b", "activity_id": "act-b", "metadata": {
+        "input": {"role": "Home Owner", "message": "Browsing"}, "prompt_version": "N/A",
+        "output": {"priority": "low", "intent": "information", "lead_type": "homeowner"}
+    }}
+]
+
+
+@pytest.mark.asyncio
+async def test_recategorization_writes_results_and_diff_stats(make_recategorization, ai_service):
+    """Test a run replays stored inputs, bulk-writes ai_result rows and counts changes"""
+    service, queue, saved = make_recategorization()
+    new_outputs = [
+        {"priority": "high", "intent": "quote_request", "lead_type": "builder"},
+        {"priority": "low", "intent": "information", "lead_type": "homeowner"}
+    ]
+    ai_service.categorize_leads = AsyncMock(return_value=[
+        {"input": row["metadata"]["input"], "output": output, "method": "ai", "prompt_version": ai_service.BATCH_PROMPT_VERSION}
+        for row, output in zip(STALE_PAGE, new_outputs)
+    ])
+    
+    with patch("app.services.recategorization.execute_rpc", new=AsyncMock(side_effect=[STALE_PAGE, []])) as mock_rpc, \
+         patch("app.services.recategorization.insert_records", new=AsyncMock()) as mock_insert:
+        await service.run({"id": "job-1", "payload": {"run_id": "run-1"}})
+    
+    assert ai_service.categorize_leads.call_args.args[0] == [STALE_PAGE[0]["metadata"]["input"], STALE_PAGE[1]["metadata"]["input"]]
+    assert ai_service.categorize_leads.call_args.kwargs["allow_local"] is False
+    
+    rows = mock_insert.call_args.args[1]
+    assert [r["lead_id"] for r in rows] == ["lead-a", "lead-b"]
+    assert rows[0]["type"] == "ai_result"
+    assert rows[0]["metadata"]["replay_of"] == "act-a"
+    
+    assert mock_rpc.call_args_list[1].args[1]["after_lead"] == "lead-b"  # resumes after the page
+    status, checkpoint = saved[-1]
+    assert status == "completed"
+    assert checkpoint["processed"] == 2
+    assert checkpoint["written"] == 2
+    assert checkpoint["changed"] == {"any": 1, "priority": 1, "intent": 0, "lead_type": 0}
+    assert checkpoint["priority_transitions"] == {"medium->high": 1}
+    queue.enqueue.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_recategorization_results_are_not_stale_afterwards(make_recategorization, ai_service):
+    """Test results written by a run carry a version the stale query treats as current"""
+    service, queue, saved = make_recategorization()
+    ai_service.client.chat.completions.create = AsyncMock(return_value=make_groq_response(json.dumps({"results": [
+        {"index": 0, "priority": "high", "intent": "quote_request", "lead_type": "builder"},
+        {"index": 1, "priority": "low", "intent": "information", "lead_type": "homeowner"}
+    ]})))
+    
+    with patch("app.services.recategorization.execute_rpc", new=AsyncMock(side_effect=[STALE_PAGE, []])) as mock_rpc, \
+         patch("app.services.recategorization.insert_records", new=AsyncMock()) as mock_insert:
+        await service.run({"id": "job-1", "payload": {"run_id": "run-1"}})
+    
+    rows = mock_insert.call_args.args[1]
+    assert [r["metadata"]["prompt_version"] for r in rows] == [ai_service.BATCH_PROMPT_VERSION] * 2
+    current = mock_rpc.call_args_list[0].args[1]["current_prompt_versions"]
+    for row in rows:
+        assert row["metadata"]["prompt_version"] in current
+        assert row["metadata"]["model"] in mock_rpc.call_args_list[0].args[1]["current_models"]
+
+
+@pytest.mark.asyncio
+async def test_recategorization_keeps_old_result_on_fallback(make_recategorization, ai_service):
+    """Test fallback answers do not overwrite earlier AI results"""
+    service, queue, saved = make_recategorization()
+    ai_service.categorize_leads = AsyncMock(return_value=[
+        {"input": {}, "output": {"priority": "medium"}, "method": "fallback"},
+        {"input": {}, "output": {"priority": "medium"}, "method": "fallback"}
+    ])
+    
+    with patch("app.services.recategorization.execute_rpc", new=AsyncMock(side_effect=[STALE_PAGE, []])), \
+         patch("app.services.recategorization.insert_records", new=AsyncMock()) as mock_insert:
+        await service.run({"id": "job-1", "payload": {"run_id": "run-1"}})
+    
+    mock_insert.assert_not_called()
+    assert saved[-1][1]["fallback"] == 2
+
+
+@pytest.mark.asyncio
+async def test_recategorization_continues_in_new_job_after_slice(make_recategorization, ai_service):
+    """Test a run that uses up its time slice checkpoints and enqueues a continuation"""
+    service, queue, saved = make_recategorization(slice_seconds=0)
+    
+    with patch("app.services.recategorization.execute_rpc", new=AsyncMock()) as mock_rpc:
+        await service.run({"id": "job-1", "payload": {"run_id": "run-1"}})
+    
+    mock_rpc.assert_not_called()
+    queue.enqueue.assert_awaited_once_with("ai_recategorization", {"run_id": "run-1"})
+
+
+@pytest.mark.asyncio
+async def test_recategorization_start_creates_checkpoint_and_job(make_recategorization, ai_service):
+    """Test starting a run records its total and queues the first job"""
+    service, queue, saved = make_recategorization()
+    
+    with patch("app.services.recategorization.execute_rpc", new=AsyncMock(return_value=42)):
+        run = await service.start(batch_size=5)
+    
+    assert run["total"] == 42
+    assert run["job_id"] == "job-2"
+    status, checkpoint = saved[0]
+    assert status == "running"
+    assert checkpoint["options"]["batch_size"] == 5
+    assert checkpoint["prompt_version"] == ai_service.PROMPT_VERSION
+    assert queue.enqueue.call_args.args[1] == {"run_id": run["run_id"]}
+
+
+@pytest.mark.asyncio
+async def test_recategorization_progress_ignores_other_job_types(ai_service):
+    """Test another batch job's run_id is not reported (or run) as a re-categorization"""
+    from app.services.recategorization import RecategorizationService
+    
+    service = RecategorizationService(ai_service, Mock(lease_seconds=300))
+    campaign_row = {"run_id": "run-9", "job_type": "email_campaign", "status": "running", "checkpoint": {"total": 5}}
+    
+    with patch("app.services.job_queue.query_records", new=AsyncMock(return_value=[campaign_row])), \
+         patch("app.services.job_queue.execute_rpc", new=AsyncMock(return_value={**campaign_row, "acquired": True})) as mock_lock, \
+         patch("app.services.recategorization.execute_rpc", new=AsyncMock()) as mock_rpc:
+        assert await service.progress("run-9") is None
+        await service.run({"id": "job-1", "payload": {"run_id": "run-9"}})
+    
+    mock_lock.assert_awaited_once()  # no checkpoint save for another job type's run
+    mock_rpc.assert_not_called()
+
+
+# ============================================================================
+# Test: Model Routing
+# ============================================================================
+
+SMALL_MODEL = "llama-3.1-8b-instant"
+
+
+def make_routed_service(*contents):
+    """Routing-enabled service whose Groq client answers with contents in order"""
+    service = AIService(api_key="test_api_key_12345", small_model=SMALL_MODEL, routing_max_words=10)
+    service.client.chat.completions.create = AsyncMock(side_effect=[
+        make_groq_response(content, prompt_tokens=400, completion_tokens=50) for content in contents
+    ])
+    return service
+
+
+@pytest.mark.asyncio
+async def test_simple_lead_answered_by_small_model():
+    """Test a short lead goes to the small model and its confident answer is kept"""
+    service = make_routed_service(
+        '{"priority": "high", "intent": "quote_request", "lead_type": "builder", "confidence": 0.92}'
+    )
+    
+    result = await service.categorize_lead({"role": "Builder", "message": "Need quote urgently"})
+    
+    create = service.client.chat.completions.create
+    assert create.await_count == 1
+    assert create.call_args.kwargs["model"] == SMALL_MODEL
+    assert '"confidence"' in create.call_args.kwargs["messages"][0]["content"]
+    assert result["model"] == SMALL_MODEL
+    assert "confidence" not in result["output"]
+    assert result["routing"] == {
+        "route": "small", "reason": "simple", "small_model_confidence": 0.92, "escalated": False
+    }
+    
+    stats = service.stats()
+    assert stats["routing"]["small"] == 1
+    assert stats["models"][SMALL_MODEL]["calls"] == 1
+    assert stats["models"][SMALL_MODEL]["total_tokens"] == 450
+
+
+@pytest.mark.asyncio
+async def test_low_confidence_answer_escalates_to_large_model():
+    """Test an unsure small-model answer is redone by the 70B model"""
+    service = make_routed_service(
+        '{"priority": "low", "intent": "information", "lead_type": "homeowner", "confidence": 0.4}',
+        '{"priority": "high", "intent": "quote_request", "lead_type": "homeowner"}'
+    )
+    
+    result = await service.categorize_lead({"role": "Home Owner", "message": "Maybe tiles soon?"})
+    
+    models = [call.kwargs["model"] for call in service.client.chat.completions.create.call_args_list]
+    assert models == [SMALL_MODEL, service.MODEL_VERSION]
+    assert result["model"] == service.MODEL_VERSION
+    assert result["output"]["priority"] == "high"
+    assert result["routing"]["escalated"] is True
+    assert result["routing"]["escalation_reason"] == "low_confidence"
+    assert service.stats()["routing"]["escalation_rate"] == 1.0
+    assert set(service.stats()["models"]) == {SMALL_MODEL, service.MODEL_VERSION}
+
+
+@pytest.mark.asyncio
+async def test_invalid_small_model_answer_escalates():
+    """Test values outside the allowed sets escalate even when confident"""
+    service = make_routed_service(
+        '{"priority": "urgent", "intent": "quote_request", "lead_type": "builder", "confidence": 0.99}',
+        '{"priority": "high", "intent": "quote_request", "lead_type": "builder"}'
+    )
+    
+    result = await service.categorize_lead({"role": "Builder", "message": "Quote please"})
+    
+    assert result["routing"]["escalation_reason"] == "invalid_output"
+    assert result["output"]["priority"] == "high"
+
+
+@pytest.mark.asyncio
+async def test_small_model_error_escalates_without_retry_delay():
+    """Test a failing small-model call is answered by the large model in the same attempt"""
+    service = make_routed_service(
+        '{"priority": "high", "intent": "quote_request", "lead_type": "builder"}'
+    )
+    create = service.client.chat.completions.create
+    create.side_effect = [Exception("model overloaded"), *create.side_effect]
+    
+    result = await service.categorize_lead({"role": "Builder", "message": "Quote please"})
+    
+    assert result["attempt"] == 1
+    assert result["routing"]["escalation_reason"] == "small_model_error"
+    assert service.stats()["models"][SMALL_MODEL]["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_complex_lead_goes_straight_to_large_model():
+    """Test long messages skip the small model"""
+    service = make_routed_service(
+        '{"priority": "medium", "intent": "partnership", "lead_type": "contractor"}'
+    )
+    message = "We are a contractor firm looking for a long term supply partnership across several sites"
+    
+    result = await service.categorize_lead({"role": "Contractor", "message": message})
+    
+    create = service.client.chat.completions.create
+    assert create.await_count == 1
+    assert create.call_args.kwargs["model"] == service.MODEL_VERSION
+    assert '"confidence"' not in create.call_args.kwargs["messages"][0]["content"]
+    assert result["routing"] == {"route": "large", "reason": "long_message", "escalated": False}
+
+
+# ============================================================================
+# Test: LLM Output Repair
+# ============================================================================
+
+def test_parse_llm_json_repairs_common_damage():
+    """Test fences, surrounding prose, trailing commas and truncation are repaired"""
+    from app.services.json_repair import parse_llm_json
+    
+    assert parse_llm_json('{"priority": "high"}') == ({"priority": "high"}, False)
+    assert parse_llm_json('```json\n{"priority": "high",}\n```') == ({"priority": "high"}, True)
+    assert parse_llm_json('Sure! {"reasoning": "a {b}, c", "actions": ["call",],} Hope this helps') == (
+        {"reasoning": "a {b}, c", "actions": ["call"]}, True
+    )
+    assert parse_llm_json('{"priority": "high", "suggested_actions": ["call", "ema') == (
+        {"priority": "high", "suggested_actions": ["call", "ema"]}, True
+    )
+
+
+def test_parse_llm_json_rejects_unrepairable_content():
+    """Test content without a JSON object raises"""
+    from app.services.json_repair import parse_llm_json, JSONRepairError
+    
+    with pytest.raises(JSONRepairError):
+        parse_llm_json("I cannot categorize this lead.")
+
+
+@pytest.mark.asyncio
+async def test_malformed_response_is_repaired_without_retry(ai_service):
+    """Test a fenced response with a trailing comma costs no second Groq call"""
+    ai_service.client.chat.completions.create = AsyncMock(return_value=make_groq_response(
+        '```json\n{"priority": "High", "intent": "quote request", "lead_type": "home owner",}\n```'
+    ))
+    
+    result = await ai_service.categorize_lead({"role": "Home Owner", "message": "Price for tiles?"})
+    
+    assert ai_service.client.chat.completions.create.await_count == 1
+    assert result["method"] == "ai"
+    assert result["output"]["priority"] == "high"
+    assert result["output"]["intent"] == "quote_request"
+    assert result["output"]["lead_type"] == "homeowner"
+    stats = ai_service.stats()["llm_output"]
+    assert stats["repaired"] == 1
+    assert stats["normalized"] == 1
+    assert stats["retries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_unrepairable_response_is_retried(ai_service):
+    """Test only responses that cannot be repaired or validated trigger a retry"""
+    ai_service.client.chat.completions.create = AsyncMock(side_effect=[
+        make_groq_response("I am unable to help with that."),
+        make_groq_response('{"priority": "unknown", "intent": "information", "lead_type": "builder"}'),
+        make_groq_response('{"priority": "low", "intent": "information", "lead_type": "builder"}')
+    ])
+    
+    with patch("app.services.ai_service.asyncio.sleep", new=AsyncMock()):
+        result = await ai_service.categorize_lead({"role": "Builder", "message": "Hello"})
+    
+    assert result["method"] == "ai"
+    assert result["attempt"] == 3
+    stats = ai_service.stats()["llm_output"]
+    assert stats["unrepairable"] == 1
+    assert stats["invalid"] == 1
+    assert stats["valid"] == 2
+    assert stats["retries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_groq_json_validate_failure_is_repaired(ai_service):
+    """Test the generation Groq rejected in JSON mode is repaired instead of retried"""
+    import httpx
+    from groq import BadRequestError
+    
+    error = BadRequestError(
+        "Failed to generate JSON",
+        response=httpx.Response(400, request=httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")),
+        body={"error": {
+            "code": "json_validate_failed",
+            "failed_generation": '{"priority": "medium", "intent": "information", "lead_type": "architect",'
+        }}
+    )
+    ai_service.client.chat.completions.create = AsyncMock(side_effect=error)
+    
+    result = await ai_service.categorize_lead({"role": "Architect", "message": "Send catalogue"})
+    
+    assert ai_service.client.chat.completions.create.await_count == 1
+    assert result["method"] == "ai"
+    assert result["output"]["lead_type"] == "architect"
+    assert ai_service.breaker.consecutive_failures == 0
+    assert ai_service.stats()["llm_output"]["repaired"] == 1
+
+
+# ============================================================================
+# Test: Rate and Spend Governor
+# ============================================================================
+
+GOOD_RESPONSE = '{"priority": "high", "intent": "quote_request", "lead_type": "builder"}'
+
+
+def make_governed_service(governor):
+    """Service with a governor and a Groq client reporting 300 + 50 tokens per call"""
+    service = AIService(api_key="test_api_key_12345", governor=governor)
+    service.client.chat.completions.create = AsyncMock(
+        return_value=make_groq_response(GOOD_RESPONSE, prompt_tokens=300, completion_tokens=50)
+    )
+    return service
+
+
+@pytest.mark.asyncio
+async def test_governor_charges_reported_tokens():
+    """Test a call reserves an estimate and is then charged what Groq reported"""
+    from app.services.rate_governor import RateGovernor
+    
+    service = make_governed_service(RateGovernor(requests_per_minute=30, tokens_per_minute=12000))
+    
+    result = await service.categorize_lead({"role": "Builder", "message": "Quote please"})
+    
+    assert result["method"] == "ai"
+    budget = service.stats()["budget"]
+    assert budget["tokens_today"] == 350
+    assert budget["requests_today"] == 1
+    assert budget["granted"] == 1
+
+
+@pytest.mark.asyncio
+async def test_governor_queues_until_rate_allows():
+    """Test a call waits for the request bucket to refill instead of failing"""
+    import time
+    from app.services.rate_governor import RateGovernor
+    
+    governor = RateGovernor(requests_per_minute=600, tokens_per_minute=100000, max_wait=1.0)
+    governor.requests.level = 0  # Burst used up; refills one request per 0.1s
+    
+    started = time.perf_counter()
+    await governor.acquire(500)
+    
+    assert time.perf_counter() - started >= 0.09
+    assert governor.queued == 1
+    assert governor.granted == 1
+
+
+@pytest.mark.asyncio
+async def test_governor_sheds_to_fallback_when_queue_too_long():
+    """Test a call that would wait longer than max_wait goes to fallback without Groq"""
+    from app.services.rate_governor import RateGovernor
+    
+    governor = RateGovernor(requests_per_minute=60, tokens_per_minute=100000, max_wait=0.05)
+    governor.requests.level = 0  # Next request in ~1s
+    service = make_governed_service(governor)
+    
+    result = await service.categorize_lead({"role": "Builder", "message": "Need quote"})
+    
+    assert result["method"] == "fallback"
+    service.client.chat.completions.create.assert_not_called()
+    assert governor.shed["rate_limited"] == 1
+    assert service.breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_daily_budget_exhaustion_routes_to_fallback():
+    """Test leads go to fallback once the daily token budget is spent"""
+    from app.services.rate_governor import RateGovernor
+    
+    governor = RateGovernor(daily_token_budget=2000)
+    service = make_governed_service(governor)
+    governor.tokens_today = 1900
+    
+    result = await service.categorize_lead({"role": "Builder", "message": "Need quote"})
+    
+    assert result["method"] == "fallback"
+    service.client.chat.completions.create.assert_not_called()
+    assert governor.shed["daily_budget"] == 1
+    
+    governor.tokens_today = 2000
+    assert service.stats()["budget"]["budget_exhausted"] is True
+    assert service.stats()["budget"]["budget_used_pct"] == 100.0
+
+
+@pytest.mark.asyncio
+async def test_groq_rate_limit_pauses_governor(ai_service):
+    """Test a 429 from Groq pauses further calls for its retry-after"""
+    import httpx
+    from groq import RateLimitError
+    from app.services.rate_governor import RateGovernor
+    
+    ai_service.governor = RateGovernor()
+    ai_service.client.chat.completions.create = AsyncMock(side_effect=RateLimitError(
+        "Rate limit reached",
+        response=httpx.Response(
+            429,
+            headers={"retry-after": "7"},
+            request=httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+        ),
+        body=None
+    ))
+    
+    result = await ai_service.categorize_lead({"message": "Need quote"}, retry_count=1)
+    
+    assert result["method"] == "fallback"
+    assert 6 < ai_service.governor.stats()["paused_for_seconds"] <= 7
+
+
+# ============================================================================
+# Test: Shadow Evaluation
+# ============================================================================
+
+PRIMARY_RESULT = {
+    "input": {"role": "Builder", "location": "Pune", "products": ["Tiles"], "message": "Need quote"},
+    "output": {"priority": "high", "intent": "quote_request", "lead_type": "builder"},
+    "model": AIService.MODEL_VERSION,
+    "prompt_version": AIService.PROMPT_VERSION,
+    "method": "ai"
+}
+
+
+def make_shadow(ai_service, content, delay=0.0, **kwargs):
+    """Shadow evaluator whose candidate client answers content after delay"""
+    import asyncio
+    from app.services.shadow_evaluation import ShadowEvaluator
+    
+    evaluator = ShadowEvaluator(ai_service, candidate_model="candidate-model", api_key="x", sample_rate=1.0, **kwargs)
+    
+    async def create(**call):
+        await asyncio.sleep(delay)
+        return make_groq_response(content)
+    
+    evaluator.client.chat.completions.create = AsyncMock(side_effect=create)
+    return evaluator
+
+
+@pytest.mark.asyncio
+async def test_shadow_submit_does_not_wait_for_candidate(ai_service):
+    """Test submit returns at once and the candidate answer is stored later as ai_shadow"""
+    import time
+    
+    evaluator = make_shadow(
+        ai_service,
+        '{"priority": "medium", "intent": "quote_request", "lead_type": "builder"}',
+        delay=0.2
+    )
+    
+    with patch("app.services.shadow_evaluation.insert_record", new=AsyncMock()) as mock_insert:
+        started = time.perf_counter()
+        assert evaluator.submit("lead-1", PRIMARY_RESULT) is True
+        assert time.perf_counter() - started < 0.05
+        mock_insert.assert_not_called()
+        
+        await evaluator.close()
+    
+    activity = mock_insert.call_args.args[1]
+    assert activity["type"] == "ai_shadow"
+    assert activity["lead_id"] == "lead-1"
+    metadata = activity["metadata"]
+    assert metadata["model"] == "candidate-model"
+    assert metadata["primary"]["model"] == AIService.MODEL_VERSION
+    assert metadata["agreement"] == {"priority": False, "intent": True, "lead_type": True, "all": False}
+    assert metadata["latency_ms"] >= 200
+    assert evaluator.stats()["completed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_shadow_skips_fallback_and_unsampled_leads(ai_service):
+    """Test only sampled LLM answers are shadowed"""
+    evaluator = make_shadow(ai_service, "{}")
+    
+    assert evaluator.submit("lead-1", {**PRIMARY_RESULT, "method": "fallback"}) is False
+    evaluator.sample_rate = 0.0
+    assert evaluator.submit("lead-1", PRIMARY_RESULT) is False
+    evaluator.client.chat.completions.create.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_shadow_never_queues_for_rate_budget(ai_service):
+    """Test a shadow run is dropped when the governor has no spare room"""
+    from app.services.rate_governor import RateGovernor
+    
+    ai_service.governor = RateGovernor(requests_per_minute=60)
+    ai_service.governor.requests.level = 0
+    evaluator = make_shadow(ai_service, "{}")
+    
+    with patch("app.services.shadow_evaluation.insert_record", new=AsyncMock()) as mock_insert:
+        evaluator.submit("lead-1", PRIMARY_RESULT)
+        await evaluator.close()
+    
+    evaluator.client.chat.completions.create.assert_not_called()
+    mock_insert.assert_not_called()
+    assert evaluator.stats()["dropped"] == 1
+    assert ai_service.governor.queued == 0
+
+
+@pytest.mark.asyncio
+async def test_shadow_report_agreement_and_latency():
+    """Test the report aggregates agreement rates and latency percentiles"""
+    from app.services.shadow_evaluation import shadow_report
+    
+    def run(priority, latency_ms):
+        agrees = priority == "high"
+        return {"metadata": {
+            "model": "candidate-model",
+            "output": {"priority": priority, "intent": "quote_request", "lead_type": "builder"},
+            "primary": {"output": PRIMARY_RESULT["output"]},
+            "agreement": {"priority": agrees, "intent": True, "lead_type": True, "all": agrees},
+            "latency_ms": latency_ms
+        }}
+    
+    activities = [run("high", 100), run("high", 200), run("medium", 300), run("high", 400)]
+    activities.append({"metadata": {"model": "candidate-model", "agreement": None, "error": "timeout", "latency_ms": 900}})
+    activities.append({"metadata": {"model": "other-model", "agreement": None, "latency_ms": 5}})
+    
+    with patch("app.services.shadow_evaluation.query_records", new=AsyncMock(return_value=activities)):
+        report = await shadow_report(model="candidate-model")
+    
+    assert report["samples"] == 5
+    assert report["answered"] == 4
+    assert report["errors"] == 1
+    assert report["agreement_rate"]["priority"] == 0.75
+    assert report["agreement_rate"]["intent"] == 1.0
+    assert report["priority_changes"] == {"high->medium": 1}
+    assert report["latency_ms"]["p50"] == 300
+    assert report["latency_ms"]["max"] == 900
+
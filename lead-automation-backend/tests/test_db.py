@@ -0,0 +1,143 @@
+import pytest
+import time
+import asyncio
+from unittest.mock import MagicMock, patch
+from app.utils import db
+
+
+def slow_query(data, delay=0.2):
+    """Build a mock query builder whose execute() blocks like a real round trip"""
+    def execute():
+        time.sleep(delay)
+        return MagicMock(data=data)
+    
+    query = MagicMock()
+    query.execute.side_effect = execute
+    # Chained builder calls (.select().eq().order()...) return the same query
+    for method in ("select", "eq", "order", "limit", "insert", "update", "delete"):
+        getattr(query, method).return_value = query
+    return query
+
+
+# ============================================================================
+# Test: Non-blocking Query Execution
+# ============================================================================
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_overlap_io():
+    """Test concurrent helpers overlap their round trips instead of serializing"""
+    mock_client = MagicMock()
+    mock_client.table.return_value = slow_query([{"id": "1"}])
+    
+    with patch.object(db, "supabase", mock_client):
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            db.query_records("leads", filters={"status": "new"}) for _ in range(5)
+        ])
+        elapsed = time.perf_counter() - start
+    
+    assert all(r == [{"id": "1"}] for r in results)
+    # 5 x 200ms sequentially would be >= 1s
+    assert elapsed < 0.6, f"Queries did not overlap ({elapsed:.2f}s)"
+
+
+@pytest.mark.asyncio
+async def test_event_loop_not_blocked_during_query():
+    """Test the event loop keeps serving other tasks during a slow query"""
+    mock_client = MagicMock()
+    mock_client.rpc.return_value = slow_query({"total_leads": 3}, delay=0.3)
+    ticks = 0
+    
+    async def ticker():
+        nonlocal ticks
+        for _ in range(10):
+            await asyncio.sleep(0.02)
+            ticks += 1
+    
+    with patch.object(db, "supabase", mock_client):
+        stats, _ = await asyncio.gather(db.get_dashboard_stats(), ticker())
+    
+    assert stats == {"total_leads": 3}
+    assert ticks == 10
+
+
+@pytest.mark.asyncio
+async def test_insert_record_returns_first_row():
+    """Test insert_record keeps its single-row return contract"""
+    mock_client = MagicMock()
+    mock_client.table.return_value = slow_query([{"id": "abc", "name": "Test"}], delay=0)
+    
+    with patch.object(db, "supabase", mock_client):
+        record = await db.insert_record("leads", {"name": "Test"})
+    
+    assert record == {"id": "abc", "name": "Test"}
+
+
+@pytest.mark.asyncio
+async def test_query_failure_returns_empty_list():
+    """Test query_records still swallows errors and returns an empty list"""
+    query = slow_query([], delay=0)
+    query.execute.side_effect = Exception("connection reset")
+    mock_client = MagicMock()
+    mock_client.table.return_value = query
+    
+    with patch.object(db, "supabase", mock_client):
+        records = await db.query_records("leads")
+    
+    assert records == []
+
+
+# ============================================================================
+# Test: Bulk Insert
+# ============================================================================
+
+@pytest.mark.asyncio
+async def test_insert_records_chunks_and_preserves_order():
+    """Test insert_records splits large batches and returns rows in order"""
+    mock_client = MagicMock()
+    
+    def table(name):
+        query = MagicMock()
+        
+        def insert(rows):
+            query.execute.return_value = MagicMock(
+                data=[{"id": row["n"], **row} for row in rows]
+            )
+            return query
+        
+        query.insert.side_effect = insert
+        return query
+    
+    mock_client.table.side_effect = table
+    rows = [{"n": i} for i in range(7)]
+    
+    with patch.object(db, "supabase", mock_client):
+        inserted = await db.insert_records("lead_activity", rows, chunk_size=3)
+    
+    assert [r["id"] for r in inserted] == list(range(7))
+    assert mock_client.table.call_count == 3  # 3 + 3 + 1
+
+
+@pytest.mark.asyncio
+async def test_insert_records_empty_batch_skips_round_trip():
+    """Test an empty batch makes no request"""
+    mock_client = MagicMock()
+    
+    with patch.object(db, "supabase", mock_client):
+        inserted = await db.insert_records("lead_activity", [])
+    
+    assert inserted == []
+    mock_client.table.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_insert_records_failure_raises():
+    """Test a failed chunk raises like insert_record"""
+    query = slow_query([], delay=0)
+    query.execute.side_effect = Exception("payload too large")
+    mock_client = MagicMock()
+    mock_client.table.return_value = query
+    
+    with patch.object(db, "supabase", mock_client):
+        with pytest.raises(Exception, match="payload too large"):
+            await db.insert_records("lead_products", [{"product": "A"}])
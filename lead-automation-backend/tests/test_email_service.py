@@ -3,6 +3,7 @@ from app.services.email_service import EmailService
 from app.services.email_templates import EmailTemplates
 from unittest.mock import Mock, patch, AsyncMock
 import resend
+import json
 
 @pytest.fixture
 def email_service():
@@ -17,7 +18,7 @@ def email_service():
 @pytest.mark.asyncio
 async def test_send_acknowledgement_email_success(email_service):
     """Test sending acknowledgement email successfully"""
-    with patch.object(resend.Emails, 'send') as mock_send:
+    with patch.object(email_service.transport, 'send', new_callable=AsyncMock) as mock_send:
         mock_send.return_value = {'id': 'test_email_id_123'}
         
         result = await email_service.send_acknowledgement(
@@ -43,7 +44,7 @@ async def test_send_acknowledgement_email_success(email_service):
 @pytest.mark.asyncio
 async def test_send_acknowledgement_email_with_multiple_products(email_service):
     """Test acknowledgement email with multiple products"""
-    with patch.object(resend.Emails, 'send') as mock_send:
+    with patch.object(email_service.transport, 'send', new_callable=AsyncMock) as mock_send:
         mock_send.return_value = {'id': 'email_123'}
         
         products = ["Product 1", "Product 2", "Product 3", "Product 4"]
@@ -66,7 +67,7 @@ async def test_send_acknowledgement_email_with_multiple_products(email_service):
 @pytest.mark.asyncio
 async def test_send_acknowledgement_email_api_failure(email_service):
     """Test acknowledgement email handles API failures gracefully"""
-    with patch.object(resend.Emails, 'send') as mock_send:
+    with patch.object(email_service.transport, 'send', new_callable=AsyncMock) as mock_send:
         mock_send.side_effect = Exception("Resend API Error")
         
         result = await email_service.send_acknowledgement(
@@ -88,7 +89,7 @@ async def test_send_acknowledgement_email_api_failure(email_service):
 @pytest.mark.asyncio
 async def test_send_template_email_success(email_service):
     """Test template-based email sending"""
-    with patch.object(resend.Emails, 'send') as mock_send:
+    with patch.object(email_service.transport, 'send', new_callable=AsyncMock) as mock_send:
         mock_send.return_value = {'id': 'template_email_id'}
         
         result = await email_service.send_template_email(
@@ -102,10 +103,27 @@ async def test_send_template_email_success(email_service):
         assert result["resend_id"] == "template_email_id"
 
 
+@pytest.mark.asyncio
+async def test_send_template_email_passes_idempotency_key(email_service):
+    """Test the idempotency key reaches Resend and is not a template argument"""
+    with patch.object(email_service.transport, 'send', new_callable=AsyncMock) as mock_send:
+        mock_send.return_value = {'id': 'template_email_id'}
+        
+        result = await email_service.send_template_email(
+            to_email="test@example.com",
+            template_name="nurture_day_0",
+            idempotency_key="lead-1-nurture_day_0",
+            name="Jane Doe"
+        )
+        
+        assert result["success"] is True
+        assert mock_send.call_args.kwargs["idempotency_key"] == "lead-1-nurture_day_0"
+
+
 @pytest.mark.asyncio
 async def test_send_template_email_high_priority(email_service):
     """Test sending high-priority template email"""
-    with patch.object(resend.Emails, 'send') as mock_send:
+    with patch.object(email_service.transport, 'send', new_callable=AsyncMock) as mock_send:
         mock_send.return_value = {'id': 'priority_email_id'}
         
         result = await email_service.send_template_email(
@@ -126,7 +144,7 @@ async def test_send_template_email_high_priority(email_service):
 @pytest.mark.asyncio
 async def test_send_template_email_nurture_day_3(email_service):
     """Test sending nurture day 3 email with special offer"""
-    with patch.object(resend.Emails, 'send') as mock_send:
+    with patch.object(email_service.transport, 'send', new_callable=AsyncMock) as mock_send:
         mock_send.return_value = {'id': 'nurture_email_id'}
         
         result = await email_service.send_template_email(
@@ -160,7 +178,7 @@ async def test_send_template_email_invalid_template(email_service):
 @pytest.mark.asyncio
 async def test_send_template_email_missing_parameters(email_service):
     """Test template email with missing required parameters"""
-    with patch.object(resend.Emails, 'send') as mock_send:
+    with patch.object(email_service.transport, 'send', new_callable=AsyncMock) as mock_send:
         mock_send.side_effect = Exception("Missing parameter")
         
         result = await email_service.send_template_email(
@@ -179,7 +197,7 @@ async def test_send_template_email_missing_parameters(email_service):
 @pytest.mark.asyncio
 async def test_send_custom_email_success(email_service):
     """Test sending custom email"""
-    with patch.object(resend.Emails, 'send') as mock_send:
+    with patch.object(email_service.transport, 'send', new_callable=AsyncMock) as mock_send:
         mock_send.return_value = {'id': 'custom_email_id'}
         
         result = await email_service.send_custom_email(
@@ -196,7 +214,7 @@ async def test_send_custom_email_success(email_service):
 @pytest.mark.asyncio
 async def test_send_custom_email_failure(email_service):
     """Test custom email handles failures"""
-    with patch.object(resend.Emails, 'send') as mock_send:
+    with patch.object(email_service.transport, 'send', new_callable=AsyncMock) as mock_send:
         mock_send.side_effect = Exception("Send failed")
         
         result = await email_service.send_custom_email(
@@ -352,6 +370,47 @@ def test_email_template_special_characters():
     assert "html" in template
 
 
+def test_email_template_escapes_dynamic_fields():
+    """Test names and products are HTML-escaped in the body"""
+    template = EmailTemplates.acknowledgement(
+        name="Test & User <script>",
+        products=["<b>Tiles</b>"]
+    )
+    
+    html = template["html"]
+    assert "Test &amp; User &lt;script&gt;" in html
+    assert "&lt;b&gt;Tiles&lt;/b&gt;" in html
+    assert "<script>" not in html
+    # Static layout is unchanged
+    assert ".product-list li { margin: 8px 0; }" in html
+    
+    reminder = EmailTemplates.follow_up_reminder(
+        name="A", action="Call <now>", scheduled_date="2024-12-27"
+    )
+    assert "Call &lt;now&gt;" in reminder["html"]
+    assert "$" not in reminder["html"]
+
+
+def test_email_template_render_cache():
+    """Test repeated renders are served from the cache"""
+    EmailTemplates.cache_clear()
+    
+    first = EmailTemplates.acknowledgement("Cache User", ["Tiles", "Marble"])
+    second = EmailTemplates.acknowledgement(name="Cache User", products=["Tiles", "Marble"])
+    other = EmailTemplates.acknowledgement("Cache User", ["Tiles"])
+    
+    assert first == second
+    assert other != first
+    info = EmailTemplates.cache_info()
+    assert info["hits"] == 1
+    assert info["misses"] == 2
+    assert info["size"] == 2
+    
+    # Callers get their own copy
+    first["html"] = "changed"
+    assert EmailTemplates.acknowledgement("Cache User", ["Tiles", "Marble"])["html"] != "changed"
+
+
 # ============================================================================
 # Test: Email Service Configuration
 # ============================================================================
@@ -374,7 +433,7 @@ def test_email_service_from_email_used():
         from_email="custom@example.com"
     )
     
-    with patch.object(resend.Emails, 'send') as mock_send:
+    with patch.object(service.transport, 'send', new_callable=AsyncMock) as mock_send:
         mock_send.return_value = {'id': 'test_id'}
         
         # Use asyncio.run for async test in sync function
@@ -387,3 +446,449 @@ def test_email_service_from_email_used():
         
         call_args = mock_send.call_args[0][0]
         assert call_args["from"] == "custom@example.com"
+
+
+# ============================================================================
+# Test: Async Resend Transport
+# ============================================================================
+
+def mock_transport(handler, max_concurrency=10):
+    """ResendTransport whose pool answers with handler"""
+    import httpx
+    from app.services.email_transport import ResendTransport
+    
+    transport = ResendTransport(api_key="test_key", max_concurrency=max_concurrency)
+    transport.http_client = httpx.AsyncClient(
+        base_url=transport.api_url,
+        headers=transport.http_client.headers,
+        transport=httpx.MockTransport(handler)
+    )
+    return transport
+
+
+@pytest.mark.asyncio
+async def test_transport_posts_email_with_api_key():
+    """Test an email is POSTed to /emails with the API key and the id returned"""
+    import httpx
+    import json
+    
+    requests = []
+    
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"id": "email_abc"})
+    
+    transport = mock_transport(handler)
+    result = await transport.send({"from": "a@example.com", "to": "b@example.com", "subject": "Hi", "html": "<p>Hi</p>"})
+    
+    assert result == {"id": "email_abc"}
+    assert requests[0].url.path == "/emails"
+    assert requests[0].headers["Authorization"] == "Bearer test_key"
+    assert json.loads(requests[0].content)["to"] == "b@example.com"
+    assert transport.stats()["sent"] == 1
+
+
+@pytest.mark.asyncio
+async def test_transport_error_response_raises_resend_error():
+    """Test Resend error responses raise the SDK's exception types"""
+    import httpx
+    from resend.exceptions import ResendError
+    
+    transport = mock_transport(lambda request: httpx.Response(
+        422, json={"statusCode": 422, "name": "validation_error", "message": "Invalid `to` field"}
+    ))
+    
+    with pytest.raises(ResendError, match="Invalid `to` field"):
+        await transport.send({"to": "not-an-email"})
+    assert transport.stats()["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_transport_non_json_error_is_transient():
+    """Test an HTML gateway error still raises ResendError, counted as a retryable failure"""
+    import httpx
+    from resend.exceptions import ResendError
+    from app.services.email_transport import is_permanent_error
+    
+    transport = mock_transport(lambda request: httpx.Response(
+        502, text="<html><body>Bad Gateway</body></html>", headers={"Content-Type": "text/html"}
+    ))
+    
+    with pytest.raises(ResendError) as raised:
+        await transport.send({"to": "b@example.com"})
+    assert str(raised.value.code) == "502"
+    assert not is_permanent_error(raised.value)
+    assert transport.stats()["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_transport_accepts_any_2xx():
+    """Test a 2xx other than 200 counts as sent"""
+    import httpx
+    
+    transport = mock_transport(lambda request: httpx.Response(202, json={"id": "email_abc"}))
+    
+    assert await transport.send({"to": "b@example.com"}) == {"id": "email_abc"}
+    assert transport.stats()["sent"] == 1
+
+
+@pytest.mark.asyncio
+async def test_sends_overlap_up_to_max_concurrency():
+    """Test concurrent sends run in parallel on the pool, bounded by max_concurrency"""
+    import asyncio
+    import httpx
+    import time
+    
+    active = 0
+    peak = 0
+    
+    async def handler(request):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.1)
+        active -= 1
+        return httpx.Response(200, json={"id": "email_1"})
+    
+    service = EmailService(api_key="test_key", from_email="sender@example.com", max_concurrency=4)
+    service.transport = mock_transport(handler, max_concurrency=4)
+    
+    started = time.perf_counter()
+    results = await asyncio.gather(*[
+        service.send_custom_email(f"user{i}@example.com", "Hello", "<p>Hi</p>") for i in range(8)
+    ])
+    elapsed = time.perf_counter() - started
+    
+    assert all(result["success"] for result in results)
+    assert peak == 4
+    assert elapsed < 0.4  # two waves of 0.1s, not eight sequential sends
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_transport_sends_idempotency_key():
+    """Test the idempotency key goes out as Resend's Idempotency-Key header"""
+    import httpx
+    
+    requests = []
+    
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"id": "email_abc"})
+    
+    transport = mock_transport(handler)
+    await transport.send({"to": "b@example.com"}, idempotency_key="activity-1")
+    await transport.send({"to": "b@example.com"})
+    
+    assert requests[0].headers["Idempotency-Key"] == "activity-1"
+    assert "Idempotency-Key" not in requests[1].headers
+
+
+@pytest.mark.asyncio
+async def test_transport_sends_batch():
+    """Test a batch is POSTed to /emails/batch and returns one id per email"""
+    import httpx
+    import json
+    
+    requests = []
+    
+    def handler(request):
+        requests.append(request)
+        emails = json.loads(request.content)
+        return httpx.Response(200, json={"data": [{"id": f"email_{i}"} for i in range(len(emails))]})
+    
+    transport = mock_transport(handler)
+    results = await transport.send_batch([{"to": "a@example.com"}, {"to": "b@example.com"}], idempotency_key="chunk-1")
+    
+    assert results == [{"id": "email_0"}, {"id": "email_1"}]
+    assert requests[0].url.path == "/emails/batch"
+    assert requests[0].headers["Idempotency-Key"] == "chunk-1"
+    assert transport.stats()["sent"] == 2
+    
+    with pytest.raises(ValueError):
+        await transport.send_batch([{"to": "a@example.com"}] * 101)
+
+
+# ============================================================================
+# Test: Email Outbox
+# ============================================================================
+
+def outbox_job(attempts=1, max_attempts=5, template_name="acknowledgement"):
+    """send_email job as claimed from the queue"""
+    from app.services.email_outbox import EmailOutbox
+    
+    queued = EmailOutbox.queue_email(
+        to_email="customer@example.com",
+        template_name=template_name,
+        template_kwargs={"name": "Asha", "products": ["Marble"]}
+    )
+    return {"id": "job-1", **queued["job"], "attempts": attempts, "max_attempts": max_attempts}
+
+
+@pytest.mark.asyncio
+async def test_outbox_dispatch_sends_and_records_delivery(email_service):
+    """Test a sent outbox email completes its activity and sets the first response time"""
+    from app.services.email_outbox import EmailOutbox
+    
+    job = outbox_job()
+    outbox = EmailOutbox(email_service)
+    
+    with patch.object(email_service.transport, 'send', new_callable=AsyncMock, return_value={"id": "email_1"}) as mock_send, \
+         patch("app.services.email_outbox.record_email_delivery", new=AsyncMock()) as mock_record:
+        await outbox.dispatch(job)
+    
+    params = mock_send.call_args.args[0]
+    assert params["to"] == "customer@example.com"
+    assert "Asha" in params["subject"] or "Asha" in params["html"]
+    assert mock_send.call_args.kwargs["idempotency_key"] == job["payload"]["activity_id"]
+    
+    assert mock_record.call_args.args[0] == job["payload"]["activity_id"]
+    kwargs = mock_record.call_args.kwargs
+    assert kwargs["status"] == "completed"
+    assert kwargs["metadata"]["resend_id"] == "email_1"
+    assert kwargs["first_response_at"] == kwargs["metadata"]["sent_at"]
+
+
+@pytest.mark.asyncio
+async def test_outbox_transient_failure_is_retried(email_service):
+    """Test network errors re-raise for backoff and only the last attempt fails the activity"""
+    import httpx
+    from app.services.email_outbox import EmailOutbox
+    
+    outbox = EmailOutbox(email_service)
+    
+    with patch.object(email_service.transport, 'send', new_callable=AsyncMock, side_effect=httpx.ConnectTimeout("timed out")), \
+         patch("app.services.email_outbox.record_email_delivery", new=AsyncMock()) as mock_record:
+        with pytest.raises(httpx.ConnectTimeout):
+            await outbox.dispatch(outbox_job(attempts=1))
+        mock_record.assert_not_called()
+        
+        with pytest.raises(httpx.ConnectTimeout):
+            await outbox.dispatch(outbox_job(attempts=5))
+    
+    assert mock_record.call_args.kwargs["status"] == "failed"
+    assert mock_record.call_args.kwargs["metadata"]["attempts"] == 5
+
+
+@pytest.mark.asyncio
+async def test_outbox_rejected_email_is_not_retried(email_service):
+    """Test a Resend validation error fails the activity at once without raising"""
+    from resend.exceptions import ResendError
+    from app.services.email_outbox import EmailOutbox
+    
+    outbox = EmailOutbox(email_service)
+    rejected = ResendError(code="422", error_type="validation_error", message="Invalid `to` field")
+    
+    with patch.object(email_service.transport, 'send', new_callable=AsyncMock, side_effect=rejected), \
+         patch("app.services.email_outbox.record_email_delivery", new=AsyncMock()) as mock_record:
+        await outbox.dispatch(outbox_job(attempts=1))
+    
+    assert mock_record.call_args.kwargs["status"] == "failed"
+    assert mock_record.call_args.kwargs["metadata"]["error"] == "Invalid `to` field"
+
+
+@pytest.mark.asyncio
+async def test_outbox_cancels_scheduled_email_of_closed_lead(email_service):
+    """Test a delayed outbox email is cancelled when the lead was converted meanwhile"""
+    from datetime import datetime
+    from app.services.email_outbox import EmailOutbox
+    
+    queued = EmailOutbox.queue_email("customer@example.com", "nurture_day_0", {"name": "Asha"}, run_at=datetime.utcnow())
+    job = {"id": "job-1", "lead_id": "lead-1", **queued["job"], "attempts": 1, "max_attempts": 5}
+    
+    with patch.object(email_service.transport, 'send', new_callable=AsyncMock) as mock_send, \
+         patch("app.services.email_outbox.get_record", new=AsyncMock(return_value={"id": "lead-1", "status": "lost"})), \
+         patch("app.services.email_outbox.record_email_delivery", new=AsyncMock()) as mock_record:
+        await EmailOutbox(email_service).dispatch(job)
+    
+    mock_send.assert_not_called()
+    assert queued["activity"]["status"] == "scheduled"
+    assert mock_record.call_args.kwargs["status"] == "cancelled"
+
+
+
+# ============================================================================
+# Test: Bulk Email Campaigns
+# ============================================================================
+
+CAMPAIGN_CHECKPOINT = {
+    "template": "nurture_day_3",
+    "template_kwargs": {},
+    "selection": {"statuses": ["nurturing"], "priorities": ["high"]},
+    "options": {"page_size": 3, "chunk_size": 2, "concurrency": 2, "rate_per_minute": 1000000},
+    "cursor": None, "total": 3, "processed": 0, "sent": 0, "failed": 0, "batches": 0
+}
+
+
+@pytest.fixture
+def make_campaign(make_checkpointed_run, email_service):
+    """Campaign service over a mocked queue and checkpoint store"""
+    from app.services.email_campaign import EmailCampaignService
+    
+    def make(slice_seconds=60):
+        return make_checkpointed_run(
+            EmailCampaignService, email_service,
+            checkpoint=json.loads(json.dumps(CAMPAIGN_CHECKPOINT)),
+            slice_seconds=slice_seconds
+        )
+    
+    return make
+
+
+CAMPAIGN_PAGE = [
+    {"lead_id": "lead-a", "name": "Asha", "email": "asha@example.com", "status": "nurturing", "priority": "high", "products": ["Marble"]},
+    {"lead_id": "lead-b", "name": "Ravi", "email": "ravi@example.com", "status": "nurturing", "priority": "high", "products": []},
+    {"lead_id": "lead-c", "name": "Meera", "email": "meera@example.com", "status": "nurturing", "priority": "high", "products": ["Tiles"]}
+]
+
+
+@pytest.mark.asyncio
+async def test_campaign_sends_batches_and_bulk_inserts_activities(make_campaign, email_service):
+    """Test a page is sent in batch chunks and each chunk's activities written with one insert"""
+    service, queue, saved = make_campaign()
+    
+    async def send_batch(emails, idempotency_key=None):
+        return [{"id": f"id-{email['to']}"} for email in emails]
+    
+    with patch.object(email_service.transport, 'send_batch', new_callable=AsyncMock, side_effect=send_batch) as mock_batch, \
+         patch("app.services.email_campaign.execute_rpc", new=AsyncMock(side_effect=[CAMPAIGN_PAGE, []])) as mock_rpc, \
+         patch("app.services.email_campaign.insert_records", new=AsyncMock()) as mock_insert:
+        await service.run({"id": "job-1", "payload": {"run_id": "run-1"}})
+    
+    batches = [call.args[0] for call in mock_batch.call_args_list]
+    assert [len(batch) for batch in batches] == [2, 1]
+    assert batches[0][0]["to"] == "asha@example.com"
+    assert "Asha" in batches[0][0]["html"]
+    assert "WELCOME10" in batches[0][0]["html"]
+    assert [call.kwargs["idempotency_key"] for call in mock_batch.call_args_list] == [
+        "campaign-run-1-lead-a", "campaign-run-1-lead-c"
+    ]
+    
+    # One bulk insert per chunk, right after it is sent
+    assert [[row["lead_id"] for row in call.args[1]] for call in mock_insert.call_args_list] == [
+        ["lead-a", "lead-b"], ["lead-c"]
+    ]
+    rows = mock_insert.call_args_list[0].args[1]
+    assert rows[0]["metadata"]["resend_id"] == "id-asha@example.com"
+    assert rows[0]["metadata"]["campaign_run_id"] == "run-1"
+    
+    assert mock_rpc.call_args_list[0].args[1]["priorities"] == ["high"]
+    assert mock_rpc.call_args_list[0].args[1]["exclude_run"] == "run-1"  # skips leads this run emailed
+    assert mock_rpc.call_args_list[1].args[1]["after_lead"] == "lead-c"  # resumes after the page
+    status, checkpoint = saved[-1]
+    assert status == "completed"
+    assert checkpoint["sent"] == 3
+    assert checkpoint["batches"] == 2
+    queue.enqueue.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_campaign_rejected_batch_fails_its_recipients(make_campaign, email_service):
+    """Test a batch Resend rejects is recorded as failed without stopping the run"""
+    from resend.exceptions import ResendError
+    
+    service, queue, saved = make_campaign()
+    rejected = ResendError(code="422", error_type="validation_error", message="Invalid `to` field")
+    
+    with patch.object(email_service.transport, 'send_batch', new_callable=AsyncMock, side_effect=[rejected, [{"id": "id-c"}]]), \
+         patch("app.services.email_campaign.execute_rpc", new=AsyncMock(side_effect=[CAMPAIGN_PAGE, []])), \
+         patch("app.services.email_campaign.insert_records", new=AsyncMock()) as mock_insert:
+        await service.run({"id": "job-1", "payload": {"run_id": "run-1"}})
+    
+    rows = [row for call in mock_insert.call_args_list for row in call.args[1]]
+    assert [row["status"] for row in rows] == ["failed", "failed", "completed"]
+    assert rows[0]["metadata"]["error"] == "Invalid `to` field"
+    assert saved[-1][1]["failed"] == 2
+    assert saved[-1][1]["sent"] == 1
+
+
+@pytest.mark.asyncio
+async def test_campaign_transient_error_keeps_checkpoint(make_campaign, email_service):
+    """Test a network error raises (job retried) and releases the run without advancing it"""
+    import httpx
+    
+    service, queue, saved = make_campaign()
+    
+    with patch.object(email_service.transport, 'send_batch', new_callable=AsyncMock, side_effect=httpx.ConnectError("down")), \
+         patch("app.services.email_campaign.execute_rpc", new=AsyncMock(return_value=CAMPAIGN_PAGE)), \
+         patch("app.services.email_campaign.insert_records", new=AsyncMock()) as mock_insert:
+        with pytest.raises(httpx.ConnectError):
+            await service.run({"id": "job-1", "attempts": 1, "max_attempts": 5, "payload": {"run_id": "run-1"}})
+    
+    mock_insert.assert_not_called()
+    status, checkpoint = saved[-1]
+    assert status == "running"
+    assert checkpoint["cursor"] is None
+    assert checkpoint["processed"] == 0
+
+
+@pytest.mark.asyncio
+async def test_campaign_marked_failed_when_job_dead_letters(make_campaign, email_service):
+    """Test the last failed attempt marks the run failed instead of leaving it running"""
+    import httpx
+    
+    service, queue, saved = make_campaign()
+    
+    with patch.object(email_service.transport, 'send_batch', new_callable=AsyncMock, side_effect=httpx.ConnectError("down")), \
+         patch("app.services.email_campaign.execute_rpc", new=AsyncMock(return_value=CAMPAIGN_PAGE)):
+        with pytest.raises(httpx.ConnectError):
+            await service.run({"id": "job-1", "attempts": 5, "max_attempts": 5, "payload": {"run_id": "run-1"}})
+    
+    status, checkpoint = saved[-1]
+    assert status == "failed"
+    assert checkpoint["error"] == "down"
+
+
+@pytest.mark.asyncio
+async def test_campaign_held_by_another_job_is_retried(make_campaign, email_service):
+    """Test a job whose run is locked by another job raises (retried) without sending"""
+    service, queue, saved = make_campaign()
+    service._lock.return_value = {**service._lock.return_value, "acquired": False}
+    
+    with patch.object(email_service.transport, 'send_batch', new_callable=AsyncMock) as mock_batch, \
+         patch("app.services.email_campaign.execute_rpc", new=AsyncMock()) as mock_rpc:
+        with pytest.raises(RuntimeError, match="another job"):
+            await service.run({"id": "job-1", "payload": {"run_id": "run-1"}})
+    
+    mock_rpc.assert_not_called()
+    mock_batch.assert_not_called()
+    assert saved == []
+
+
+@pytest.mark.asyncio
+async def test_campaign_continues_in_new_job_after_slice(make_campaign, email_service):
+    """Test a campaign that uses up its time slice enqueues a continuation"""
+    service, queue, saved = make_campaign(slice_seconds=0)
+    
+    with patch("app.services.email_campaign.execute_rpc", new=AsyncMock()) as mock_rpc:
+        await service.run({"id": "job-1", "payload": {"run_id": "run-1"}})
+    
+    mock_rpc.assert_not_called()
+    queue.enqueue.assert_awaited_once_with("email_campaign", {"run_id": "run-1"})
+
+
+@pytest.mark.asyncio
+async def test_campaign_start_validates_template_and_creates_job(make_campaign, email_service):
+    """Test starting a campaign checks template arguments and queues the first job"""
+    service, queue, saved = make_campaign()
+    
+    with pytest.raises(ValueError, match="action, scheduled_date"):
+        await service.start("follow_up_reminder", statuses=["contacted"])
+    with pytest.raises(ValueError):
+        await service.start("acknowledgement", statuses=["new"])
+    
+    with patch("app.services.email_campaign.execute_rpc", new=AsyncMock(return_value=1200)):
+        run = await service.start(
+            "follow_up_reminder",
+            statuses=["contacted"],
+            template_kwargs={"action": "Call", "scheduled_date": "2024-12-27"},
+            chunk_size=500
+        )
+    
+    assert run["total"] == 1200
+    assert run["job_id"] == "job-2"
+    status, checkpoint = saved[0]
+    assert status == "running"
+    assert checkpoint["options"]["chunk_size"] == 100  # Resend batch limit
+    assert checkpoint["selection"] == {"statuses": ["contacted"], "priorities": None}
+    assert queue.enqueue.call_args.args[1] == {"run_id": run["run_id"]}
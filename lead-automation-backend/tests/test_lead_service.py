@@ -1,4 +1,10 @@
 import pytest
+import asyncio
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock, patch
+from app.services.lead_service import LeadService
+from app.services.automation_executor import AutomationExecutor
+from app.models.activity import AICategorizationOutput
 from app.config.automation_rules import (
     get_matching_rule,
     get_all_rules,
@@ -495,3 +501,718 @@ def test_assignment_actions_have_owner_and_sla():
                 assert "sla_hours" in action
                 assert isinstance(action["sla_hours"], int)
                 assert action["sla_hours"] > 0
+
+
+# ============================================================================
+# Test: Lead Capture Persistence
+# ============================================================================
+
+@pytest.fixture
+def lead_service():
+    """Lead service with mocked AI and email dependencies"""
+    service = LeadService()
+    service.ai_service = MagicMock()
+    service.ai_service.categorize_lead = AsyncMock(return_value={
+        "input": {},
+        "output": {"priority": "high", "intent": "quote_request", "lead_type": "architect"},
+        "method": "ai"
+    })
+    service.email_service = MagicMock()
+    service.email_service.send_acknowledgement = AsyncMock(return_value={
+        "success": True,
+        "resend_id": "email_123",
+        "template": "acknowledgement"
+    })
+    service.email_service.send_template_email = AsyncMock(return_value={
+        "success": True,
+        "resend_id": "email_123",
+        "template": "immediate_response_high_priority",
+        "sent_at": "2026-01-01T10:00:00"
+    })
+    service.executor = AutomationExecutor(service.email_service)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_create_lead_saves_lead_before_automation(lead_service):
+    """Test lead and products are stored before any email, then results recorded in one RPC"""
+    calls = []
+    created = {
+        "lead": {"id": "lead-1", "name": "Priya", "pipeline_status": "processing"},
+        "products": [{"id": "p-1", "product": "Marble"}],
+        "assignment": None
+    }
+    
+    async def create(**kwargs):
+        calls.append("create_lead_full")
+        return created
+    
+    async def record(lead_id, **kwargs):
+        calls.append("record_lead_automation")
+        return {"assignment": {"id": "a-1", "owner_id": "senior_sales"}}
+    
+    async def send(*args, **kwargs):
+        calls.append("email")
+        return {"success": True, "resend_id": "email_123", "sent_at": "2026-01-01T10:00:00"}
+    
+    lead_service.email_service.send_template_email = AsyncMock(side_effect=send)
+    
+    with patch("app.services.lead_service.create_lead_full", new=AsyncMock(side_effect=create)) as mock_create, \
+         patch("app.services.lead_service.record_lead_automation", new=AsyncMock(side_effect=record)) as mock_record:
+        result = await lead_service.create_lead_with_products(
+            lead_data={
+                "name": "Priya",
+                "email": "priya@example.com",
+                "role": "Architect",
+                "message": "Need quote for commercial project"
+            },
+            product_interests=[{"category": "Flooring", "product": "Marble", "quantity": "20"}]
+        )
+    
+    assert calls == ["create_lead_full", "email", "record_lead_automation"]
+    # A recovery run resends with the same key, which Resend deduplicates
+    send = lead_service.email_service.send_template_email
+    template = send.call_args.kwargs["template_name"]
+    assert send.call_args.kwargs["idempotency_key"] == f"lead-lead-1-{template}"
+    
+    kwargs = mock_create.call_args.kwargs
+    assert kwargs["lead"]["pipeline_status"] == "processing"
+    assert kwargs["lead"]["first_response_at"] is None
+    assert kwargs["products"] == [{"category": "Flooring", "product": "Marble", "quantity": "20", "notes": None}]
+    assert "activities" not in kwargs
+    # Recovery job in case the inline automation does not finish
+    assert [job["job_type"] for job in kwargs["jobs"]] == ["lead_automation"]
+    assert kwargs["jobs"][0]["run_at"] > datetime.utcnow().isoformat()
+    
+    assert mock_record.call_args.args[0] == "lead-1"
+    recorded = mock_record.call_args.kwargs
+    assert recorded["first_response_at"] == "2026-01-01T10:00:00"
+    assert recorded["assignment"]["owner_id"] == "senior_sales"
+    
+    # architect_vip rule: actions in rule order, then the automation summary
+    activity_types = [a["type"] for a in recorded["activities"]]
+    assert activity_types == ["ai_result", "email", "follow_up", "approval", "assignment", "automation"]
+    
+    approval = recorded["activities"][3]["metadata"]
+    assert approval["approval_type"] == "bulk_discount_request"
+    assert approval["rule_approval_type"] == "architect_vip"
+    assert approval["owner_id"] == "senior_sales"
+    
+    assert result["lead"]["id"] == "lead-1"
+    assert result["lead"]["pipeline_status"] == "completed"
+    assert result["assignment"]["id"] == "a-1"
+    assert result["email_sent"] is True
+
+
+@pytest.mark.asyncio
+async def test_create_lead_submits_shadow_evaluation(lead_service):
+    """Test the stored lead's AI result is offered to shadow evaluation"""
+    lead_service.shadow = MagicMock()
+    created = {"lead": {"id": "lead-9"}, "products": [], "assignment": None}
+    
+    with patch("app.services.lead_service.create_lead_full", new=AsyncMock(return_value=created)), \
+         patch("app.services.lead_service.record_lead_automation", new=AsyncMock(return_value={})):
+        await lead_service.create_lead_with_products(
+            lead_data={"name": "Test", "email": "t@example.com", "role": "Architect"},
+            product_interests=[]
+        )
+    
+    lead_service.shadow.submit.assert_called_once()
+    lead_id, ai_result = lead_service.shadow.submit.call_args.args
+    assert lead_id == "lead-9"
+    assert ai_result["method"] == "ai"
+
+
+@pytest.mark.asyncio
+async def test_create_lead_rpc_failure_propagates(lead_service):
+    """Test a rejected capture (e.g. same-day duplicate) raises before any AI call or email"""
+    with patch("app.services.lead_service.create_lead_full", new=AsyncMock(side_effect=Exception("duplicate key"))):
+        with pytest.raises(Exception, match="duplicate key"):
+            await lead_service.create_lead_with_products(
+                lead_data={"name": "Test", "email": "t@example.com", "role": "Architect"},
+                product_interests=[]
+            )
+    
+    lead_service.ai_service.categorize_lead.assert_not_called()
+    lead_service.email_service.send_template_email.assert_not_called()
+    lead_service.email_service.send_acknowledgement.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_create_lead_automation_failure_marks_failed(lead_service):
+    """Test a failure after the lead is stored marks it failed for the recovery job"""
+    created = {"lead": {"id": "lead-6"}, "products": [], "assignment": None}
+    
+    with patch("app.services.lead_service.create_lead_full", new=AsyncMock(return_value=created)), \
+         patch("app.services.lead_service.record_lead_automation", new=AsyncMock(side_effect=Exception("tx aborted"))), \
+         patch("app.services.lead_service.update_record", new=AsyncMock()) as mock_update:
+        with pytest.raises(Exception, match="tx aborted"):
+            await lead_service.create_lead_with_products(
+                lead_data={"name": "Test", "email": "t@example.com"},
+                product_interests=[]
+            )
+    
+    assert mock_update.call_args.args[1:] == ("lead-6", {"pipeline_status": "failed"})
+
+
+# ============================================================================
+# Test: Background Pipeline
+# ============================================================================
+
+@pytest.mark.asyncio
+async def test_capture_lead_stores_pending_lead_and_job(lead_service):
+    """Test background capture writes lead, products and its job without running AI"""
+    created = {"lead": {"id": "lead-2"}, "products": [], "assignment": None}
+    
+    with patch("app.services.lead_service.create_lead_full", new=AsyncMock(return_value=created)) as mock_rpc:
+        result = await lead_service.capture_lead(
+            {"name": "Test", "email": "t@example.com"},
+            [{"category": "Wall", "product": "Panels"}]
+        )
+    
+    kwargs = mock_rpc.call_args.kwargs
+    assert result["lead"]["id"] == "lead-2"
+    assert kwargs["lead"]["pipeline_status"] == "pending"
+    assert kwargs["jobs"][0]["job_type"] == "lead_automation"
+    assert kwargs["jobs"][0]["payload"]["product_interests"][0]["product"] == "Panels"
+    assert "activities" not in kwargs
+    lead_service.ai_service.categorize_lead.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_run_automation_records_results_atomically(lead_service):
+    """Test run_automation marks processing, then records everything in one RPC"""
+    lead = {"id": "lead-3", "name": "Test", "email": "t@example.com", "role": "Home Owner"}
+    
+    with patch("app.services.lead_service.update_record", new=AsyncMock()) as mock_update, \
+         patch("app.services.lead_service.record_lead_automation",
+               new=AsyncMock(return_value={"assignment": {"id": "a-3"}})) as mock_record:
+        result = await lead_service.run_automation(lead, [{"category": "Wall", "product": "Panels"}])
+    
+    assert mock_update.call_args_list[0].args[2] == {"pipeline_status": "processing"}
+    assert mock_record.call_args.args[0] == "lead-3"
+    assert mock_record.call_args.kwargs["first_response_at"] is not None
+    assert result["assignment"]["id"] == "a-3"
+
+
+@pytest.mark.asyncio
+async def test_run_automation_skips_completed_lead(lead_service):
+    """Test a redelivered job for a completed lead does no work"""
+    with patch("app.services.lead_service.update_record", new=AsyncMock()) as mock_update:
+        result = await lead_service.run_automation(
+            {"id": "lead-5", "pipeline_status": "completed"}, []
+        )
+    
+    assert result["skipped"] is True
+    mock_update.assert_not_called()
+    lead_service.ai_service.categorize_lead.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_run_automation_marks_failed(lead_service):
+    """Test a pipeline error marks the lead as failed"""
+    lead_service.ai_service.categorize_lead = AsyncMock(side_effect=Exception("boom"))
+    
+    with patch("app.services.lead_service.update_record", new=AsyncMock()) as mock_update:
+        with pytest.raises(Exception, match="boom"):
+            await lead_service.run_automation({"id": "lead-4", "name": "T", "email": "t@example.com"}, [])
+    
+    assert mock_update.call_args.args[2] == {"pipeline_status": "failed"}
+
+
+# ============================================================================
+# Test: Durable Job Queue
+# ============================================================================
+
+def make_job_queue(jobs):
+    """Mock job queue that hands out the given jobs once"""
+    from app.services.job_queue import JobQueue
+    
+    queue = JobQueue(worker_id="test-worker")
+    batches = [jobs]
+    
+    async def claim(batch_size):
+        return batches.pop(0) if batches else []
+    
+    queue.claim = AsyncMock(side_effect=claim)
+    queue.complete = AsyncMock()
+    queue.fail = AsyncMock(return_value="queued")
+    return queue
+
+
+@pytest.mark.asyncio
+async def test_lead_pipeline_workers_drain_job_queue():
+    """Test pipeline workers run and complete every claimed job"""
+    from app.services.lead_pipeline import LeadPipeline
+    
+    jobs = [{"id": f"job-{i}", "job_type": "lead_automation", "lead_id": f"lead-{i}", "payload": {}} for i in range(3)]
+    queue = make_job_queue(jobs)
+    service = MagicMock()
+    service.run_automation = AsyncMock(return_value={"email_queued": False})
+    pipeline = LeadPipeline(job_queue=queue, workers=2, poll_interval=0.01)
+    
+    with patch("app.services.lead_pipeline.get_lead_service", return_value=service), \
+         patch("app.services.lead_pipeline.get_record", new=AsyncMock(side_effect=lambda t, i: {"id": i})):
+        await pipeline.start()
+        await asyncio.sleep(0.1)
+        await pipeline.stop()
+    
+    assert service.run_automation.await_count == 3
+    assert queue.complete.await_count == 3
+    queue.fail.assert_not_called()
+    assert not pipeline.running
+
+
+@pytest.mark.asyncio
+async def test_lead_pipeline_failed_job_is_retried():
+    """Test a handler error is reported to the queue for backoff, not completed"""
+    from app.services.lead_pipeline import LeadPipeline
+    
+    queue = make_job_queue([{"id": "job-1", "job_type": "lead_automation", "lead_id": "lead-1", "payload": {}, "attempts": 1}])
+    service = MagicMock()
+    service.run_automation = AsyncMock(side_effect=Exception("groq down"))
+    pipeline = LeadPipeline(job_queue=queue, workers=1, poll_interval=0.01)
+    
+    with patch("app.services.lead_pipeline.get_lead_service", return_value=service), \
+         patch("app.services.lead_pipeline.get_record", new=AsyncMock(return_value={"id": "lead-1"})):
+        await pipeline.start()
+        await asyncio.sleep(0.05)
+        await pipeline.stop()
+    
+    queue.fail.assert_awaited_once()
+    assert queue.fail.call_args.args[1] == "groq down"
+    queue.complete.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_lead_pipeline_dispatches_outbox_emails():
+    """Test send_email jobs are handed to the email outbox"""
+    from app.services.lead_pipeline import LeadPipeline
+    
+    job = {"id": "job-1", "job_type": "send_email", "lead_id": "lead-1", "payload": {"activity_id": "act-1"}}
+    queue = make_job_queue([job])
+    outbox = MagicMock()
+    outbox.dispatch = AsyncMock()
+    pipeline = LeadPipeline(job_queue=queue, workers=1, poll_interval=0.01)
+    
+    with patch("app.services.lead_pipeline.get_email_outbox", return_value=outbox):
+        await pipeline.start()
+        await asyncio.sleep(0.05)
+        await pipeline.stop()
+    
+    outbox.dispatch.assert_awaited_once_with(job)
+    queue.complete.assert_awaited_once_with("job-1")
+
+
+def test_job_queue_backoff_grows_and_caps():
+    """Test retry delay grows exponentially with jitter and respects the cap"""
+    from app.services.job_queue import JobQueue
+    
+    queue = JobQueue(base_backoff_seconds=10, max_backoff_seconds=100, worker_id="w")
+    
+    # Full jitter: uniform between zero and the exponential ceiling
+    with patch("app.services.job_queue.random.uniform", side_effect=lambda low, high: (low, high)):
+        assert queue.backoff_delay(1) == (0, 10)
+        assert queue.backoff_delay(3) == (0, 40)
+        assert queue.backoff_delay(10) == (0, 100)
+    
+    assert 0 <= queue.backoff_delay(3) <= 40
+
+
+def test_checkpointed_run_requires_page_methods():
+    """Test a batch run without _fetch_page and _process_page cannot be created"""
+    from app.services.job_queue import CheckpointedRun
+    
+    class NoPages(CheckpointedRun):
+        JOB_TYPE = "no_pages"
+    
+    with pytest.raises(TypeError, match="_fetch_page"):
+        NoPages(MagicMock())
+
+
+# ============================================================================
+# Test: Deadline Mode (late AI upgrade)
+# ============================================================================
+
+def make_late_ai(lead_service, late_output):
+    """Deadline mode where the fallback answered and the AI lands afterwards"""
+    import asyncio
+    
+    provisional = {
+        "input": {},
+        "output": {"priority": "medium", "intent": "product_info", "lead_type": "home_owner"},
+        "method": "fallback",
+        "deadline_exceeded": True
+    }
+    late = asyncio.get_running_loop().create_future()
+    late.set_result({"input": {}, "output": late_output, "method": "ai"})
+    
+    lead_service.ai_deadline_seconds = 0.8
+    lead_service.ai_service.categorize_lead_within = AsyncMock(return_value=(provisional, late))
+
+
+@pytest.mark.asyncio
+async def test_late_ai_result_reevaluates_sla_and_follow_up(lead_service):
+    """Test a different late AI answer reassigns and replaces the follow-up"""
+    make_late_ai(lead_service, {"priority": "high", "intent": "quote_request", "lead_type": "builder"})
+    created = {"lead": {"id": "lead-7"}, "products": [], "assignment": {"id": "a-7"}}
+    
+    with patch("app.services.lead_service.create_lead_full", new=AsyncMock(return_value=created)), \
+         patch("app.services.lead_service.record_lead_automation", new=AsyncMock(return_value={})) as mock_rpc, \
+         patch("app.services.lead_service.insert_records", new=AsyncMock()) as mock_insert, \
+         patch("app.services.lead_service.reevaluate_lead_automation", new=AsyncMock()) as mock_reevaluate:
+        result = await lead_service.create_lead_with_products(
+            lead_data={"name": "Ravi", "email": "ravi@example.com", "role": "Builder"},
+            product_interests=[{"category": "Wall", "product": "Panels"}]
+        )
+        assert result["ai_categorization"]["priority"] == "medium"  # not held up by the AI
+        await lead_service.drain()
+    
+    assert mock_rpc.call_args.kwargs["assignment"]["owner_id"] == "sales_team"  # warm_lead
+    mock_insert.assert_not_called()  # audit rows go in the same call as the updates
+    
+    assert mock_reevaluate.call_args.args == ("lead-7", "warm_lead")  # provisional rule's actions are cancelled
+    kwargs = mock_reevaluate.call_args.kwargs
+    assert kwargs["jobs"] == []  # builder_bulk has no delayed actions
+    assert kwargs["assignment"]["owner_id"] == "senior_sales"
+    rows = kwargs["activities"]
+    assert [r["type"] for r in rows] == ["ai_result", "follow_up", "assignment", "automation"]
+    assert rows[-1]["metadata"]["rule_name"] == "builder_bulk"
+    assert rows[-1]["metadata"]["changes"]["priority"] == {"from": "medium", "to": "high"}
+    assert rows[-1]["metadata"]["changes"]["intent"] == {"from": "information", "to": "quote_request"}
+    lead_service.email_service.send_template_email.assert_awaited_once()  # no second email
+
+
+@pytest.mark.asyncio
+async def test_late_ai_result_reschedules_delayed_actions(lead_service):
+    """Test re-evaluation schedules the new rule's delayed actions, not its immediate email"""
+    make_late_ai(lead_service, {"priority": "medium", "intent": "quote_request", "lead_type": "contractor"})
+    created = {"lead": {"id": "lead-5"}, "products": [], "assignment": None}
+    
+    with patch("app.services.lead_service.create_lead_full", new=AsyncMock(return_value=created)), \
+         patch("app.services.lead_service.record_lead_automation", new=AsyncMock(return_value={})), \
+         patch("app.services.lead_service.reevaluate_lead_automation", new=AsyncMock()) as mock_reevaluate:
+        await lead_service.create_lead_with_products(
+            lead_data={"name": "Kiran", "email": "kiran@example.com", "role": "Contractor"},
+            product_interests=[]
+        )
+        await lead_service.drain()
+    
+    assert mock_reevaluate.call_args.args == ("lead-5", "warm_lead")
+    jobs = mock_reevaluate.call_args.kwargs["jobs"]
+    assert [job["job_type"] for job in jobs] == ["delayed_action"]
+    assert jobs[0]["payload"]["action"]["template"] == "nurture_day_0"
+    assert jobs[0]["payload"]["rule_name"] == "warm_lead"
+    lead_service.email_service.send_template_email.assert_awaited_once()  # acknowledgement only
+
+
+@pytest.mark.asyncio
+async def test_late_ai_result_matching_fallback_only_logs(lead_service):
+    """Test a late AI answer agreeing with the fallback (in validated spellings) only logs"""
+    make_late_ai(lead_service, AICategorizationOutput.model_validate(
+        {"priority": "medium", "intent": "information", "lead_type": "homeowner"}
+    ).model_dump())
+    created = {"lead": {"id": "lead-8"}, "products": [], "assignment": None}
+    
+    with patch("app.services.lead_service.create_lead_full", new=AsyncMock(return_value=created)), \
+         patch("app.services.lead_service.record_lead_automation", new=AsyncMock(return_value={})), \
+         patch("app.services.lead_service.insert_records", new=AsyncMock()) as mock_insert, \
+         patch("app.services.lead_service.reevaluate_lead_automation", new=AsyncMock()) as mock_reevaluate:
+        await lead_service.create_lead_with_products(
+            lead_data={"name": "Asha", "email": "asha@example.com"},
+            product_interests=[]
+        )
+        await lead_service.drain()
+    
+    assert [r["type"] for r in mock_insert.call_args.args[1]] == ["ai_result"]
+    mock_reevaluate.assert_not_called()
+
+
+# ============================================================================
+# Test: Automation Executor
+# ============================================================================
+
+def make_executor(email_delay: float = 0):
+    """Executor whose email send takes email_delay seconds"""
+    email_service = MagicMock()
+    
+    async def send_template_email(to_email, template_name, **kwargs):
+        await asyncio.sleep(email_delay)
+        return {"success": True, "resend_id": "email_1", "template": template_name, "sent_at": "2026-01-01T10:00:00"}
+    
+    email_service.send_template_email = AsyncMock(side_effect=send_template_email)
+    return AutomationExecutor(email_service)
+
+
+def matched_rule(rule_name):
+    """Rule in the shape returned by get_matching_rule"""
+    return {"rule_name": rule_name, **get_rule_by_name(rule_name)}
+
+
+EXECUTOR_CONTEXT = {
+    "lead_data": {"name": "Priya", "email": "priya@example.com", "role": "Architect"},
+    "products": ["Marble"],
+    "ai_output": {"priority": "high", "intent": "quote_request", "lead_type": "architect"},
+    "approval": None
+}
+
+
+@pytest.mark.asyncio
+async def test_executor_runs_independent_actions_concurrently():
+    """Test assignment does not wait for the (slow) email send"""
+    executor = make_executor(email_delay=0.1)
+    
+    run = await executor.execute(matched_rule("hot_lead"), EXECUTOR_CONTEXT)
+    
+    timings = {t["type"]: t for t in run["timings"]}
+    assert timings["create_assignment"]["started_ms"] < 50
+    assert timings["send_email"]["duration_ms"] >= 100
+    assert run["total_ms"] < 200
+    assert all(t["status"] == "completed" for t in run["timings"])
+
+
+@pytest.mark.asyncio
+async def test_executor_dependents_wait_for_assignment():
+    """Test follow-up and approval are owned by the assignee even when listed first"""
+    executor = make_executor()
+    
+    run = await executor.execute(matched_rule("architect_vip"), EXECUTOR_CONTEXT)
+    
+    follow_up = next(a for a in run["activities"] if a["type"] == "follow_up")
+    approval = next(a for a in run["activities"] if a["type"] == "approval")
+    assert follow_up["metadata"]["owner_id"] == "senior_sales"
+    assert approval["metadata"]["owner_id"] == "senior_sales"
+    assert approval["metadata"]["approval_type"] == "architect_vip"
+    assert run["assignment"]["owner_id"] == "senior_sales"
+    assert run["first_response_at"] == "2026-01-01T10:00:00"
+    
+    notify = next(t for t in run["timings"] if t["type"] == "notify_sales")
+    assert notify["status"] == "skipped"
+
+
+@pytest.mark.asyncio
+async def test_executor_defers_delayed_actions():
+    """Test delayed emails are not sent inline"""
+    executor = make_executor()
+    
+    run = await executor.execute(matched_rule("warm_lead"), {**EXECUTOR_CONTEXT, "ai_output": {"priority": "medium"}})
+    
+    statuses = [t["status"] for t in run["timings"]]
+    assert statuses == ["completed", "deferred", "completed", "completed"]
+    executor.email_service.send_template_email.assert_awaited_once()
+    assert executor.email_service.send_template_email.call_args.kwargs["template_name"] == "acknowledgement"
+
+
+@pytest.mark.asyncio
+async def test_executor_records_failed_action():
+    """Test a failing handler is reported without aborting the other actions"""
+    executor = make_executor()
+    executor.email_service.send_template_email = AsyncMock(side_effect=Exception("resend down"))
+    
+    run = await executor.execute(matched_rule("cold_lead"), EXECUTOR_CONTEXT)
+    
+    email = next(t for t in run["timings"] if t["type"] == "send_email")
+    assert email["status"] == "failed"
+    assert email["detail"] == "resend down"
+    assert run["email_result"] is None
+    assert run["first_response_at"] is None
+    assert run["assignment"]["owner_id"] == "marketing_team"
+
+
+@pytest.mark.asyncio
+async def test_executor_outbox_queues_email_instead_of_sending():
+    """Test with the outbox on, send_email returns a queued activity and its job"""
+    executor = make_executor()
+    executor.outbox = True
+    
+    run = await executor.execute(matched_rule("hot_lead"), EXECUTOR_CONTEXT)
+    
+    executor.email_service.send_template_email.assert_not_called()
+    email = next(a for a in run["activities"] if a["type"] == "email")
+    assert email["status"] == "queued"
+    assert run["jobs"] == [{
+        "job_type": "send_email",
+        "payload": {
+            "activity_id": email["id"],
+            "to_email": "priya@example.com",
+            "template_name": "immediate_response_high_priority",
+            "template_kwargs": run["jobs"][0]["payload"]["template_kwargs"],
+            "first_response": True
+        }
+    }]
+    assert run["jobs"][0]["payload"]["template_kwargs"]["name"] == "Priya"
+    assert run["email_result"] == {"success": False, "queued": True, "template": "immediate_response_high_priority"}
+    assert run["first_response_at"] is None  # Set when the outbox email is sent
+    assert next(t for t in run["timings"] if t["type"] == "send_email")["status"] == "queued"
+
+
+@pytest.mark.asyncio
+async def test_create_lead_stores_outbox_jobs_with_lead(lead_service):
+    """Test queued emails are written in the same record_lead_automation call as their activities"""
+    lead_service.executor = make_executor()
+    lead_service.executor.outbox = True
+    created = {"lead": {"id": "lead-9"}, "products": [], "assignment": None}
+    
+    with patch("app.services.lead_service.create_lead_full", new=AsyncMock(return_value=created)), \
+         patch("app.services.lead_service.record_lead_automation", new=AsyncMock(return_value={})) as mock_record:
+        result = await lead_service.create_lead_with_products(
+            lead_data={"name": "Test", "email": "t@example.com", "role": "Architect"},
+            product_interests=[]
+        )
+    
+    kwargs = mock_record.call_args.kwargs
+    assert [job["job_type"] for job in kwargs["jobs"]] == ["send_email"]
+    activity_ids = [a.get("id") for a in kwargs["activities"] if a["type"] == "email"]
+    assert activity_ids == [kwargs["jobs"][0]["payload"]["activity_id"]]
+    assert kwargs["first_response_at"] is None
+    assert result["email_sent"] is False
+    assert result["email_queued"] is True
+
+
+# ============================================================================
+# Test: Delayed Actions
+# ============================================================================
+
+@pytest.mark.asyncio
+async def test_executor_stores_delayed_action_as_timer_job():
+    """Test a delayed action becomes a delayed_action job due after its delay"""
+    from datetime import datetime, timedelta
+    
+    executor = make_executor()
+    
+    run = await executor.execute(matched_rule("warm_lead"), {**EXECUTOR_CONTEXT, "ai_output": {"priority": "medium"}})
+    
+    assert [job["job_type"] for job in run["jobs"]] == ["delayed_action"]
+    job = run["jobs"][0]
+    assert job["payload"]["action"]["template"] == "nurture_day_0"
+    assert job["payload"]["rule_name"] == "warm_lead"
+    assert job["run_at"] == job["payload"]["scheduled_for"]
+    due_in = datetime.fromisoformat(job["run_at"]) - datetime.utcnow()
+    assert timedelta(hours=2) - timedelta(seconds=5) < due_in <= timedelta(hours=2)
+
+
+@pytest.mark.asyncio
+async def test_executor_outbox_schedules_delayed_email():
+    """Test with the outbox on, a delayed email is a scheduled outbox job instead"""
+    executor = make_executor()
+    executor.outbox = True
+    
+    run = await executor.execute(matched_rule("warm_lead"), {**EXECUTOR_CONTEXT, "ai_output": {"priority": "medium"}})
+    
+    scheduled = [job for job in run["jobs"] if "run_at" in job]
+    assert [job["job_type"] for job in scheduled] == ["send_email"]
+    assert scheduled[0]["payload"]["template_name"] == "nurture_day_0"
+    assert scheduled[0]["payload"]["first_response"] is False
+    activity = next(a for a in run["activities"] if a.get("id") == scheduled[0]["payload"]["activity_id"])
+    assert activity["status"] == "scheduled"
+    assert activity["metadata"]["scheduled_for"] == scheduled[0]["run_at"]
+    assert activity["metadata"]["rule_name"] == "warm_lead"  # lets a re-evaluation cancel it
+
+
+def delayed_job(scheduled_for, status="new"):
+    """Claimed delayed_action job whose lead has the given status"""
+    return {
+        "id": "job-1",
+        "job_type": "delayed_action",
+        "lead_id": "lead-1",
+        "attempts": 1,
+        "max_attempts": 5,
+        "payload": {
+            "action": {"type": "send_email", "template": "nurture_day_0", "delay_hours": 2},
+            "rule_name": "warm_lead",
+            "products": ["Marble"],
+            "ai_output": {"priority": "medium"},
+            "scheduled_for": scheduled_for
+        }
+    }
+
+
+@pytest.mark.asyncio
+async def test_scheduler_fires_delayed_action_and_tracks_lag():
+    """Test a due timer runs its action, logs the activity and records the firing lag"""
+    from datetime import datetime, timedelta
+    from app.services.action_scheduler import ActionScheduler
+    
+    scheduler = ActionScheduler(make_executor())
+    job = delayed_job((datetime.utcnow() - timedelta(seconds=30)).isoformat())
+    lead = {"id": "lead-1", "name": "Asha", "email": "asha@example.com", "status": "new"}
+    
+    with patch("app.services.action_scheduler.get_record", new=AsyncMock(return_value=lead)), \
+         patch("app.services.action_scheduler.insert_records", new=AsyncMock()) as mock_insert:
+        await scheduler.fire(job)
+    
+    send = scheduler.executor.email_service.send_template_email
+    assert send.call_args.kwargs["template_name"] == "nurture_day_0"
+    assert send.call_args.kwargs["to_email"] == "asha@example.com"
+    assert send.call_args.kwargs["idempotency_key"] == "job-job-1-nurture_day_0"
+    rows = mock_insert.call_args.args[1]
+    assert rows[0]["lead_id"] == "lead-1"
+    assert rows[0]["metadata"]["scheduled_for"] == job["payload"]["scheduled_for"]
+    stats = scheduler.stats()
+    assert stats["fired"] == 1
+    assert 30 <= stats["lag_seconds"]["last"] < 35
+
+
+@pytest.mark.asyncio
+async def test_scheduler_skips_actions_of_closed_leads():
+    """Test timers of converted or lost leads are dropped without running"""
+    from datetime import datetime
+    from app.services.action_scheduler import ActionScheduler
+    
+    scheduler = ActionScheduler(make_executor())
+    
+    with patch("app.services.action_scheduler.get_record", new=AsyncMock(return_value={"id": "lead-1", "status": "converted"})), \
+         patch("app.services.action_scheduler.insert_records", new=AsyncMock()) as mock_insert:
+        await scheduler.fire(delayed_job(datetime.utcnow().isoformat()))
+    
+    scheduler.executor.email_service.send_template_email.assert_not_called()
+    mock_insert.assert_not_called()
+    assert scheduler.stats()["skipped"] == 1
+
+
+@pytest.mark.asyncio
+async def test_scheduler_failed_action_is_retried():
+    """Test a failed delayed action raises for job queue backoff before its last attempt"""
+    from datetime import datetime
+    from app.services.action_scheduler import ActionScheduler
+    
+    scheduler = ActionScheduler(make_executor())
+    scheduler.executor.email_service.send_template_email = AsyncMock(return_value={"success": False, "error": "resend down"})
+    
+    with patch("app.services.action_scheduler.get_record", new=AsyncMock(return_value={"id": "lead-1", "name": "A", "email": "a@example.com"})), \
+         patch("app.services.action_scheduler.insert_records", new=AsyncMock()) as mock_insert:
+        with pytest.raises(RuntimeError):
+            await scheduler.fire(delayed_job(datetime.utcnow().isoformat()))
+        mock_insert.assert_not_called()
+        
+        await scheduler.fire({**delayed_job(datetime.utcnow().isoformat()), "attempts": 5})
+    
+    assert mock_insert.call_args.args[1][0]["status"] == "failed"
+
+
+@pytest.mark.asyncio
+async def test_scheduler_wakes_workers_when_timers_come_due():
+    """Test overdue timers (e.g. after a restart) wake workers at once and upcoming ones on time"""
+    from datetime import datetime, timedelta
+    from app.services.action_scheduler import ActionScheduler
+    
+    now = datetime.utcnow()
+    due_times = [
+        {"run_at": (now - timedelta(minutes=10)).isoformat()},
+        {"run_at": (now + timedelta(milliseconds=150)).isoformat()}
+    ]
+    scheduler = ActionScheduler(make_executor(), refresh_seconds=60)
+    wakes = []
+    
+    with patch("app.services.action_scheduler.execute_rpc", new=AsyncMock(return_value=due_times)):
+        await scheduler.start(lambda: wakes.append(datetime.utcnow()))
+        await asyncio.sleep(0.05)
+        assert len(wakes) == 1
+        assert scheduler.stats()["tracked_timers"] == 1
+        await asyncio.sleep(0.2)
+        await scheduler.stop()
+    
+    assert len(wakes) == 2
+    assert wakes[1] - now >= timedelta(milliseconds=150)
+    assert not scheduler.running
+